@@ -20,11 +20,7 @@ except ModuleNotFoundError:  # pragma: no cover
     from backend.src.config import PROCESSED_DATA_DIR, RAW_DATA_DIR, ensure_directories  # type: ignore  # noqa: E402
 
 
-def main():
-    ensure_directories()
-    raw_path = RAW_DATA_DIR / "Books.csv"
-    df = pd.read_csv(raw_path, low_memory=False)
-
+def build_report(df: pd.DataFrame) -> str:
     buffer = io.StringIO()
     buffer.write("=== Basic Info ===\n")
     df.info(buf=buffer)
@@ -36,9 +32,16 @@ def main():
     buffer.write(df["Book-Author"].value_counts().head(10).to_string())
     buffer.write("\n\n=== Publisher Distribution (Top 10) ===\n")
     buffer.write(df["Publisher"].value_counts().head(10).to_string())
+    return buffer.getvalue()
+
+
+def main():
+    ensure_directories()
+    raw_path = RAW_DATA_DIR / "Books.csv"
+    df = pd.read_csv(raw_path, low_memory=False)
 
     report_path = PROCESSED_DATA_DIR / "eda_text_report.txt"
-    report_path.write_text(buffer.getvalue())
+    report_path.write_text(build_report(df))
     print(f"EDA report written to {report_path}")
 
 
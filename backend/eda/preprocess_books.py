@@ -6,7 +6,6 @@ import sys
 from pathlib import Path
 
 import pandas as pd
-from sklearn.preprocessing import LabelEncoder, StandardScaler
 
 BACKEND_ROOT = Path(__file__).resolve().parents[1]
 REPO_ROOT = BACKEND_ROOT.parent
@@ -22,10 +21,8 @@ except ModuleNotFoundError:  # pragma: no cover
     from backend.src.data_pipeline import clean_books, load_raw_books  # type: ignore  # noqa: E402
 
 
-def main():
-    ensure_directories()
-    raw_df = load_raw_books()
-    cleaned_df = clean_books(raw_df)
+def build_features(cleaned_df: pd.DataFrame) -> pd.DataFrame:
+    from sklearn.preprocessing import LabelEncoder, StandardScaler  # deferred: only this step needs sklearn
 
     features = cleaned_df[
         [
@@ -47,6 +44,13 @@ def main():
 
     scaler = StandardScaler()
     features["year_scaled"] = scaler.fit_transform(features[["Year-Of-Publication"]])
+    return features
+
+
+def main():
+    ensure_directories()
+    raw_df = load_raw_books()
+    features = build_features(clean_books(raw_df))
 
     processed_path = PROCESSED_DATA_DIR / "processed_books.csv"
     features.to_csv(processed_path, index=False)
@@ -0,0 +1,207 @@
+"""Rebuild every EDA artifact from a single data load.
+
+The raw and cleaned books tables are read and cleaned once, cached in a
+columnar snapshot (Parquet when pyarrow is installed, pickle otherwise) and
+shared by all reports; charts are rendered in a process pool. Artifacts whose
+inputs have not changed since the last run are skipped.
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import matplotlib
+
+matplotlib.use("Agg")
+
+import pandas as pd  # noqa: E402
+
+EDA_DIR = Path(__file__).resolve().parent
+BACKEND_ROOT = EDA_DIR.parent
+REPO_ROOT = BACKEND_ROOT.parent
+for path in (EDA_DIR, BACKEND_ROOT, REPO_ROOT):
+    if str(path) not in sys.path:
+        sys.path.append(str(path))
+
+try:
+    from src.config import PROCESSED_DATA_DIR, RAW_DATA_DIR, ensure_directories  # type: ignore  # noqa: E402
+    from src.data_pipeline import CLEANED_BOOKS_FILENAME, RAW_BOOK_DTYPES, clean_books  # type: ignore  # noqa: E402
+except ModuleNotFoundError:  # pragma: no cover
+    from backend.src.config import PROCESSED_DATA_DIR, RAW_DATA_DIR, ensure_directories  # type: ignore  # noqa: E402
+    from backend.src.data_pipeline import CLEANED_BOOKS_FILENAME, RAW_BOOK_DTYPES, clean_books  # type: ignore  # noqa: E402
+
+import dataset_overview  # noqa: E402
+import examine_books  # noqa: E402
+import preprocess_books  # noqa: E402
+import visualize_books  # noqa: E402
+
+CACHE_DIR = PROCESSED_DATA_DIR / "eda_cache"
+MANIFEST_PATH = CACHE_DIR / "manifest.json"
+
+try:
+    import pyarrow  # noqa: F401
+
+    SNAPSHOT_SUFFIX = ".parquet"
+except ImportError:  # pragma: no cover - optional columnar format
+    SNAPSHOT_SUFFIX = ".pkl"
+
+
+def input_fingerprint() -> str:
+    """Raw file identity plus the source of every script that shapes the outputs."""
+    stat = (RAW_DATA_DIR / "Books.csv").stat()
+    digest = hashlib.sha1(f"{stat.st_size}-{stat.st_mtime_ns}".encode("utf-8"))
+    sources = sorted(EDA_DIR.glob("*.py")) + [BACKEND_ROOT / "src" / "data_pipeline.py", BACKEND_ROOT / "src" / "config.py"]
+    for source in sources:
+        digest.update(source.read_bytes())
+    return digest.hexdigest()
+
+
+def _write_snapshot(df: pd.DataFrame, name: str) -> None:
+    path = CACHE_DIR / f"{name}{SNAPSHOT_SUFFIX}"
+    if SNAPSHOT_SUFFIX == ".parquet":
+        df.to_parquet(path, index=False)
+    else:
+        df.to_pickle(path)
+
+
+def _read_snapshot(name: str) -> Optional[pd.DataFrame]:
+    path = CACHE_DIR / f"{name}{SNAPSHOT_SUFFIX}"
+    if not path.exists():
+        return None
+    return pd.read_parquet(path) if SNAPSHOT_SUFFIX == ".parquet" else pd.read_pickle(path)
+
+
+def load_manifest() -> Dict:
+    if MANIFEST_PATH.exists():
+        return json.loads(MANIFEST_PATH.read_text())
+    return {}
+
+
+def save_manifest(manifest: Dict) -> None:
+    MANIFEST_PATH.write_text(json.dumps(manifest, indent=2))
+
+
+class BookFrames:
+    """Raw and cleaned tables, loaded on first use from the snapshot or the CSV."""
+
+    def __init__(self, fingerprint: str, manifest: Dict):
+        self.fingerprint = fingerprint
+        self.manifest = manifest
+        self._frames: Optional[Tuple[pd.DataFrame, pd.DataFrame]] = None
+
+    def get(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        if self._frames is None:
+            self._frames = self._load()
+        return self._frames
+
+    def _load(self) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        if self.manifest.get("snapshot") == self.fingerprint:
+            raw_df, cleaned_df = _read_snapshot("raw_books"), _read_snapshot("cleaned_books")
+            if raw_df is not None and cleaned_df is not None:
+                print("Loaded books from columnar snapshot")
+                return raw_df, cleaned_df
+
+        raw_df = pd.read_csv(RAW_DATA_DIR / "Books.csv", dtype=RAW_BOOK_DTYPES)
+        cleaned_df = clean_books(raw_df)
+        _write_snapshot(raw_df, "raw_books")
+        _write_snapshot(cleaned_df, "cleaned_books")
+        self.manifest["snapshot"] = self.fingerprint
+        return raw_df, cleaned_df
+
+
+def build_overview(frames: BookFrames, pool: ProcessPoolExecutor) -> None:
+    raw_df, cleaned_df = frames.get()
+    cleaned_df.to_csv(PROCESSED_DATA_DIR / CLEANED_BOOKS_FILENAME, index=False)
+    raw_df.head(50).to_csv(PROCESSED_DATA_DIR / "comparison_raw_head.csv", index=False)
+    cleaned_df.head(50).to_csv(PROCESSED_DATA_DIR / "comparison_clean_head.csv", index=False)
+    summary = dataset_overview.build_summary(raw_df, cleaned_df)
+    (PROCESSED_DATA_DIR / "dataset_overview.json").write_text(json.dumps(summary, indent=2, ensure_ascii=False))
+
+
+def build_text_report(frames: BookFrames, pool: ProcessPoolExecutor) -> None:
+    raw_df, _ = frames.get()
+    (PROCESSED_DATA_DIR / "eda_text_report.txt").write_text(examine_books.build_report(raw_df))
+
+
+def build_features(frames: BookFrames, pool: ProcessPoolExecutor) -> None:
+    _, cleaned_df = frames.get()
+    preprocess_books.build_features(cleaned_df).to_csv(PROCESSED_DATA_DIR / "processed_books.csv", index=False)
+
+
+def build_charts(frames: BookFrames, pool: ProcessPoolExecutor) -> None:
+    raw_df, _ = frames.get()
+    df = visualize_books.with_numeric_years(raw_df)
+    # Aggregate here; workers only receive the small series they plot.
+    jobs = [
+        pool.submit(visualize_books.render_books_per_year, visualize_books.books_per_year(df)),
+        pool.submit(
+            visualize_books.render_top_entities,
+            visualize_books.top_entities(df, "Book-Author"),
+            "Top Authors by Book Count",
+            "top_authors.png",
+        ),
+        pool.submit(
+            visualize_books.render_top_entities,
+            visualize_books.top_entities(df, "Publisher"),
+            "Top Publishers by Book Count",
+            "top_publishers.png",
+        ),
+    ]
+    for job in jobs:
+        job.result()
+
+
+ARTIFACTS: Dict[str, Tuple[Callable[[BookFrames, ProcessPoolExecutor], None], List[str]]] = {
+    "overview": (
+        build_overview,
+        [CLEANED_BOOKS_FILENAME, "comparison_raw_head.csv", "comparison_clean_head.csv", "dataset_overview.json"],
+    ),
+    "text_report": (build_text_report, ["eda_text_report.txt"]),
+    "features": (build_features, ["processed_books.csv"]),
+    "charts": (build_charts, ["books_per_year.png", "top_authors.png", "top_publishers.png"]),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rebuild all EDA artifacts from one data load")
+    parser.add_argument("--force", action="store_true", help="rebuild even if the inputs are unchanged")
+    parser.add_argument("--workers", type=int, default=None, help="processes used to render charts")
+    parser.add_argument("--only", nargs="+", choices=sorted(ARTIFACTS), help="rebuild just these artifacts")
+    args = parser.parse_args(argv)
+
+    ensure_directories()
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    fingerprint = input_fingerprint()
+    manifest = load_manifest()
+    built = manifest.get("artifacts", {})
+    frames = BookFrames(fingerprint, manifest)
+
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for name in args.only or ARTIFACTS:
+            builder, outputs = ARTIFACTS[name]
+            up_to_date = built.get(name) == fingerprint and all((PROCESSED_DATA_DIR / output).exists() for output in outputs)
+            if up_to_date and not args.force:
+                print(f"[skip] {name}: inputs unchanged")
+                continue
+            step_started = time.perf_counter()
+            builder(frames, pool)
+            built[name] = fingerprint
+            # Record progress after each step so an interrupted run resumes where it stopped.
+            manifest["artifacts"] = built
+            save_manifest(manifest)
+            print(f"[done] {name} in {time.perf_counter() - step_started:.2f}s")
+
+    save_manifest(manifest)
+    print(f"EDA artifacts in {PROCESSED_DATA_DIR} ({time.perf_counter() - started:.2f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -31,13 +31,24 @@ def save_plot(fig, filename: str):
     print(f"Saved plot to {output}")
 
 
-def plot_books_per_year(df):
-    series = (
+def books_per_year(df) -> pd.Series:
+    return (
         df["Year-Of-Publication"]
         .value_counts()
         .sort_index()
         .loc[lambda s: (s.index >= 1900) & (s.index <= 2025)]
     )
+
+
+def top_entities(df, column: str, top_n: int = 20) -> pd.Series:
+    return df[column].value_counts().head(top_n)
+
+
+def plot_books_per_year(df):
+    render_books_per_year(books_per_year(df))
+
+
+def render_books_per_year(series: pd.Series):
     fig, ax = plt.subplots()
     ax.plot(series.index, series.values, color="#2563eb")
     ax.set_title("Books Published Per Year (1900-2025)")
@@ -48,7 +59,10 @@ def plot_books_per_year(df):
 
 
 def plot_top_entities(df, column: str, title: str, filename: str, top_n: int = 20):
-    series = df[column].value_counts().head(top_n)
+    render_top_entities(top_entities(df, column, top_n), title, filename)
+
+
+def render_top_entities(series: pd.Series, title: str, filename: str):
     fig, ax = plt.subplots()
     series.sort_values().plot(kind="barh", ax=ax, color="#9333ea")
     ax.set_title(title)
@@ -56,12 +70,15 @@ def plot_top_entities(df, column: str, title: str, filename: str, top_n: int = 2
     save_plot(fig, filename)
 
 
+def with_numeric_years(df: pd.DataFrame) -> pd.DataFrame:
+    years = pd.to_numeric(df["Year-Of-Publication"], errors="coerce")
+    df = df.assign(**{"Year-Of-Publication": years}).dropna(subset=["Year-Of-Publication"])
+    return df.astype({"Year-Of-Publication": int})
+
+
 def main():
     ensure_directories()
-    df = pd.read_csv(RAW_DATA_DIR / "Books.csv", low_memory=False)
-    df["Year-Of-Publication"] = pd.to_numeric(df["Year-Of-Publication"], errors="coerce")
-    df = df.dropna(subset=["Year-Of-Publication"])
-    df["Year-Of-Publication"] = df["Year-Of-Publication"].astype(int)
+    df = with_numeric_years(pd.read_csv(RAW_DATA_DIR / "Books.csv", low_memory=False))
 
     plot_books_per_year(df)
     plot_top_entities(df, "Book-Author", "Top Authors by Book Count", "top_authors.png")
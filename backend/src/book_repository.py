@@ -2,18 +2,103 @@
 
 from __future__ import annotations
 
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
-from .config import DEFAULT_SEARCH_LIMIT
+from .config import DEFAULT_SEARCH_LIMIT, SEARCH_CACHE_MAX_BYTES, SEARCH_CACHE_TTL_S
+from .memory import nbytes, structure_report
+from .title_index import TitleIndex
+
+try:
+    import pyarrow  # noqa: F401
+
+    TEXT_DTYPE = "string[pyarrow]"
+except ImportError:  # pragma: no cover - Arrow strings are optional
+    TEXT_DTYPE = "object"
+
+TEXT_COLUMNS = ("ISBN", "Book-Title", "Image-URL-S", "Image-URL-M", "Image-URL-L")
+CATEGORY_COLUMNS = ("Book-Author", "Publisher")
 
 
 def _safe_str(value) -> str:
     return value if isinstance(value, str) else ""
 
 
+def compact_books_frame(books_df: pd.DataFrame) -> pd.DataFrame:
+    """Catalog frame with compact dtypes, sorted by ``book_id``.
+
+    Free text and URLs become Arrow-backed strings (when pyarrow is
+    installed), author and publisher become categoricals (missing values are
+    stored as "Unknown"), years int16 and ids int32. Missing titles (the CSV
+    reader turns titles such as "NA" or "null" into NaN) become empty strings.
+    """
+    df = books_df.sort_values("book_id").reset_index(drop=True)
+    compact = pd.DataFrame({"book_id": df["book_id"].to_numpy(dtype=np.int32)})
+    for column in TEXT_COLUMNS:
+        if column in df:
+            compact[column] = df[column].astype(TEXT_DTYPE)
+    compact["Book-Title"] = compact["Book-Title"].fillna("")
+    for column in CATEGORY_COLUMNS:
+        compact[column] = df[column].fillna("Unknown").astype("category")
+    years = pd.to_numeric(df["Year-Of-Publication"], errors="coerce")
+    compact["Year-Of-Publication"] = years.astype(np.int16) if years.notna().all() else years.astype("Int16")
+    compact["title_lower"] = compact["Book-Title"].str.lower()
+    return compact
+
+
+class MatchCache:
+    """Short-lived cache of search hits (read-only index arrays) bounded by total bytes.
+
+    Entries expire after ``ttl`` seconds; beyond ``max_bytes`` the least
+    recently used ones are evicted, and a single result larger than the whole
+    budget is not kept at all.
+    """
+
+    def __init__(self, max_bytes: int = SEARCH_CACHE_MAX_BYTES, ttl: float = SEARCH_CACHE_TTL_S):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.nbytes = 0
+        self._items: "OrderedDict[str, Tuple[float, np.ndarray]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            if item[0] < time.monotonic():
+                self._discard(key)
+                return None
+            self._items.move_to_end(key)
+            return item[1]
+
+    def put(self, key: str, indices: np.ndarray) -> None:
+        if indices.nbytes > self.max_bytes:
+            return
+        indices.flags.writeable = False
+        with self._lock:
+            self._discard(key)
+            self._items[key] = (time.monotonic() + self.ttl, indices)
+            self.nbytes += indices.nbytes
+            while self.nbytes > self.max_bytes:
+                self._discard(next(iter(self._items)))
+
+    def _discard(self, key: str) -> None:
+        item = self._items.pop(key, None)
+        if item is not None:
+            self.nbytes -= item[1].nbytes
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
 @dataclass
 class BookRecord:
     book_id: int
@@ -41,65 +126,198 @@ class BookRecord:
 
 
 class BookRepository:
-    """Provides search utilities over the cleaned books dataset."""
+    """Provides search utilities over the cleaned books dataset.
 
-    def __init__(self, books_df: pd.DataFrame):
-        df = books_df.copy()
-        df["title_lower"] = df["Book-Title"].str.lower()
-        df["author"] = df["Book-Author"].fillna("Unknown")
-        df["publisher"] = df["Publisher"].fillna("Unknown")
+    Every book is addressed internally by its dense int32 catalog index (its
+    row position in ``df``). Recommenders, caches and precomputed tables all
+    use this index; ISBN strings and public ``book_id`` values are only
+    translated at the API boundary.
 
+    ``df`` is the only copy of the catalog (see ``compact_books_frame``);
+    per-book lookups read straight from its column arrays.
+    """
+
+    def __init__(self, books_df: pd.DataFrame):
+        df = compact_books_frame(books_df)
         self.df = df
-        self.by_id = {}
-        for _, row in df.iterrows():
-            record = BookRecord(
-                book_id=int(row.book_id),
-                isbn=row.ISBN,
-                title=row["Book-Title"],
-                author=row["author"],
-                publisher=row["publisher"],
-                year=int(row["Year-Of-Publication"]) if not pd.isna(row["Year-Of-Publication"]) else None,
-                image_url_s=_safe_str(row.get("Image-URL-S", "")),
-                image_url_m=_safe_str(row.get("Image-URL-M", "")),
-                image_url_l=_safe_str(row.get("Image-URL-L", "")),
-            )
-            self.by_id[str(record.book_id)] = record
-        self.by_isbn = {record.isbn: record for record in self.by_id.values()}
-
-    def _serialize_rows(self, rows: pd.DataFrame) -> List[Dict]:
-        return [self.by_id[str(int(row.book_id))].to_dict() for _, row in rows.iterrows()]
-
-    def search(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> List[Dict]:
-        """Case-insensitive substring search."""
+
+        self.book_ids = df["book_id"].to_numpy()
+        self.book_ids.flags.writeable = False
+        # clean_books assigns book_id = row number, so the public id is the index.
+        self._ids_are_dense = bool(np.array_equal(self.book_ids, np.arange(len(df))))
+        self._id_index = None if self._ids_are_dense else pd.Index(self.book_ids)
+        self.isbns = df["ISBN"].array
+        self.isbn_index = pd.Index(df["ISBN"])
+
+        # Content hash of everything served to clients; changes whenever the catalog does.
+        row_hashes = pd.util.hash_pandas_object(df.drop(columns=["title_lower"]), index=False)
+        self.version = hashlib.sha1(row_hashes.to_numpy().tobytes()).hexdigest()[:16]
+
+        self._years = df["Year-Of-Publication"].array
+        self._titles = df["Book-Title"].array
+        self._authors = df["Book-Author"].array
+        self._publishers = df["Publisher"].array
+        self._images = {
+            column: df[column].array if column in df else None for column in ("Image-URL-S", "Image-URL-M", "Image-URL-L")
+        }
+        # Built on demand by build_title_index (it needs rating counts for ranking).
+        self.title_index: Optional[TitleIndex] = None
+        self.search_cache = MatchCache()
+
+    # Index translation -----------------------------------------------------
+
+    @property
+    def num_books(self) -> int:
+        return len(self.book_ids)
+
+    def index_of_id(self, book_id) -> Optional[int]:
+        try:
+            value = int(str(book_id).strip())
+        except ValueError:
+            return None
+        if self._ids_are_dense:
+            return value if 0 <= value < self.num_books else None
+        position = self._id_index.get_indexer([value])[0]
+        return int(position) if position >= 0 else None
+
+    def index_of_isbn(self, isbn: str) -> Optional[int]:
+        position = self.isbn_index.get_indexer([str(isbn)])[0]
+        return int(position) if position >= 0 else None
+
+    def indices_of_isbns(self, isbns: Iterable[str]) -> np.ndarray:
+        """Vectorized ISBN -> catalog index; unknown ISBNs map to -1."""
+        return self.isbn_index.get_indexer(pd.Index(isbns)).astype(np.int32)
+
+    def counts_by_index(self, stats: pd.DataFrame, column: str = "rating_count") -> np.ndarray:
+        """Per-ISBN ``stats[column]`` as a catalog-aligned array (0 for unrated books)."""
+        counts = np.zeros(self.num_books, dtype=np.float64)
+        indices = self.indices_of_isbns(stats["ISBN"])
+        keep = indices >= 0
+        counts[indices[keep]] = stats[column].to_numpy(dtype=np.float64)[keep]
+        return counts
+
+    def with_book_index(self, ratings: pd.DataFrame) -> pd.DataFrame:
+        """Attach an int32 ``book_index`` column and drop ratings outside the catalog."""
+        indices = self.indices_of_isbns(ratings["ISBN"])
+        keep = indices >= 0
+        ratings = ratings[keep].copy()
+        ratings["book_index"] = indices[keep]
+        return ratings
+
+    # Serialization ---------------------------------------------------------
+
+    def _year(self, index: int) -> Optional[int]:
+        year = self._years[index]
+        return None if pd.isna(year) else int(year)
+
+    def _image(self, column: str, index: int) -> str:
+        values = self._images[column]
+        return "" if values is None else _safe_str(values[index])
+
+    def record(self, index: int) -> BookRecord:
+        return BookRecord(
+            book_id=int(self.book_ids[index]),
+            isbn=self.isbns[index],
+            title=self._titles[index],
+            author=self._authors[index],
+            publisher=self._publishers[index],
+            year=self._year(index),
+            image_url_s=self._image("Image-URL-S", index),
+            image_url_m=self._image("Image-URL-M", index),
+            image_url_l=self._image("Image-URL-L", index),
+        )
+
+    def payload(self, index: int, score: Optional[float] = None) -> Dict:
+        """Build the API dict for one book straight from the column arrays."""
+        book = self.record(index).to_dict()
+        if score is not None:
+            book["score"] = round(float(score), 4)
+        return book
+
+    def payloads(self, scored) -> List[Dict]:
+        """Render ``ScoredBook``-like ``(index, score)`` pairs for the API."""
+        return [self.payload(index, score) for index, score in scored]
+
+    def _serialize_positions(self, positions: Iterable[int]) -> List[Dict]:
+        return [self.payload(int(position)) for position in positions]
+
+    # Lookups ---------------------------------------------------------------
+
+    def search_matches(self, query: str) -> np.ndarray:
+        """All catalog indices (ascending) whose title contains ``query``, case-insensitively.
+
+        The full hit list is cached per normalized query, so paging through
+        it costs a slice rather than another scan over every title.
+        """
         sanitized = query.strip().lower()
         if not sanitized:
-            return []
-        mask = self.df["title_lower"].str.contains(sanitized, na=False, regex=False)
-        rows = self.df[mask].head(limit)
-        return self._serialize_rows(rows)
+            return np.empty(0, dtype=np.int32)
+        matches = self.search_cache.get(sanitized)
+        if matches is None:
+            mask = self.df["title_lower"].str.contains(sanitized, na=False, regex=False)
+            mask = mask.to_numpy(dtype=bool, na_value=False)
+            matches = np.flatnonzero(mask).astype(np.int32)
+            self.search_cache.put(sanitized, matches)
+        return matches
+
+    def search_page(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT, offset: int = 0) -> Tuple[np.ndarray, int]:
+        """``limit`` matching indices starting at ``offset``, plus the total number of hits."""
+        matches = self.search_matches(query)
+        return matches[offset : offset + limit], len(matches)
+
+    def search_indices(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT, offset: int = 0) -> np.ndarray:
+        """Catalog indices of a case-insensitive substring search."""
+        return self.search_page(query, limit, offset)[0]
+
+    def search(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT, offset: int = 0) -> List[Dict]:
+        """Case-insensitive substring search."""
+        return self._serialize_positions(self.search_indices(query, limit, offset))
 
     def get_by_id(self, book_id: str) -> Optional[Dict]:
-        record = self.by_id.get(str(book_id))
-        return record.to_dict() if record else None
+        index = self.index_of_id(book_id)
+        return self.payload(index) if index is not None else None
 
     def get_by_isbn(self, isbn: str) -> Optional[Dict]:
-        record = self.by_isbn.get(str(isbn))
-        return record.to_dict() if record else None
+        index = self.index_of_isbn(isbn)
+        return self.payload(index) if index is not None else None
 
-    def find_exact_by_title(self, title: str) -> Optional[Dict]:
+    def find_exact_index(self, title: str) -> Optional[int]:
         sanitized = title.strip().lower()
-        match = self.df[self.df["title_lower"] == sanitized]
-        if match.empty:
-            return None
-        return self.get_by_id(str(int(match.iloc[0].book_id)))
+        matches = np.flatnonzero((self.df["title_lower"] == sanitized).to_numpy(dtype=bool, na_value=False))
+        return int(matches[0]) if matches.size else None
+
+    def find_exact_by_title(self, title: str) -> Optional[Dict]:
+        index = self.find_exact_index(title)
+        return self.payload(index) if index is not None else None
+
+    def build_title_index(self, popularity: Optional[np.ndarray] = None) -> TitleIndex:
+        """Enable typo-tolerant ``suggest_titles``; ties are broken by ``popularity``."""
+        self.title_index = TitleIndex(self.df["Book-Title"], popularity)
+        return self.title_index
 
     def suggest_titles(self, query: str, limit: int = 5) -> List[str]:
+        """Closest titles within a few edits (with a title index), else substring matches."""
+        if self.title_index is not None:
+            indices = self.title_index.suggest(query, limit)
+            if indices.size:
+                return [self._titles[index] for index in indices.tolist()]
         sanitized = query.strip().lower()
         mask = self.df["title_lower"].str.contains(sanitized, na=False, regex=False)
-        return self.df[mask]["Book-Title"].head(limit).tolist()
+        return self.df[mask.to_numpy(dtype=bool, na_value=False)]["Book-Title"].head(limit).tolist()
 
     def iter_books(self) -> List[BookRecord]:
-        return list(self.by_id.values())
+        return [self.record(index) for index in range(self.num_books)]
 
     def get_dataframe(self) -> pd.DataFrame:
-        return self.df.copy()
+        """Shallow view of the catalog frame; callers derive new frames instead of mutating it."""
+        return self.df.copy(deep=False)
+
+    def memory_report(self) -> Dict[str, int]:
+        """Bytes held per catalog structure (one entry per ``df`` column)."""
+        report = {f"df[{column}]": int(size) for column, size in self.df.memory_usage(index=False, deep=True).items()}
+        report["isbn_index"] = nbytes(self.isbn_index)
+        report["id_index"] = nbytes(self._id_index) if self._id_index is not None else 0
+        if self.title_index is not None:
+            report["title_index"] = sum(structure_report(self.title_index, min_bytes=0).values())
+        report["search_cache"] = self.search_cache.nbytes
+        return report
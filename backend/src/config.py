@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import os
 from pathlib import Path
 
 # Base directories ---------------------------------------------------------
@@ -24,17 +25,84 @@ def ensure_directories() -> None:
 MIN_VALID_YEAR = 1800
 MAX_VALID_YEAR = 2025
 
+# Rows per chunk for streaming CSV ingestion
+INGEST_CHUNK_SIZE = 100_000
+
 # Collaborative filtering thresholds --------------------------------------
 
 CF_MIN_BOOK_RATINGS = 40
 CF_MIN_USER_RATINGS = 40
 
+# Item-based CF neighbour table --------------------------------------------
+
+ITEM_CF_MIN_BOOK_RATINGS = 2
+ITEM_CF_MIN_USER_RATINGS = 2
+ITEM_CF_INCLUDE_IMPLICIT = True
+ITEM_CF_WEIGHTING = "bm25"  # "bm25" or "cosine"
+ITEM_CF_BM25_K1 = 100.0
+ITEM_CF_BM25_B = 0.8
+ITEM_CF_NEIGHBORS = 50
+ITEM_CF_MAX_USER_DEGREE = 1000  # heavier users are subsampled to this many books
+ITEM_CF_SEED = 42
+ITEM_CF_CHUNK_SIZE = 512
+ITEM_CF_CHUNK_MAX_NNZ = 5_000_000  # similarity entries per in-flight chunk
+ITEM_CF_WORKERS = None  # defaults to os.cpu_count()
+
+# Pixie-style random walks on the user-book rating graph --------------------
+
+PIXIE_INCLUDE_IMPLICIT = True
+PIXIE_MAX_USER_DEGREE = 2000  # users who rated more books than this are pruned
+PIXIE_RESTART_PROBABILITY = 0.3  # chance a walker jumps back to the query book per hop
+PIXIE_MAX_STEPS = 100_000  # book -> user -> book hops per request, across all walkers
+PIXIE_BATCH_SIZE = 2048  # walkers advanced together in one vectorized step
+PIXIE_STOP_BOOKS = 100  # stop early once this many books ...
+PIXIE_STOP_VISITS = 20  # ... have been visited at least this often
+PIXIE_WORKERS = None  # defaults to os.cpu_count()
+PIXIE_SEED = 42
+
+# Content-based TF-IDF similarity ------------------------------------------
+
+TFIDF_TITLE_WEIGHT = 1.0
+TFIDF_AUTHOR_WEIGHT = 0.8
+TFIDF_PUBLISHER_WEIGHT = 0.3
+TFIDF_MAX_DF = 0.05  # drop title words found in more than 5% of titles
+TFIDF_NEIGHBORS = 50
+TFIDF_PRECOMPUTE = True  # False: answer with an on-demand sparse dot product
+TFIDF_CHUNK_SIZE = 1024
+TFIDF_WORKERS = None  # defaults to os.cpu_count()
+TFIDF_INDEX_DIRNAME = "tfidf_index"
+
+# Algorithms instantiated by the engine (ids from recommendation/registry.py).
+# None enables all of them; a worker that needs only some of them skips the
+# other models' libraries entirely.
+ENABLED_ALGORITHMS = None
+
 # LightGBM pairwise trainer settings --------------------------------------
 
 LGB_MAX_POSITIVE_PAIRS = 60000
 LGB_MAX_BOOKS_PER_USER = 25
 LGB_CANDIDATE_POOL_SIZE = 2000
 LGB_RANDOM_STATE = 42
+LGB_SCORE_CHUNK_SIZE = 128
+# Inference path: "booster" (raw Booster.predict on contiguous float64 arrays;
+# float32 inputs shift split decisions and scores), "numpy" (flattened tree
+# evaluator) or "sklearn" (LGBMClassifier.predict_proba).
+LGB_PREDICTOR = "booster"
+LGB_NUM_THREADS = 1  # small per-request batches do not amortize a thread pool
+
+# Candidate retrieval ahead of LightGBM ranking ---------------------------
+
+RETRIEVAL_POOL_SIZE = 400
+RETRIEVAL_SOURCE_LIMITS = {
+    "corating": 150,
+    "embedding": 100,
+    "author": 50,
+    "title": 60,
+    "publisher": 40,
+    "popular": 100,
+}
+RETRIEVAL_MAX_CORATING_USERS = 500
+RETRIEVAL_MAX_POSTING_LENGTH = 5000
 
 # DIN recommender settings -------------------------------------------------
 
@@ -54,9 +122,102 @@ DIN_MIN_POSITIVE_RATING = 6
 DIN_MAX_HISTORIES_PER_ITEM = 24
 DIN_SCORE_BATCH_SIZE = 256
 DIN_CANDIDATE_POOL_SIZE = 1500
+DIN_CONTEXT_MMAP = False  # save the context arena and serve it memory-mapped
+DIN_CONTEXT_DIRNAME = "din_contexts"
+
+# Popularity fallback -----------------------------------------------------
+
+POPULARITY_PRIOR_WEIGHT = 10.0  # pseudo-ratings pulling averages to the global mean
+
+# Hybrid blending ---------------------------------------------------------
+
+HYBRID_ALGORITHMS = ("lightgbm", "din_content", "cf_mf", "item_cf")
+HYBRID_WEIGHTS = {"lightgbm": 1.0, "din_content": 0.8, "cf_mf": 0.6, "item_cf": 0.8}
+HYBRID_FUSION = "rrf"  # "rrf" or "weighted"
+HYBRID_RRF_K = 60
+HYBRID_DEADLINE_MS = 300
+HYBRID_CANDIDATE_MULTIPLIER = 3
+HYBRID_MAX_WORKERS = 8
+
+# Personalized (per-user) recommendations ----------------------------------
+
+USER_RESULT_CACHE_SIZE = 10000
+USER_HISTORY_PREVIEW = 5  # recent books echoed back by /recommendations/for-user
+
+# Access log, result cache and warming ---------------------------------------
+# BOOKREC_ACCESS_LOG appends one JSON line per book/recommendation request
+# (path, query, status, latency); replay it with `python -m src.services.replay`.
+# BOOKREC_WARM_LOG names a previous log whose most frequent recommendation
+# requests are computed into the engine's result cache at startup.
+
+ACCESS_LOG_PATH = os.environ.get("BOOKREC_ACCESS_LOG") or None
+WARM_LOG_PATH = os.environ.get("BOOKREC_WARM_LOG") or None
+WARM_TOP_N = int(os.environ.get("BOOKREC_WARM_TOP_N", "500"))
+RESULT_CACHE_SIZE = 20000  # complete per-book results kept by the engine (hybrid blends excluded)
+
+# Offline evaluation settings ----------------------------------------------
+
+EVAL_TOP_K = 10
+EVAL_HOLDOUT_SIZE = 1
+EVAL_MIN_USER_RATINGS = 5
+EVAL_MAX_USERS = 500
+EVAL_RANDOM_STATE = 42
+EVAL_SWEEP_GRID = {
+    "LGB_CANDIDATE_POOL_SIZE": (500, 1000, 2000, 4000),
+    "RETRIEVAL_POOL_SIZE": (100, 200, 400, 800),
+    "DIN_CANDIDATE_POOL_SIZE": (500, 1000, 1500, 3000),
+    "DIN_MAX_HISTORIES_PER_ITEM": (8, 16, 24, 48),
+    "CF_MIN_BOOK_RATINGS": (10, 20, 40),
+    "CF_MIN_USER_RATINGS": (10, 20, 40),
+    "ITEM_CF_MIN_BOOK_RATINGS": (2, 5, 10),
+}
+
+# HTTP caching -------------------------------------------------------------
+
+MODEL_VERSION = "1"  # bump when algorithm changes alter recommendations for the same data
+CACHE_MAX_AGE_BOOK = 86400
+CACHE_MAX_AGE_SEARCH = 300
+CACHE_MAX_AGE_ALGORITHMS = 3600
+CACHE_MAX_AGE_RECOMMENDATIONS = 600
+# Book JSON fragments are cached for every book in full; projected (fields=)
+# fragments only for this many recently used projections.
+FRAGMENT_PROJECTION_CACHE_SIZE = 8
+
+# Response compression (gzip always, brotli when the module is installed) --
+
+COMPRESSION_MIN_BYTES = 1024
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4
+
+# Typo-tolerant title suggestions (/recommendations/by-title) --------------
+
+TITLE_SUGGEST_MAX_EDITS = 2  # also capped at one edit per four query characters
+TITLE_SUGGEST_MAX_CANDIDATES = 300  # trigram survivors verified by edit distance
+
+# Sharded serving ----------------------------------------------------------
+# Every node answers recommendations for the books whose hashed book_id falls
+# in its shard (src/sharding.py) and keeps per-book tables only for those.
+# Set per process, e.g. BOOKREC_SHARD_INDEX=1 BOOKREC_SHARD_COUNT=3 BOOKREC_PORT=8002.
+
+SHARD_COUNT = int(os.environ.get("BOOKREC_SHARD_COUNT", "1"))
+SHARD_INDEX = int(os.environ.get("BOOKREC_SHARD_INDEX", "0"))
+SERVICE_PORT = int(os.environ.get("BOOKREC_PORT", "8000"))
+# Base URLs of the nodes behind src/services/router.py, in shard order.
+SHARD_NODES = tuple(url.rstrip("/") for url in os.environ.get("BOOKREC_SHARD_NODES", "").split(",") if url)
+ROUTER_TIMEOUT_S = 10
+BATCH_MAX_BOOKS = 100  # book ids accepted by /recommendations/batch
 
 # General defaults ---------------------------------------------------------
 
 DEFAULT_TOP_K = 5
 DEFAULT_SEARCH_LIMIT = 10
+# Matching catalog indices per normalized search query, so later pages are
+# slices instead of another scan over every title.
+SEARCH_CACHE_MAX_BYTES = 32 * 1024 * 1024
+SEARCH_CACHE_TTL_S = 300
+DEFAULT_REQUEST_TIMEOUT_MS = 3000
+MAX_REQUEST_TIMEOUT_MS = 30000
+# Wait limit for a request sharing an identical in-flight computation when it
+# has no deadline of its own.
+SINGLE_FLIGHT_TIMEOUT_MS = 3000
 
@@ -2,12 +2,15 @@
 
 from __future__ import annotations
 
+import argparse
 from pathlib import Path
-from typing import Tuple
+from typing import Dict, Iterator, Optional, Set, Tuple
 
+import numpy as np
 import pandas as pd
 
 from .config import (
+    INGEST_CHUNK_SIZE,
     MAX_VALID_YEAR,
     MIN_VALID_YEAR,
     PROCESSED_DATA_DIR,
@@ -16,6 +19,19 @@ from .config import (
 )
 
 CLEANED_BOOKS_FILENAME = "cleaned_books.csv"
+EXPLICIT_RATINGS_FILENAME = "explicit_ratings.csv"
+
+# Explicit dtypes keep pandas from inferring (and re-inferring per chunk) and
+# stop numeric-looking ISBNs from losing their leading zeros.
+BOOK_TEXT_COLUMNS = ["ISBN", "Book-Title", "Book-Author", "Publisher", "Image-URL-S", "Image-URL-M", "Image-URL-L"]
+RAW_BOOK_DTYPES: Dict[str, type] = {**{column: str for column in BOOK_TEXT_COLUMNS}, "Year-Of-Publication": str}
+CLEAN_BOOK_DTYPES: Dict[str, object] = {
+    **{column: str for column in BOOK_TEXT_COLUMNS},
+    "Year-Of-Publication": "int16",
+    "book_id": "int32",
+}
+RATING_COLUMNS = ["User-ID", "ISBN", "Book-Rating"]
+RATING_DTYPES: Dict[str, object] = {"User-ID": "int32", "ISBN": str, "Book-Rating": "int8"}
 
 
 def _read_csv(path: Path, **kwargs) -> pd.DataFrame:
@@ -39,21 +55,28 @@ def load_raw_users() -> pd.DataFrame:
     return _read_csv(RAW_DATA_DIR / "Users.csv")
 
 
-def clean_books(raw_df: pd.DataFrame) -> pd.DataFrame:
-    """Apply data cleaning rules required by the project rubric."""
-    df = raw_df.copy()
+def ratings_fingerprint() -> str:
+    """Cheap change marker for the ratings file (size + modification time)."""
+    stat = (RAW_DATA_DIR / "Ratings.csv").stat()
+    return f"{stat.st_size}-{stat.st_mtime_ns}"
+
 
+def _apply_cleaning_rules(df: pd.DataFrame) -> pd.DataFrame:
+    """Row-local cleaning rules; ``df`` is modified in place and filtered."""
     df["Book-Title"] = df["Book-Title"].fillna("").str.strip()
     df["Book-Author"] = df["Book-Author"].fillna("Unknown").str.strip()
     df["Publisher"] = df["Publisher"].fillna("Unknown").str.strip()
 
-    df = df[df["Book-Title"] != ""]
-    df = df[df["ISBN"].notna()]
+    df = df[(df["Book-Title"] != "") & df["ISBN"].notna()]
 
-    df["Year-Of-Publication"] = pd.to_numeric(df["Year-Of-Publication"], errors="coerce")
-    mask_year = df["Year-Of-Publication"].between(MIN_VALID_YEAR, MAX_VALID_YEAR)
-    df = df[mask_year]
-    df["Year-Of-Publication"] = df["Year-Of-Publication"].astype(int)
+    years = pd.to_numeric(df["Year-Of-Publication"], errors="coerce")
+    mask_year = years.between(MIN_VALID_YEAR, MAX_VALID_YEAR)
+    return df[mask_year].assign(**{"Year-Of-Publication": years[mask_year].astype(int)})
+
+
+def clean_books(raw_df: pd.DataFrame) -> pd.DataFrame:
+    """Apply data cleaning rules required by the project rubric."""
+    df = _apply_cleaning_rules(raw_df.copy())
 
     df = df.drop_duplicates(subset="ISBN").reset_index(drop=True)
     df["book_id"] = df.index.astype(int)
@@ -61,26 +84,132 @@ def clean_books(raw_df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
+def iter_raw_books(path: Optional[Path] = None, chunk_size: int = INGEST_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    """Read ``Books.csv`` in chunks with explicit string dtypes."""
+    path = path or RAW_DATA_DIR / "Books.csv"
+    if not path.exists():
+        raise FileNotFoundError(f"Expected data file is missing: {path}")
+    yield from pd.read_csv(path, dtype=RAW_BOOK_DTYPES, chunksize=chunk_size)
+
+
+def stream_clean_books(
+    source: Optional[Path] = None,
+    destination: Optional[Path] = None,
+    chunk_size: int = INGEST_CHUNK_SIZE,
+) -> Path:
+    """Chunked equivalent of ``clean_books`` that writes the result incrementally.
+
+    Each chunk gets the same rules as ``clean_books``; duplicates are dropped
+    against the set of ISBNs already written (keeping the first occurrence,
+    as ``drop_duplicates`` does), and ``book_id`` continues across chunks.
+    Peak memory is one chunk plus the ISBN set. The output is written to a
+    temporary file and renamed, so readers never see a half-written file.
+    """
+    ensure_directories()
+    destination = destination or PROCESSED_DATA_DIR / CLEANED_BOOKS_FILENAME
+    partial = destination.with_name(destination.name + ".partial")
+    seen: Set[str] = set()
+    next_id = 0
+
+    with partial.open("w", encoding="utf-8", newline="") as handle:
+        for chunk in iter_raw_books(source, chunk_size):
+            chunk = _apply_cleaning_rules(chunk)
+            chunk = chunk.drop_duplicates(subset="ISBN")
+            chunk = chunk[~chunk["ISBN"].isin(seen).to_numpy()]
+            seen.update(chunk["ISBN"].tolist())
+
+            chunk = chunk.reset_index(drop=True)
+            chunk["book_id"] = np.arange(next_id, next_id + len(chunk), dtype=np.int32)
+            next_id += len(chunk)
+            chunk.to_csv(handle, index=False, header=handle.tell() == 0)
+
+    partial.replace(destination)
+    return destination
+
+
+def read_clean_books(path: Optional[Path] = None) -> pd.DataFrame:
+    """Load a cleaned books CSV with the compact dtypes it was written with."""
+    path = path or PROCESSED_DATA_DIR / CLEANED_BOOKS_FILENAME
+    return pd.read_csv(path, dtype=CLEAN_BOOK_DTYPES)
+
+
 def get_clean_books() -> pd.DataFrame:
     """Return the cached cleaned dataset, generating it if needed."""
     ensure_directories()
     cleaned_path = PROCESSED_DATA_DIR / CLEANED_BOOKS_FILENAME
 
-    if cleaned_path.exists():
-        cleaned_df = pd.read_csv(cleaned_path)
-    else:
-        cleaned_df = clean_books(load_raw_books())
-        cleaned_df.to_csv(cleaned_path, index=False)
-    return cleaned_df
+    if not cleaned_path.exists():
+        stream_clean_books(destination=cleaned_path)
+    return read_clean_books(cleaned_path)
+
+
+def iter_ratings(
+    filtered: bool = True,
+    path: Optional[Path] = None,
+    chunk_size: int = INGEST_CHUNK_SIZE,
+) -> Iterator[pd.DataFrame]:
+    """Yield ratings chunks (int32 users, int8 ratings), optionally explicit-only."""
+    path = path or RAW_DATA_DIR / "Ratings.csv"
+    if not path.exists():
+        raise FileNotFoundError(f"Expected data file is missing: {path}")
+    reader = pd.read_csv(path, names=RATING_COLUMNS, header=0, dtype=RATING_DTYPES, chunksize=chunk_size)
+    for chunk in reader:
+        if filtered:
+            chunk = chunk[chunk["Book-Rating"].to_numpy() > 0]
+        yield chunk
 
 
 def get_ratings(filtered: bool = True) -> pd.DataFrame:
-    """Return ratings with optional filtering of implicit feedback."""
-    ratings = load_raw_ratings()
-    ratings.columns = ["User-ID", "ISBN", "Book-Rating"]
-    if filtered:
-        ratings = ratings[ratings["Book-Rating"] > 0]
-    return ratings
+    """Return ratings with optional filtering of implicit feedback.
+
+    Filtering happens per chunk, so implicit ratings never have to be held in
+    memory when only explicit ones are requested.
+    """
+    chunks = list(iter_ratings(filtered=filtered))
+    if not chunks:
+        return pd.DataFrame({column: pd.Series(dtype=RATING_DTYPES[column]) for column in RATING_COLUMNS})
+    return pd.concat(chunks, ignore_index=True)
+
+
+def stream_explicit_ratings(
+    destination: Optional[Path] = None,
+    known_isbns: Optional[Set[str]] = None,
+    chunk_size: int = INGEST_CHUNK_SIZE,
+) -> Path:
+    """Write explicit ratings (optionally restricted to ``known_isbns``) chunk by chunk.
+
+    Works on dumps far larger than RAM: only one chunk is held at a time.
+    """
+    ensure_directories()
+    destination = destination or PROCESSED_DATA_DIR / EXPLICIT_RATINGS_FILENAME
+    partial = destination.with_name(destination.name + ".partial")
+    with partial.open("w", encoding="utf-8", newline="") as handle:
+        for chunk in iter_ratings(filtered=True, chunk_size=chunk_size):
+            if known_isbns is not None:
+                chunk = chunk[chunk["ISBN"].isin(known_isbns).to_numpy()]
+            chunk.to_csv(handle, index=False, header=handle.tell() == 0)
+    partial.replace(destination)
+    return destination
+
+
+def stream_book_rating_stats(filtered: bool = True, chunk_size: int = INGEST_CHUNK_SIZE) -> pd.DataFrame:
+    """``get_book_rating_stats`` computed from partial sums, one chunk at a time."""
+    partials = []
+    for chunk in iter_ratings(filtered=filtered, chunk_size=chunk_size):
+        partials.append(chunk.groupby("ISBN")["Book-Rating"].agg(["count", "sum"]))
+        if len(partials) > 1:
+            # Fold eagerly so memory stays bounded by the number of distinct ISBNs.
+            partials = [pd.concat(partials).groupby(level=0).sum()]
+    if not partials:
+        return pd.DataFrame(columns=["ISBN", "rating_count", "avg_rating"])
+    totals = partials[0]
+    return pd.DataFrame(
+        {
+            "ISBN": totals.index.to_numpy(),
+            "rating_count": totals["count"].to_numpy(),
+            "avg_rating": totals["sum"].to_numpy() / totals["count"].to_numpy(),
+        }
+    )
 
 
 def get_users() -> pd.DataFrame:
@@ -102,3 +231,21 @@ def get_book_rating_stats(ratings: pd.DataFrame) -> pd.DataFrame:
         .reset_index()
     )
     return agg
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Streaming ingestion of the raw Book-Crossing CSVs")
+    parser.add_argument("--chunk-size", type=int, default=INGEST_CHUNK_SIZE)
+    parser.add_argument("--ratings", action="store_true", help="also write explicit ratings for catalog books")
+    args = parser.parse_args(argv)
+
+    books_path = stream_clean_books(chunk_size=args.chunk_size)
+    print(f"Cleaned books written to {books_path}")
+    if args.ratings:
+        known = set(read_clean_books(books_path)["ISBN"].tolist())
+        ratings_path = stream_explicit_ratings(known_isbns=known, chunk_size=args.chunk_size)
+        print(f"Explicit ratings written to {ratings_path}")
+
+
+if __name__ == "__main__":
+    main()
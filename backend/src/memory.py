@@ -0,0 +1,53 @@
+"""Approximate resident-size accounting for the structures the backend keeps in memory."""
+
+from __future__ import annotations
+
+import sys
+from typing import Dict, Iterable
+
+import numpy as np
+import pandas as pd
+
+
+def nbytes(value) -> int:
+    """Best-effort deep size in bytes of arrays, sparse matrices, frames and containers."""
+    if isinstance(value, np.ndarray):
+        # Memory-mapped arrays live in the page cache, not the process heap.
+        return 0 if isinstance(value, np.memmap) or isinstance(value.base, np.memmap) else value.nbytes
+    # Only check for sparse matrices if scipy is loaded; importing it here would
+    # slow down every lightweight tool that uses the catalog.
+    sparse = sys.modules.get("scipy.sparse")
+    if sparse is not None and sparse.issparse(value):
+        return sum(nbytes(getattr(value, name)) for name in ("data", "indices", "indptr") if hasattr(value, name))
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(index=True, deep=True).sum())
+    if isinstance(value, (pd.Series, pd.Index)):
+        return int(value.memory_usage(deep=True))
+    if hasattr(value, "element_size") and hasattr(value, "nelement"):  # torch tensors
+        return int(value.element_size() * value.nelement())
+    if callable(getattr(value, "parameters", None)) and hasattr(value, "state_dict"):  # torch modules
+        return sum(nbytes(tensor) for tensor in value.state_dict().values())
+    if isinstance(getattr(value, "nbytes", None), int):  # containers that report their own size
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(nbytes(key) + nbytes(item) for key, item in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(nbytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+def structure_report(obj, min_bytes: int = 1024, exclude: Iterable[str] = ("book_repo",)) -> Dict[str, int]:
+    """Bytes held by each attribute of ``obj`` that is at least ``min_bytes``.
+
+    Shared structures (the catalog by default) are excluded so they are only
+    counted once.
+    """
+    report = {}
+    skipped = set(exclude)
+    for name, value in vars(obj).items():
+        if name in skipped:
+            continue
+        size = nbytes(value)
+        if size >= min_bytes:
+            report[name] = size
+    return dict(sorted(report.items(), key=lambda item: item[1], reverse=True))
@@ -2,12 +2,22 @@
 
 from __future__ import annotations
 
+import time
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import List, NamedTuple, Optional
+
+import numpy as np
 
 from ...book_repository import BookRepository
 
 
+class ScoredBook(NamedTuple):
+    """One recommendation: dense catalog index plus optional score."""
+
+    index: int
+    score: Optional[float]
+
+
 @dataclass
 class AlgorithmInfo:
     id: str
@@ -19,23 +29,58 @@ class RecommendationError(Exception):
     """Raised when an algorithm cannot produce recommendations."""
 
 
+class RecommendationTimeout(RecommendationError):
+    """Raised when the request deadline passed before any result was ready."""
+
+
+class Deadline:
+    """Monotonic per-request time budget checked cooperatively by the algorithms."""
+
+    __slots__ = ("expires_at",)
+
+    def __init__(self, timeout_ms: float):
+        self.expires_at = time.monotonic() + max(float(timeout_ms), 0.0) / 1000.0
+
+    def remaining(self) -> float:
+        """Seconds left, never negative."""
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def earliest(self, timeout_ms: float) -> "Deadline":
+        """Return whichever of this deadline and ``timeout_ms`` from now ends first."""
+        other = Deadline(timeout_ms)
+        return other if other.expires_at < self.expires_at else self
+
+
+def deadline_expired(deadline: Optional[Deadline]) -> bool:
+    return deadline is not None and deadline.expired()
+
+
 class BaseRecommender:
-    """Common helper to map algorithm output to book payloads."""
+    """Common interface for algorithms; results are catalog indices, not payloads."""
 
     info: AlgorithmInfo
 
     def __init__(self, book_repo: BookRepository):
         self.book_repo = book_repo
 
-    def recommend(self, isbn: str, k: int) -> List[Dict]:
+    def recommend(self, book_index: int, k: int, deadline: Optional[Deadline] = None) -> List[ScoredBook]:
+        """Return up to ``k`` similar books for the catalog index ``book_index``.
+
+        Implementations with scoring loops check ``deadline`` between batches
+        and return the best results found so far once it has passed.
+        """
         raise NotImplementedError
 
-    def _format_result(self, isbn: str, score: Optional[float]) -> Optional[Dict]:
-        book = self.book_repo.get_by_isbn(isbn)
-        if not book:
-            return None
-        payload = book.copy()
-        if score is not None:
-            payload["score"] = round(float(score), 4)
-        return payload
+    def restrict_to(self, owned: np.ndarray) -> None:
+        """Drop per-query-book state for books outside the boolean mask ``owned``.
+
+        Used by sharded serving, where this node only answers for its own
+        books. State that candidate scoring still needs for every book is kept.
+        """
 
+    @staticmethod
+    def _scored(indices, scores) -> List[ScoredBook]:
+        return [ScoredBook(int(index), float(score)) for index, score in zip(indices, scores)]
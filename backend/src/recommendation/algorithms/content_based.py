@@ -2,10 +2,13 @@
 
 from __future__ import annotations
 
+import hashlib
+import os
 import random
 from collections import defaultdict
 from dataclasses import dataclass
-from typing import Dict, List, Sequence, Tuple
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
 
 import numpy as np
 import torch
@@ -15,6 +18,8 @@ from torch.utils.data import DataLoader, Dataset
 from ...config import (
     DIN_BATCH_SIZE,
     DIN_CANDIDATE_POOL_SIZE,
+    DIN_CONTEXT_DIRNAME,
+    DIN_CONTEXT_MMAP,
     DIN_EPOCHS,
     DIN_EMBED_DIM,
     DIN_ATTENTION_HIDDEN_UNITS,
@@ -29,9 +34,19 @@ from ...config import (
     DIN_NEGATIVE_SAMPLES,
     DIN_RANDOM_STATE,
     DIN_SCORE_BATCH_SIZE,
+    MODEL_VERSION,
+    PROCESSED_DATA_DIR,
 )
-from ...data_pipeline import get_ratings, get_users
-from .base import AlgorithmInfo, BaseRecommender, RecommendationError
+from ...data_pipeline import get_ratings, ratings_fingerprint
+from ...memory import nbytes
+from ..user_history import normalized_user_ages
+from .base import AlgorithmInfo, BaseRecommender, Deadline, RecommendationError, ScoredBook, deadline_expired
+
+# Embedding ids: 0 pads histories, 1 is shared by books outside the vocabulary
+# (never a training target; dropped from user histories at inference).
+PADDING_ID = 0
+OOV_ID = 1
+FIRST_ITEM_ID = 2
 
 
 def _seed_everything(seed: int) -> None:
@@ -47,6 +62,109 @@ class ContextBatch:
     user_features: torch.Tensor
 
 
+def _as_tensor(array: np.ndarray) -> torch.Tensor:
+    # torch cannot wrap read-only (memory-mapped) buffers; context slices are tiny to copy.
+    return torch.from_numpy(array if array.flags.writeable else array.copy())
+
+
+class ContextArena:
+    """All DIN behavioral contexts packed into contiguous arrays.
+
+    Context rows for catalog index ``b`` are ``offsets[b]:offsets[b + 1]`` of
+    ``histories`` (int32, ``[rows, DIN_MAX_HISTORY_LENGTH]``, left-padded with
+    0 and holding embedding ids), ``lengths`` (int32) and ``user_features``
+    (float32). A lookup is therefore a slice, and the arrays can be saved and
+    memory-mapped back.
+    """
+
+    ARRAYS = ("offsets", "histories", "lengths", "user_features")
+
+    def __init__(self, offsets: np.ndarray, histories: np.ndarray, lengths: np.ndarray, user_features: np.ndarray):
+        self.offsets = offsets
+        self.histories = histories
+        self.lengths = lengths
+        self.user_features = user_features
+
+    @classmethod
+    def build(
+        cls,
+        book_contexts: Dict[int, List[Tuple[List[int], float]]],
+        num_books: int,
+        max_history_len: int,
+    ) -> "ContextArena":
+        counts = np.zeros(num_books, dtype=np.int64)
+        for book_index, contexts in book_contexts.items():
+            counts[book_index] = len(contexts)
+        offsets = np.zeros(num_books + 1, dtype=np.int64)
+        np.cumsum(counts, out=offsets[1:])
+
+        total = int(offsets[-1])
+        histories = np.zeros((total, max_history_len), dtype=np.int32)
+        lengths = np.zeros(total, dtype=np.int32)
+        user_features = np.zeros((total, 1), dtype=np.float32)
+        for book_index, contexts in book_contexts.items():
+            row = offsets[book_index]
+            for history_indices, user_feature in contexts:
+                length = min(len(history_indices), max_history_len)
+                if length:
+                    histories[row, -length:] = history_indices[-length:]
+                lengths[row] = length
+                user_features[row, 0] = user_feature
+                row += 1
+        return cls(offsets, histories, lengths, user_features)
+
+    def __len__(self) -> int:
+        return int(self.offsets[-1])
+
+    @property
+    def nbytes(self) -> int:
+        return sum(nbytes(getattr(self, name)) for name in self.ARRAYS)
+
+    def count(self, book_index: int) -> int:
+        if not 0 <= book_index < len(self.offsets) - 1:
+            return 0
+        return int(self.offsets[book_index + 1] - self.offsets[book_index])
+
+    def batch(self, book_index: int) -> Optional[ContextBatch]:
+        """Contexts of one book, read straight from a slice of the arena."""
+        if not self.count(book_index):
+            return None
+        lo, hi = self.offsets[book_index], self.offsets[book_index + 1]
+        return self._tensors(slice(lo, hi))
+
+    def _tensors(self, rows) -> ContextBatch:
+        return ContextBatch(
+            _as_tensor(self.histories[rows]).long(),
+            _as_tensor(self.lengths[rows]).long(),
+            _as_tensor(self.user_features[rows]),
+        )
+
+    def restrict(self, owned: np.ndarray) -> "ContextArena":
+        """Arena holding only the contexts of books in the boolean mask ``owned``."""
+        counts = np.diff(self.offsets)
+        keep = np.repeat(owned, counts)
+        offsets = np.zeros_like(self.offsets)
+        np.cumsum(np.where(owned, counts, 0), out=offsets[1:])
+        return ContextArena(offsets, self.histories[keep], self.lengths[keep], self.user_features[keep])
+
+    def save(self, directory: Path) -> None:
+        # Workers may save the same arena concurrently: each writes its own
+        # partial files and renames them into place.
+        directory.mkdir(parents=True, exist_ok=True)
+        for name in self.ARRAYS:
+            partial = directory / f"{name}.{os.getpid()}.partial.npy"
+            np.save(partial, getattr(self, name))
+            partial.replace(directory / f"{name}.npy")
+
+    @classmethod
+    def saved(cls, directory: Path) -> bool:
+        return all((directory / f"{name}.npy").exists() for name in cls.ARRAYS)
+
+    @classmethod
+    def load(cls, directory: Path, mmap_mode: Optional[str] = "r") -> "ContextArena":
+        return cls(*(np.load(directory / f"{name}.npy", mmap_mode=mmap_mode) for name in cls.ARRAYS))
+
+
 class DinTrainingSample:
     __slots__ = ("history", "target", "label", "user_feature")
 
@@ -156,38 +274,79 @@ class DINContentRecommender(BaseRecommender):
         super().__init__(book_repo)
         _seed_everything(DIN_RANDOM_STATE)
         self.device = torch.device("cpu")
-        self.df = book_repo.get_dataframe()
-        self.isbn_to_index = {isbn: idx + 1 for idx, isbn in enumerate(self.df["ISBN"].tolist())}
-        self.index_to_isbn = {idx: isbn for isbn, idx in self.isbn_to_index.items()}
+        # Filled by _build_vocabulary: vocabulary[id - FIRST_ITEM_ID] is a catalog
+        # index and item_ids[catalog index] its embedding id (OOV_ID if unseen).
+        self.vocabulary = np.empty(0, dtype=np.int32)
+        self.item_ids = np.full(book_repo.num_books, OOV_ID, dtype=np.int32)
 
         self.user_age_map = self._build_user_age_map()
-        samples, book_contexts, candidate_isbns = self._prepare_training_samples()
+        samples, book_contexts, candidate_indices = self._prepare_training_samples()
         if not samples:
             raise RuntimeError("DIN recommender could not create training samples")
 
-        self.candidate_isbns = candidate_isbns
+        self.candidate_indices = candidate_indices
         self.model = self._train_model(samples)
-        self.context_store = self._build_context_store(book_contexts)
-        if not self.context_store:
+        self.contexts = ContextArena.build(book_contexts, self.book_repo.num_books, DIN_MAX_HISTORY_LENGTH)
+        if not len(self.contexts):
             raise RuntimeError("DIN recommender failed to capture any user contexts")
+        if DIN_CONTEXT_MMAP:
+            # Re-open from disk so forked workers share the arena through the page cache.
+            self.contexts = self._mapped(self.contexts, self._context_dir(book_repo.version))
+
+    @staticmethod
+    def _context_dir(catalog_version: str) -> Path:
+        settings = (
+            MODEL_VERSION,
+            catalog_version,
+            ratings_fingerprint(),
+            DIN_MAX_USERS,
+            DIN_MIN_HISTORY_LENGTH,
+            DIN_MAX_HISTORY_LENGTH,
+            DIN_MIN_POSITIVE_RATING,
+            DIN_MAX_HISTORIES_PER_ITEM,
+            DIN_MAX_TRAINING_SAMPLES,
+            DIN_NEGATIVE_SAMPLES,
+            DIN_CANDIDATE_POOL_SIZE,
+            DIN_RANDOM_STATE,
+        )
+        key = hashlib.sha1(repr(settings).encode("utf-8")).hexdigest()[:16]
+        return PROCESSED_DATA_DIR / DIN_CONTEXT_DIRNAME / key
+
+    @staticmethod
+    def _mapped(contexts: ContextArena, directory: Path) -> ContextArena:
+        if not ContextArena.saved(directory):
+            contexts.save(directory)
+        return ContextArena.load(directory)
+
+    def restrict_to(self, owned: np.ndarray) -> None:
+        contexts = self.contexts.restrict(owned)
+        if DIN_CONTEXT_MMAP:
+            # The restricted copy is private memory; map it back from its own file set.
+            owned_key = hashlib.sha1(np.packbits(owned).tobytes()).hexdigest()[:16]
+            contexts = self._mapped(contexts, self._context_dir(self.book_repo.version) / f"owned-{owned_key}")
+        self.contexts = contexts
 
     def _build_user_age_map(self) -> Dict[int, float]:
-        users = get_users()
-        users["Age"] = users["Age"].clip(lower=5, upper=90)
-        median_age = users["Age"].median()
-        users["Age"] = users["Age"].fillna(median_age)
-        min_age, max_age = users["Age"].min(), users["Age"].max()
-        denom = max(max_age - min_age, 1)
-        users["age_norm"] = (users["Age"] - min_age) / denom
-        return users.set_index("User-ID")["age_norm"].to_dict()
-
-    def _prepare_training_samples(self) -> Tuple[List[DinTrainingSample], Dict[str, List[Tuple[List[int], float]]], List[str]]:
+        return normalized_user_ages().to_dict()
+
+    def _build_vocabulary(self, book_indices: np.ndarray) -> None:
+        """Give embedding rows only to books that appear in training or the candidate pool."""
+        self.vocabulary = np.unique(book_indices).astype(np.int32)
+        self.item_ids[:] = OOV_ID
+        self.item_ids[self.vocabulary] = np.arange(FIRST_ITEM_ID, FIRST_ITEM_ID + self.vocabulary.size, dtype=np.int32)
+
+    @property
+    def num_items(self) -> int:
+        """Embedding rows besides padding: the OOV bucket plus the vocabulary."""
+        return FIRST_ITEM_ID - 1 + int(self.vocabulary.size)
+
+    def _prepare_training_samples(self) -> Tuple[List[DinTrainingSample], Dict[int, List[Tuple[List[int], float]]], np.ndarray]:
         ratings = get_ratings(filtered=True)
         ratings = ratings[ratings["Book-Rating"] >= DIN_MIN_POSITIVE_RATING]
         if ratings.empty:
             raise RuntimeError("DIN recommender requires positive ratings")
 
-        ratings = ratings[ratings["ISBN"].isin(self.isbn_to_index.keys())]
+        ratings = self.book_repo.with_book_index(ratings)
         if ratings.empty:
             raise RuntimeError("No overlapping ISBNs between ratings and catalog for DIN")
 
@@ -201,46 +360,46 @@ class DINContentRecommender(BaseRecommender):
         selected_users = eligible_users.sort_values(ascending=False).head(DIN_MAX_USERS).index.tolist()
         filtered = ratings[ratings["User-ID"].isin(selected_users)]
 
-        book_popularity = filtered["ISBN"].value_counts()
-        candidate_isbns = [isbn for isbn in book_popularity.index.tolist() if isbn in self.isbn_to_index][:DIN_CANDIDATE_POOL_SIZE]
-        if not candidate_isbns:
+        book_popularity = filtered["book_index"].value_counts()
+        candidate_indices = book_popularity.index.to_numpy(dtype=np.int32)[:DIN_CANDIDATE_POOL_SIZE]
+        if candidate_indices.size == 0:
             raise RuntimeError("DIN candidate pool is empty")
+        self._build_vocabulary(np.concatenate([filtered["book_index"].to_numpy(), candidate_indices]))
+        candidate_ids = self.item_ids[candidate_indices].tolist()
 
         samples: List[DinTrainingSample] = []
-        book_contexts: Dict[str, List[Tuple[List[int], float]]] = defaultdict(list)
+        book_contexts: Dict[int, List[Tuple[List[int], float]]] = defaultdict(list)
         rng = random.Random(DIN_RANDOM_STATE)
         max_samples = DIN_MAX_TRAINING_SAMPLES
 
         for user_id, group in filtered.groupby("User-ID"):
-            isbn_seq = [isbn for isbn in group["ISBN"].tolist() if isbn in self.isbn_to_index]
-            if len(isbn_seq) <= DIN_MIN_HISTORY_LENGTH:
+            item_seq = self.item_ids[group["book_index"].to_numpy()].tolist()
+            if len(item_seq) <= DIN_MIN_HISTORY_LENGTH:
                 continue
             age_norm = self.user_age_map.get(user_id, 0.5)
-            positive_set = set(isbn_seq)
+            positive_set = set(item_seq)
 
-            for idx in range(1, len(isbn_seq)):
-                history = isbn_seq[max(0, idx - DIN_MAX_HISTORY_LENGTH) : idx]
-                if len(history) < DIN_MIN_HISTORY_LENGTH:
+            for idx in range(1, len(item_seq)):
+                history_indices = item_seq[max(0, idx - DIN_MAX_HISTORY_LENGTH) : idx]
+                if len(history_indices) < DIN_MIN_HISTORY_LENGTH:
                     continue
-                target_isbn = isbn_seq[idx]
-                history_indices = [self.isbn_to_index[h] for h in history]
-                target_idx = self.isbn_to_index[target_isbn]
+                target_idx = item_seq[idx]
 
                 samples.append(DinTrainingSample(history_indices, target_idx, 1.0, age_norm))
                 if len(samples) >= max_samples:
                     break
 
-                if len(book_contexts[target_isbn]) < DIN_MAX_HISTORIES_PER_ITEM:
-                    book_contexts[target_isbn].append((history_indices, age_norm))
+                target_book = int(self.vocabulary[target_idx - FIRST_ITEM_ID])
+                if len(book_contexts[target_book]) < DIN_MAX_HISTORIES_PER_ITEM:
+                    book_contexts[target_book].append((history_indices, age_norm))
 
                 negatives_added = 0
                 attempts = 0
                 while negatives_added < DIN_NEGATIVE_SAMPLES and attempts < DIN_NEGATIVE_SAMPLES * 4:
-                    negative_isbn = rng.choice(candidate_isbns)
+                    negative_idx = rng.choice(candidate_ids)
                     attempts += 1
-                    if negative_isbn in positive_set:
+                    if negative_idx in positive_set:
                         continue
-                    negative_idx = self.isbn_to_index[negative_isbn]
                     samples.append(DinTrainingSample(history_indices, negative_idx, 0.0, age_norm))
                     negatives_added += 1
                     if len(samples) >= max_samples:
@@ -250,13 +409,12 @@ class DINContentRecommender(BaseRecommender):
             if len(samples) >= max_samples:
                 break
 
-        return samples, book_contexts, candidate_isbns
+        return samples, book_contexts, candidate_indices
 
     def _train_model(self, samples: List[DinTrainingSample]) -> DINModel:
         dataset = DinDataset(samples, max_history_len=DIN_MAX_HISTORY_LENGTH)
         loader = DataLoader(dataset, batch_size=DIN_BATCH_SIZE, shuffle=True, collate_fn=DinDataset.collate_fn)
-        num_items = len(self.isbn_to_index)
-        model = DINModel(num_items, DIN_EMBED_DIM, DIN_ATTENTION_HIDDEN_UNITS, DIN_MLP_HIDDEN_UNITS)
+        model = DINModel(self.num_items, DIN_EMBED_DIM, DIN_ATTENTION_HIDDEN_UNITS, DIN_MLP_HIDDEN_UNITS)
         model.to(self.device)
         optimizer = torch.optim.Adam(model.parameters(), lr=DIN_LEARNING_RATE)
         criterion = nn.BCEWithLogitsLoss()
@@ -278,60 +436,32 @@ class DINContentRecommender(BaseRecommender):
         model.eval()
         return model
 
-    def _build_context_store(self, book_contexts: Dict[str, List[Tuple[List[int], float]]]) -> Dict[str, ContextBatch]:
-        store: Dict[str, ContextBatch] = {}
-        for isbn, contexts in book_contexts.items():
-            if not contexts:
-                continue
-            histories = []
-            lengths = []
-            user_feats = []
-            for history_indices, user_feature in contexts:
-                padded = np.zeros(DIN_MAX_HISTORY_LENGTH, dtype=np.int64)
-                length = min(len(history_indices), DIN_MAX_HISTORY_LENGTH)
-                padded[-length:] = history_indices[-length:]
-                histories.append(padded)
-                lengths.append(length)
-                user_feats.append([user_feature])
-            histories_tensor = torch.tensor(histories, dtype=torch.long, device=self.device)
-            lengths_tensor = torch.tensor(lengths, dtype=torch.long, device=self.device)
-            user_feats_tensor = torch.tensor(user_feats, dtype=torch.float32, device=self.device)
-            store[isbn] = ContextBatch(histories_tensor, lengths_tensor, user_feats_tensor)
-        return store
-
-    def recommend(self, isbn: str, k: int) -> List[Dict]:
-        if isbn not in self.context_store:
+    def recommend(self, book_index: int, k: int, deadline: Optional[Deadline] = None) -> List[ScoredBook]:
+        contexts = self.contexts.batch(book_index)
+        if contexts is None:
             raise RecommendationError("DIN model has no behavioral context for this book")
 
-        target_index = self.isbn_to_index.get(isbn)
-        if not target_index:
-            raise RecommendationError("Book not found in DIN index")
-
-        contexts = self.context_store[isbn]
-        candidate_indices = [self.isbn_to_index[cand] for cand in self.candidate_isbns if cand != isbn]
+        candidate_indices = self.item_ids[self.candidate_indices[self.candidate_indices != book_index]].tolist()
         if not candidate_indices:
             raise RecommendationError("DIN candidate pool is empty after filtering")
 
-        scored = self._score_candidates(contexts, candidate_indices)
+        scored = self._score_candidates(contexts, candidate_indices, deadline)
         if not scored:
             raise RecommendationError("DIN scoring produced no candidates")
 
         scored.sort(key=lambda item: item[1], reverse=True)
-        results: List[Dict] = []
-        for idx, score in scored:
-            candidate_isbn = self.index_to_isbn.get(idx)
-            if not candidate_isbn:
-                continue
-            payload = self._format_result(candidate_isbn, score)
-            if payload:
-                results.append(payload)
-            if len(results) >= k:
-                break
+        results = [ScoredBook(int(self.vocabulary[item_id - FIRST_ITEM_ID]), score) for item_id, score in scored[:k]]
         if not results:
             raise RecommendationError("DIN recommender returned empty results")
         return results
 
-    def _score_candidates(self, contexts: ContextBatch, candidate_indices: List[int]) -> List[Tuple[int, float]]:
+    def _score_candidates(
+        self,
+        contexts: ContextBatch,
+        candidate_indices: List[int],
+        deadline: Optional[Deadline] = None,
+    ) -> List[Tuple[int, float]]:
+        """Score candidates batch by batch; stops early once ``deadline`` passes."""
         histories = contexts.histories
         lengths = contexts.lengths
         user_features = contexts.user_features
@@ -342,6 +472,8 @@ class DINContentRecommender(BaseRecommender):
         scored: List[Tuple[int, float]] = []
         with torch.no_grad():
             for start in range(0, len(candidate_indices), DIN_SCORE_BATCH_SIZE):
+                if scored and deadline_expired(deadline):
+                    break
                 batch_ids = candidate_indices[start : start + DIN_SCORE_BATCH_SIZE]
                 batch_size = len(batch_ids)
                 target_tensor = torch.tensor(batch_ids, dtype=torch.long, device=self.device).unsqueeze(1)
@@ -355,3 +487,38 @@ class DINContentRecommender(BaseRecommender):
                 probs = torch.sigmoid(logits).view(batch_size, ctx_count).mean(dim=1)
                 scored.extend(list(zip(batch_ids, probs.cpu().tolist())))
         return scored
+
+    def recommend_for_user(
+        self,
+        history: np.ndarray,
+        user_feature: float,
+        k: int,
+        deadline: Optional[Deadline] = None,
+    ) -> List[ScoredBook]:
+        """Score the candidate pool against one user's own history in a single forward pass."""
+        # The OOV row is never trained, so books outside the vocabulary are left
+        # out of the sequence rather than attended to as noise.
+        history_ids = self.item_ids[np.asarray(history, dtype=np.int64)]
+        recent = history_ids[history_ids != OOV_ID][-DIN_MAX_HISTORY_LENGTH:]
+        if recent.size == 0:
+            raise RecommendationError("User has no reading history in the DIN vocabulary")
+        candidates = self.candidate_indices[~np.isin(self.candidate_indices, history)]
+        if candidates.size == 0:
+            raise RecommendationError("User has already read every DIN candidate")
+
+        padded = torch.zeros(1, DIN_MAX_HISTORY_LENGTH, dtype=torch.long, device=self.device)
+        padded[0, -recent.size :] = torch.from_numpy(recent.astype(np.int64))
+        count = len(candidates)
+        with torch.no_grad():
+            logits = self.model(
+                torch.from_numpy(self.item_ids[candidates].astype(np.int64)).to(self.device),
+                padded.expand(count, -1),
+                torch.full((count,), recent.size, dtype=torch.long, device=self.device),
+                torch.full((count, 1), user_feature, dtype=torch.float32, device=self.device),
+            )
+        scores = torch.sigmoid(logits).cpu().numpy()
+
+        top = min(k, count)
+        part = np.argpartition(-scores, top - 1)[:top]
+        order = part[np.argsort(-scores[part], kind="stable")]
+        return self._scored(candidates[order], scores[order])
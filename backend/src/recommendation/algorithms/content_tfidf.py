@@ -0,0 +1,160 @@
+"""Content-based similarity over TF-IDF vectors of title, author and publisher."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from ...config import (
+    MODEL_VERSION,
+    PROCESSED_DATA_DIR,
+    TFIDF_AUTHOR_WEIGHT,
+    TFIDF_CHUNK_SIZE,
+    TFIDF_INDEX_DIRNAME,
+    TFIDF_MAX_DF,
+    TFIDF_NEIGHBORS,
+    TFIDF_PRECOMPUTE,
+    TFIDF_PUBLISHER_WEIGHT,
+    TFIDF_TITLE_WEIGHT,
+    TFIDF_WORKERS,
+)
+from .base import AlgorithmInfo, BaseRecommender, Deadline, RecommendationError, ScoredBook
+from .item_cf import build_neighbour_table, l2_normalize_rows, restrict_neighbour_table
+
+INDEX_ARRAYS = ("indptr", "indices", "scores")
+
+
+def _field_matrix(values: pd.Series) -> sparse.csr_matrix:
+    """One-hot rows for a categorical field; "Unknown" carries no signal and is left empty."""
+    codes, uniques = pd.factorize(values)
+    known = (codes >= 0) & (np.asarray(uniques, dtype=object)[codes] != "Unknown")
+    rows = np.flatnonzero(known)
+    data = np.ones(len(rows), dtype=np.float32)
+    return sparse.csr_matrix((data, (rows, codes[known])), shape=(len(values), len(uniques)))
+
+
+def build_content_vectors(books_df: pd.DataFrame) -> sparse.csr_matrix:
+    """L2-normalized rows of weighted [title TF-IDF | author | publisher] blocks."""
+    vectorizer = TfidfVectorizer(
+        stop_words="english",
+        max_df=TFIDF_MAX_DF if len(books_df) * TFIDF_MAX_DF >= 1 else 1.0,
+        sublinear_tf=True,
+        dtype=np.float32,
+    )
+    try:
+        titles = vectorizer.fit_transform(books_df["Book-Title"].fillna("").astype(str))
+    except ValueError as exc:  # empty vocabulary
+        raise RuntimeError(f"Cannot build title TF-IDF: {exc}") from exc
+
+    blocks = [
+        titles * TFIDF_TITLE_WEIGHT,
+        l2_normalize_rows(_field_matrix(books_df["Book-Author"])) * TFIDF_AUTHOR_WEIGHT,
+        l2_normalize_rows(_field_matrix(books_df["Publisher"])) * TFIDF_PUBLISHER_WEIGHT,
+    ]
+    return l2_normalize_rows(sparse.hstack(blocks, format="csr"))
+
+
+class TfidfContentRecommender(BaseRecommender):
+    """Covers every catalog book, including cold-start books nobody has rated.
+
+    With ``TFIDF_PRECOMPUTE`` the top neighbours of every book are computed
+    once in parallel chunks, saved under ``data/processed/tfidf_index/`` and
+    memory-mapped, so workers share one copy through the page cache and a
+    restart with the same catalog skips the build.
+    """
+
+    info = AlgorithmInfo(
+        id="content_tfidf",
+        name="TF-IDF Content Similarity",
+        description="Cosine similarity of title, author and publisher TF-IDF vectors",
+    )
+
+    def __init__(self, book_repo):
+        super().__init__(book_repo)
+        self.vectors: Optional[sparse.csr_matrix] = None
+        self.vectors_t: Optional[sparse.csr_matrix] = None
+        self.indptr: Optional[np.ndarray] = None
+        self.indices: Optional[np.ndarray] = None
+        self.scores: Optional[np.ndarray] = None
+
+        index_dir = self._index_dir(book_repo.version)
+        if TFIDF_PRECOMPUTE and self._index_complete(index_dir):
+            self._load_index(index_dir)
+            return
+
+        vectors = build_content_vectors(book_repo.get_dataframe())
+        if TFIDF_PRECOMPUTE:
+            table = build_neighbour_table(vectors, TFIDF_NEIGHBORS, TFIDF_CHUNK_SIZE, TFIDF_WORKERS)
+            self._save_index(index_dir, table)
+            self._load_index(index_dir)
+        else:
+            self.vectors = vectors
+            self.vectors_t = vectors.T.tocsr()
+
+    @staticmethod
+    def _index_dir(catalog_version: str) -> Path:
+        settings = (
+            MODEL_VERSION,
+            catalog_version,
+            TFIDF_TITLE_WEIGHT,
+            TFIDF_AUTHOR_WEIGHT,
+            TFIDF_PUBLISHER_WEIGHT,
+            TFIDF_MAX_DF,
+            TFIDF_NEIGHBORS,
+        )
+        key = hashlib.sha1(repr(settings).encode("utf-8")).hexdigest()[:16]
+        return PROCESSED_DATA_DIR / TFIDF_INDEX_DIRNAME / key
+
+    @staticmethod
+    def _index_complete(index_dir: Path) -> bool:
+        return all((index_dir / f"{name}.npy").exists() for name in INDEX_ARRAYS)
+
+    @staticmethod
+    def _save_index(index_dir: Path, table: Tuple[np.ndarray, np.ndarray, np.ndarray]) -> None:
+        # Workers starting together may build the same index: each writes its
+        # own partial files and renames them into place.
+        index_dir.mkdir(parents=True, exist_ok=True)
+        for name, array in zip(INDEX_ARRAYS, table):
+            partial = index_dir / f"{name}.{os.getpid()}.partial.npy"
+            np.save(partial, array)
+            partial.replace(index_dir / f"{name}.npy")
+
+    def _load_index(self, index_dir: Path) -> None:
+        self.indptr, self.indices, self.scores = (
+            np.load(index_dir / f"{name}.npy", mmap_mode="r") for name in INDEX_ARRAYS
+        )
+
+    def restrict_to(self, owned: np.ndarray) -> None:
+        # A memory-mapped table stays as is: rows of other shards' books are never
+        # read, so their pages never become resident. On-demand vectors are also
+        # the candidates and are kept whole.
+        if self.indptr is not None and not isinstance(self.indices, np.memmap):
+            self.indptr, self.indices, self.scores = restrict_neighbour_table((self.indptr, self.indices, self.scores), owned)
+
+    def _query(self, book_index: int, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        row = self.vectors[book_index].dot(self.vectors_t)
+        cols, vals = row.indices, row.data
+        keep = cols != book_index
+        cols, vals = cols[keep], vals[keep]
+        if cols.size > k:
+            part = np.argpartition(-vals, k - 1)[:k]
+            cols, vals = cols[part], vals[part]
+        order = np.argsort(-vals, kind="stable")
+        return cols[order], vals[order]
+
+    def recommend(self, book_index: int, k: int, deadline: Optional[Deadline] = None) -> List[ScoredBook]:
+        if self.indptr is not None:
+            lo, hi = int(self.indptr[book_index]), int(self.indptr[book_index + 1])
+            indices, scores = self.indices[lo : min(hi, lo + k)], self.scores[lo : min(hi, lo + k)]
+        else:
+            indices, scores = self._query(book_index, k)
+        if len(indices) == 0:
+            raise RecommendationError("Book shares no title, author or publisher terms with the catalog")
+        return self._scored(indices, scores)
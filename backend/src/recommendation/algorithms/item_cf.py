@@ -0,0 +1,226 @@
+"""Sparse item-item collaborative filtering over the co-rating matrix."""
+
+from __future__ import annotations
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from ...config import (
+    ITEM_CF_BM25_B,
+    ITEM_CF_BM25_K1,
+    ITEM_CF_CHUNK_MAX_NNZ,
+    ITEM_CF_CHUNK_SIZE,
+    ITEM_CF_INCLUDE_IMPLICIT,
+    ITEM_CF_MAX_USER_DEGREE,
+    ITEM_CF_MIN_BOOK_RATINGS,
+    ITEM_CF_MIN_USER_RATINGS,
+    ITEM_CF_NEIGHBORS,
+    ITEM_CF_SEED,
+    ITEM_CF_WEIGHTING,
+    ITEM_CF_WORKERS,
+)
+from ...data_pipeline import get_ratings
+from .base import AlgorithmInfo, BaseRecommender, Deadline, RecommendationError, ScoredBook
+
+
+def bm25_weight(item_users: sparse.csr_matrix, k1: float, b: float) -> sparse.csr_matrix:
+    """Apply BM25 weighting to an item x user matrix (items are the documents)."""
+    weighted = item_users.tocoo(copy=True)
+    num_items = weighted.shape[0]
+    idf = np.log(num_items) - np.log1p(np.bincount(weighted.col, minlength=weighted.shape[1]))
+    row_sums = np.ravel(item_users.sum(axis=1))
+    length_norm = (1.0 - b) + b * row_sums / max(row_sums.mean(), 1e-8)
+    weighted.data = (
+        weighted.data * (k1 + 1.0) / (k1 * length_norm[weighted.row] + weighted.data) * idf[weighted.col]
+    )
+    return weighted.tocsr().astype(np.float32)
+
+
+def l2_normalize_rows(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    norms = np.sqrt(np.ravel(matrix.multiply(matrix).sum(axis=1)))
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms).dot(matrix).tocsr().astype(np.float32)
+
+
+def cap_user_degree(ratings: pd.DataFrame, max_degree: int, seed: int) -> pd.DataFrame:
+    """Keep at most ``max_degree`` randomly chosen interactions per user.
+
+    A user with degree d adds d^2 entries to the item-item product, so a few
+    heavy implicit raters would otherwise make whole chunks nearly dense.
+    """
+    degrees = ratings.groupby("User-ID")["User-ID"].transform("size")
+    heavy = degrees > max_degree
+    if not heavy.any():
+        return ratings
+    sampled = ratings[heavy].sample(frac=1.0, random_state=seed).groupby("User-ID").head(max_degree)
+    return pd.concat([ratings[~heavy], sampled])
+
+
+def _top_neighbours(
+    vectors: sparse.csr_matrix,
+    vectors_t: sparse.csr_matrix,
+    start: int,
+    stop: int,
+    top_n: int,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Top-N neighbours for rows ``start:stop`` as (counts, indices, scores).
+
+    Rows are grouped by length (within a factor of two), each group's CSR
+    slices are padded into one 2-D array and ``np.argpartition`` selects the
+    top N of every row at once.
+    """
+    block = vectors[start:stop].dot(vectors_t).tocsr()
+    num_rows = stop - start
+    row_of = np.repeat(np.arange(num_rows), np.diff(block.indptr))
+    keep = block.indices != row_of + start
+    lengths = np.bincount(row_of[keep], minlength=num_rows)
+    cols, vals = block.indices[keep], block.data[keep]
+    del block, row_of
+    row_starts = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+
+    counts = np.minimum(lengths, top_n).astype(np.int32)
+    out_starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    out_indices = np.empty(int(counts.sum()), dtype=np.int32)
+    out_scores = np.empty(out_indices.size, dtype=np.float32)
+
+    groups = np.frexp(lengths)[1]
+    for group in np.unique(groups[lengths > 0]):
+        rows = np.flatnonzero(groups == group)
+        width = int(lengths[rows].max())
+        positions = row_starts[rows, None] + np.arange(width)
+        valid = np.arange(width) < lengths[rows, None]
+        positions = np.where(valid, positions, 0)
+        padded = np.where(valid, vals[positions], -np.inf)
+        if width > top_n:
+            top = np.argpartition(-padded, top_n - 1, axis=1)[:, :top_n]
+        else:
+            top = np.broadcast_to(np.arange(width), padded.shape)
+        top = np.take_along_axis(top, np.argsort(-np.take_along_axis(padded, top, 1), axis=1, kind="stable"), 1)
+        picked = np.take_along_axis(positions, top, 1)
+        kept = np.arange(top.shape[1]) < counts[rows, None]
+        targets = (out_starts[rows, None] + np.arange(top.shape[1]))[kept]
+        out_indices[targets] = cols[picked[kept]]
+        out_scores[targets] = vals[picked[kept]]
+    return counts, out_indices, out_scores
+
+
+def _chunk_bounds(
+    vectors: sparse.csr_matrix,
+    vectors_t: sparse.csr_matrix,
+    chunk_size: int,
+    max_nnz: Optional[int],
+) -> List[Tuple[int, int]]:
+    """Row ranges of at most ``chunk_size`` rows and about ``max_nnz`` product entries.
+
+    A row's product has at most the summed degree of its users (and no more
+    entries than there are items), so chunks with heavy rows are cut shorter.
+    """
+    num_items = vectors.shape[0]
+    if not max_nnz:
+        return [(start, min(start + chunk_size, num_items)) for start in range(0, num_items, chunk_size)]
+    pattern = sparse.csr_matrix((np.ones_like(vectors.data), vectors.indices, vectors.indptr), shape=vectors.shape)
+    cost = np.minimum(pattern.dot(np.diff(vectors_t.indptr).astype(np.float64)), num_items)
+    total = np.concatenate(([0.0], np.cumsum(cost)))
+    bounds = []
+    start = 0
+    while start < num_items:
+        stop = int(np.searchsorted(total, total[start] + max_nnz, side="right")) - 1
+        stop = min(max(stop, start + 1), start + chunk_size, num_items)
+        bounds.append((start, stop))
+        start = stop
+    return bounds
+
+
+def build_neighbour_table(
+    vectors: sparse.csr_matrix,
+    top_n: int,
+    chunk_size: int,
+    workers: Optional[int] = None,
+    max_chunk_nnz: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """CSR (indptr, indices, scores) of each row's top-N cosine neighbours.
+
+    Chunked sparse self-product; scipy's kernels release the GIL so threads scale.
+    At most ``workers`` chunks are in flight, each bounded by ``max_chunk_nnz``
+    product entries when given, so peak memory is about their product.
+    """
+    vectors_t = vectors.T.tocsr()
+    num_items = vectors.shape[0]
+    bounds = _chunk_bounds(vectors, vectors_t, chunk_size, max_chunk_nnz)
+    with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+        chunks = list(pool.map(lambda span: _top_neighbours(vectors, vectors_t, span[0], span[1], top_n), bounds))
+
+    indptr = np.zeros(num_items + 1, dtype=np.int64)
+    if chunks:
+        np.cumsum(np.concatenate([chunk[0] for chunk in chunks]), out=indptr[1:])
+    indices = np.concatenate([chunk[1] for chunk in chunks]) if chunks else np.empty(0, dtype=np.int32)
+    scores = np.concatenate([chunk[2] for chunk in chunks]) if chunks else np.empty(0, dtype=np.float32)
+    return indptr, indices, scores
+
+
+def restrict_neighbour_table(
+    table: Tuple[np.ndarray, np.ndarray, np.ndarray], owned: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Copy of a CSR neighbour table whose rows outside ``owned`` are empty."""
+    indptr, indices, scores = table
+    counts = np.diff(indptr)
+    keep = np.repeat(owned, counts)
+    restricted = np.zeros_like(indptr)
+    np.cumsum(np.where(owned, counts, 0), out=restricted[1:])
+    return restricted, np.ascontiguousarray(indices[keep]), np.ascontiguousarray(scores[keep])
+
+
+class ItemCFRecommender(BaseRecommender):
+    """Item-based CF served from a precomputed CSR neighbour table."""
+
+    info = AlgorithmInfo(
+        id="item_cf",
+        name="Item-based Collaborative Filtering",
+        description="Sparse item-item cosine over BM25-weighted co-ratings",
+    )
+
+    def __init__(self, book_repo):
+        super().__init__(book_repo)
+        ratings = book_repo.with_book_index(get_ratings(filtered=not ITEM_CF_INCLUDE_IMPLICIT))
+        ratings = ratings.drop_duplicates(subset=["User-ID", "book_index"])
+        ratings = cap_user_degree(ratings, ITEM_CF_MAX_USER_DEGREE, ITEM_CF_SEED)
+
+        book_counts = ratings["book_index"].value_counts()
+        ratings = ratings[ratings["book_index"].isin(book_counts[book_counts >= ITEM_CF_MIN_BOOK_RATINGS].index)]
+        user_counts = ratings["User-ID"].value_counts()
+        ratings = ratings[ratings["User-ID"].isin(user_counts[user_counts >= ITEM_CF_MIN_USER_RATINGS].index)]
+        if ratings.empty:
+            raise RuntimeError("Not enough co-ratings to build item-based CF")
+
+        user_codes, users = pd.factorize(ratings["User-ID"])
+        # Explicit ratings count as stronger evidence than implicit (0) interactions.
+        values = 1.0 + ratings["Book-Rating"].to_numpy(dtype=np.float32) / 10.0
+        # Rows are catalog indices; books without co-ratings are empty rows,
+        # which cost one indptr entry each and need no separate id mapping.
+        item_users = sparse.csr_matrix(
+            (values, (ratings["book_index"].to_numpy(), user_codes)),
+            shape=(book_repo.num_books, len(users)),
+            dtype=np.float32,
+        )
+        if ITEM_CF_WEIGHTING == "bm25":
+            item_users = bm25_weight(item_users, ITEM_CF_BM25_K1, ITEM_CF_BM25_B)
+        vectors = l2_normalize_rows(item_users)
+
+        self.indptr, self.indices, self.scores = build_neighbour_table(
+            vectors, ITEM_CF_NEIGHBORS, ITEM_CF_CHUNK_SIZE, ITEM_CF_WORKERS, ITEM_CF_CHUNK_MAX_NNZ
+        )
+
+    def restrict_to(self, owned: np.ndarray) -> None:
+        self.indptr, self.indices, self.scores = restrict_neighbour_table((self.indptr, self.indices, self.scores), owned)
+
+    def recommend(self, book_index: int, k: int, deadline: Optional[Deadline] = None) -> List[ScoredBook]:
+        lo, hi = self.indptr[book_index], self.indptr[book_index + 1]
+        if lo == hi:
+            raise RecommendationError("Book has no co-ratings for item-based CF")
+        hi = min(hi, lo + k)
+        return self._scored(self.indices[lo:hi], self.scores[lo:hi])
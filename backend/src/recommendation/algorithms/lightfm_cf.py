@@ -2,16 +2,17 @@
 
 from __future__ import annotations
 
-from typing import Dict, List
+from typing import List, Optional
 
 import numpy as np
+import pandas as pd
 from lightfm import LightFM
 from scipy import sparse
 from sklearn.metrics.pairwise import cosine_similarity
 
 from ...config import CF_MIN_BOOK_RATINGS, CF_MIN_USER_RATINGS
 from ...data_pipeline import get_ratings
-from .base import AlgorithmInfo, BaseRecommender, RecommendationError
+from .base import AlgorithmInfo, BaseRecommender, Deadline, RecommendationError, ScoredBook
 
 
 class LightFMCollaborativeRecommender(BaseRecommender):
@@ -23,12 +24,11 @@ class LightFMCollaborativeRecommender(BaseRecommender):
 
     def __init__(self, book_repo):
         super().__init__(book_repo)
-        ratings = get_ratings(filtered=True)
-        ratings = ratings[ratings["ISBN"].isin(book_repo.by_isbn.keys())]
+        ratings = book_repo.with_book_index(get_ratings(filtered=True))
 
-        book_counts = ratings["ISBN"].value_counts()
-        popular_isbns = book_counts[book_counts >= CF_MIN_BOOK_RATINGS].index
-        ratings = ratings[ratings["ISBN"].isin(popular_isbns)]
+        book_counts = ratings["book_index"].value_counts()
+        popular_books = book_counts[book_counts >= CF_MIN_BOOK_RATINGS].index
+        ratings = ratings[ratings["book_index"].isin(popular_books)]
 
         user_counts = ratings["User-ID"].value_counts()
         active_users = user_counts[user_counts >= CF_MIN_USER_RATINGS].index
@@ -37,16 +37,13 @@ class LightFMCollaborativeRecommender(BaseRecommender):
         if ratings.empty:
             raise RuntimeError("Not enough ratings to train LightFM")
 
-        user_to_index = {uid: idx for idx, uid in enumerate(ratings["User-ID"].unique())}
-        isbn_to_index = {isbn: idx for idx, isbn in enumerate(ratings["ISBN"].unique())}
-
-        row = ratings["User-ID"].map(user_to_index)
-        col = ratings["ISBN"].map(isbn_to_index)
+        row, users = pd.factorize(ratings["User-ID"])
+        col, item_books = pd.factorize(ratings["book_index"])
         data = np.ones(len(ratings), dtype=np.float32)
 
         interactions = sparse.coo_matrix(
-            (data, (row.values, col.values)),
-            shape=(len(user_to_index), len(isbn_to_index)),
+            (data, (row, col)),
+            shape=(len(users), len(item_books)),
         )
 
         model = LightFM(loss="warp", no_components=32, learning_rate=0.05, random_state=42)
@@ -54,30 +51,27 @@ class LightFMCollaborativeRecommender(BaseRecommender):
 
         self.model = model
         self.item_embeddings = model.item_embeddings
-        self.isbn_to_index = isbn_to_index
-        self.index_to_isbn = {idx: isbn for isbn, idx in isbn_to_index.items()}
-
-    def recommend(self, isbn: str, k: int) -> List[Dict]:
-        if isbn not in self.isbn_to_index:
+        # item -> catalog index, and catalog index -> item (-1 when not trained).
+        self.item_books = np.asarray(item_books, dtype=np.int32)
+        self.book_to_item = np.full(book_repo.num_books, -1, dtype=np.int32)
+        self.book_to_item[self.item_books] = np.arange(len(self.item_books), dtype=np.int32)
+
+    def embedding_table(self):
+        """Return (catalog indices, item embeddings) for reuse by candidate retrieval."""
+        return self.item_books, self.item_embeddings
+
+    def recommend(self, book_index: int, k: int, deadline: Optional[Deadline] = None) -> List[ScoredBook]:
+        idx = self.book_to_item[book_index]
+        if idx < 0:
             raise RecommendationError("Book not available in MF training set")
 
-        idx = self.isbn_to_index[isbn]
         query_vec = self.item_embeddings[idx].reshape(1, -1)
         sims = cosine_similarity(query_vec, self.item_embeddings).flatten()
+        sims[idx] = -np.inf
 
-        ranking = np.argsort(sims)[::-1]
-        results = []
-        for candidate_idx in ranking:
-            if candidate_idx == idx:
-                continue
-            candidate_isbn = self.index_to_isbn[candidate_idx]
-            payload = self._format_result(candidate_isbn, sims[candidate_idx])
-            if payload:
-                results.append(payload)
-            if len(results) >= k:
-                break
-
-        if not results:
+        top = min(k, len(sims) - 1)
+        if top <= 0:
             raise RecommendationError("No collaborative filtering matches found")
-        return results
-
+        ranking = np.argpartition(-sims, top - 1)[:top]
+        ranking = ranking[np.argsort(-sims[ranking])]
+        return self._scored(self.item_books[ranking], sims[ranking])
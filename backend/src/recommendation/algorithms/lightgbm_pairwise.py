@@ -4,7 +4,7 @@ from __future__ import annotations
 
 import random
 from itertools import combinations
-from typing import Dict, List
+from typing import List, Optional, Tuple
 
 import numpy as np
 import pandas as pd
@@ -15,10 +15,17 @@ from ...config import (
     LGB_CANDIDATE_POOL_SIZE,
     LGB_MAX_BOOKS_PER_USER,
     LGB_MAX_POSITIVE_PAIRS,
+    LGB_NUM_THREADS,
+    LGB_PREDICTOR,
     LGB_RANDOM_STATE,
+    LGB_SCORE_CHUNK_SIZE,
 )
 from ...data_pipeline import get_book_rating_stats, get_ratings
-from .base import AlgorithmInfo, BaseRecommender, RecommendationError
+from .base import AlgorithmInfo, BaseRecommender, Deadline, RecommendationError, ScoredBook, deadline_expired
+from .retrieval import CandidateRetriever
+from .tree_predictor import FlatTreeEnsemble
+
+PREDICTORS = ("booster", "numpy", "sklearn")
 
 
 class LightGBMPairwiseRecommender(BaseRecommender):
@@ -30,8 +37,7 @@ class LightGBMPairwiseRecommender(BaseRecommender):
 
     def __init__(self, book_repo):
         super().__init__(book_repo)
-        ratings = get_ratings(filtered=True)
-        ratings = ratings[ratings["ISBN"].isin(book_repo.by_isbn.keys())]
+        ratings = book_repo.with_book_index(get_ratings(filtered=True))
 
         if ratings.empty:
             raise RuntimeError("Ratings dataset is empty after filtering")
@@ -40,39 +46,29 @@ class LightGBMPairwiseRecommender(BaseRecommender):
         books_df = book_repo.get_dataframe().merge(stats, on="ISBN", how="left")
         books_df["rating_count"] = books_df["rating_count"].fillna(0)
         books_df["avg_rating"] = books_df["avg_rating"].fillna(0)
-        books_df["clean_author"] = books_df["Book-Author"].fillna("unknown").str.lower()
-        books_df["clean_publisher"] = books_df["Publisher"].fillna("unknown").str.lower()
+        # The catalog stores missing authors/publishers as "Unknown" categories.
+        books_df["clean_author"] = books_df["Book-Author"].str.lower()
+        books_df["clean_publisher"] = books_df["Publisher"].str.lower()
         books_df["clean_title"] = books_df["Book-Title"].str.lower()
         books_df["title_tokens"] = books_df["clean_title"].apply(self._tokenize)
 
-        author_popularity = (
-            books_df.groupby("clean_author")["rating_count"].sum().to_dict()
-        )
+        author_popularity = books_df.groupby("clean_author")["rating_count"].transform("sum")
 
-        self.book_meta: Dict[str, Dict] = {}
-        for _, row in books_df.iterrows():
-            # Keep column names with dashes (e.g. Year-Of-Publication) accessible without relying on itertuples renaming.
-            year_value = row.get("Year-Of-Publication")
-            year_numeric = int(year_value) if pd.notna(year_value) else None
-            isbn = row["ISBN"]
-            clean_author = row["clean_author"]
-            clean_publisher = row["clean_publisher"]
-            self.book_meta[isbn] = {
-                "isbn": isbn,
-                "book_id": str(int(row["book_id"])),
-                "author": clean_author,
-                "publisher": clean_publisher,
-                "year": year_numeric,
-                "tokens": row["title_tokens"],
-                "rating_count": float(row["rating_count"]),
-                "avg_rating": float(row["avg_rating"]),
-                "author_popularity": float(author_popularity.get(clean_author, 0)),
-            }
+        # Per-book metadata as arrays indexed by catalog index (the merge keeps catalog order).
+        self.author_codes = pd.factorize(books_df["clean_author"])[0].astype(np.int32)
+        self.publisher_codes = pd.factorize(books_df["clean_publisher"])[0].astype(np.int32)
+        # 0 marks an unknown year, matching the falsy check of the original features.
+        self.years = pd.to_numeric(books_df["Year-Of-Publication"], errors="coerce").fillna(0).to_numpy(np.float64)
+        self.title_tokens: List[frozenset] = books_df["title_tokens"].tolist()
+        self.rating_counts = books_df["rating_count"].to_numpy(np.float64)
+        self.avg_ratings = books_df["avg_rating"].to_numpy(np.float64)
+        self.author_popularity = author_popularity.to_numpy(np.float64)
+        self.num_books = len(books_df)
 
         stats_sorted = stats.sort_values(by="rating_count", ascending=False)
-        self.candidate_isbns = [
-            isbn for isbn in stats_sorted.ISBN.tolist() if isbn in self.book_meta
-        ][:LGB_CANDIDATE_POOL_SIZE]
+        self.candidate_indices = book_repo.indices_of_isbns(stats_sorted["ISBN"])
+        self.candidate_indices = self.candidate_indices[self.candidate_indices >= 0][:LGB_CANDIDATE_POOL_SIZE]
+        self.retriever = CandidateRetriever(books_df, ratings)
 
         self.feature_columns = [
             "same_author",
@@ -109,101 +105,125 @@ class LightGBMPairwiseRecommender(BaseRecommender):
             eval_set=[(X_valid, y_valid)],
             eval_metric="auc",
         )
+        if LGB_PREDICTOR not in PREDICTORS:
+            raise RuntimeError(f"Unknown LGB_PREDICTOR {LGB_PREDICTOR!r}; expected one of {PREDICTORS}")
+        self.booster = self.model.booster_
+        self.flat_model = FlatTreeEnsemble.from_booster(self.booster) if LGB_PREDICTOR == "numpy" else None
+
+    def restrict_to(self, owned: np.ndarray) -> None:
+        # Pair features and the user -> books side of retrieval cover every
+        # candidate; only the query-book co-rater lists are per shard.
+        self.retriever.restrict_to(owned)
 
     @staticmethod
     def _tokenize(text: str) -> frozenset:
         tokens = [token for token in text.split() if token]
         return frozenset(tokens)
 
-    def _pair_features(self, isbn_a: str, isbn_b: str) -> Dict[str, float]:
-        meta_a = self.book_meta.get(isbn_a)
-        meta_b = self.book_meta.get(isbn_b)
-        if not meta_a or not meta_b:
-            return {}
-
-        year_a = meta_a["year"]
-        year_b = meta_b["year"]
-        year_diff = abs(year_a - year_b) if year_a and year_b else 0
-        year_mean = np.mean([val for val in [year_a, year_b] if val]) if year_a or year_b else 0
-
-        tokens_a = meta_a["tokens"]
-        tokens_b = meta_b["tokens"]
-        intersection = len(tokens_a & tokens_b)
-        union = len(tokens_a | tokens_b) or 1
-        jaccard = intersection / union
-
-        features = {
-            "same_author": float(meta_a["author"] == meta_b["author"]),
-            "same_publisher": float(meta_a["publisher"] == meta_b["publisher"]),
-            "year_diff": float(year_diff),
-            "title_jaccard": float(jaccard),
-            "rating_count_diff": abs(meta_a["rating_count"] - meta_b["rating_count"]),
-            "avg_rating_diff": abs(meta_a["avg_rating"] - meta_b["avg_rating"]),
-            "author_popularity_diff": abs(
-                meta_a["author_popularity"] - meta_b["author_popularity"]
-            ),
-            "popularity_mean": (meta_a["rating_count"] + meta_b["rating_count"]) / 2.0,
-            "year_mean": float(year_mean),
-        }
-        return features
-
-    def _build_training_pairs(self, ratings: pd.DataFrame):
+    def _pair_features(self, left: np.ndarray, right: np.ndarray) -> np.ndarray:
+        """Feature matrix (one row per pair) for catalog index arrays ``left``/``right``."""
+        year_a = self.years[left]
+        year_b = self.years[right]
+        known_a = year_a > 0
+        known_b = year_b > 0
+        year_diff = np.where(known_a & known_b, np.abs(year_a - year_b), 0.0)
+        known = known_a.astype(np.float64) + known_b
+        year_mean = np.divide(year_a + year_b, known, out=np.zeros_like(year_a), where=known > 0)
+
+        tokens = self.title_tokens
+        jaccard = np.fromiter(
+            (len(tokens[a] & tokens[b]) / (len(tokens[a] | tokens[b]) or 1) for a, b in zip(left.tolist(), right.tolist())),
+            dtype=np.float64,
+            count=len(left),
+        )
+
+        return np.column_stack(
+            [
+                (self.author_codes[left] == self.author_codes[right]).astype(np.float64),
+                (self.publisher_codes[left] == self.publisher_codes[right]).astype(np.float64),
+                year_diff,
+                jaccard,
+                np.abs(self.rating_counts[left] - self.rating_counts[right]),
+                np.abs(self.avg_ratings[left] - self.avg_ratings[right]),
+                np.abs(self.author_popularity[left] - self.author_popularity[right]),
+                (self.rating_counts[left] + self.rating_counts[right]) / 2.0,
+                year_mean,
+            ]
+        )
+
+    def predict_proba(self, features: np.ndarray, predictor: str = LGB_PREDICTOR) -> np.ndarray:
+        """Similarity probability for a pair-feature matrix.
+
+        ``booster`` and ``numpy`` skip the sklearn wrapper's validation and
+        DataFrame conversion; ``sklearn`` is the original path.
+        """
+        if predictor == "sklearn":
+            return self.model.predict_proba(pd.DataFrame(features, columns=self.feature_columns))[:, 1]
+        if predictor == "numpy":
+            if self.flat_model is None:
+                self.flat_model = FlatTreeEnsemble.from_booster(self.booster)
+            return self.flat_model.predict_proba(features)
+        data = np.ascontiguousarray(features, dtype=np.float64)
+        return self.booster.predict(data, num_threads=LGB_NUM_THREADS)
+
+    def _build_training_pairs(self, ratings: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Series]:
         rng = random.Random(LGB_RANDOM_STATE)
-        records: List[Dict[str, float]] = []
+        candidates = self.candidate_indices.tolist()
+        is_candidate = np.zeros(self.num_books, dtype=bool)
+        is_candidate[self.candidate_indices] = True
+        left: List[int] = []
+        right: List[int] = []
         labels: List[int] = []
 
         for _, group in ratings.groupby("User-ID"):
-            user_books = [isbn for isbn in group["ISBN"].unique() if isbn in self.candidate_isbns]
+            user_books = [idx for idx in pd.unique(group["book_index"]).tolist() if is_candidate[idx]]
             if len(user_books) < 2:
                 continue
             user_books = user_books[:LGB_MAX_BOOKS_PER_USER]
-            for isbn_a, isbn_b in combinations(user_books, 2):
-                feats = self._pair_features(isbn_a, isbn_b)
-                if feats:
-                    records.append(feats)
-                    labels.append(1)
-                negative = rng.choice(self.candidate_isbns)
+            for book_a, book_b in combinations(user_books, 2):
+                left.append(book_a)
+                right.append(book_b)
+                labels.append(1)
+                negative = rng.choice(candidates)
                 attempts = 0
                 while negative in user_books and attempts < 5:
-                    negative = rng.choice(self.candidate_isbns)
+                    negative = rng.choice(candidates)
                     attempts += 1
-                feats_neg = self._pair_features(isbn_a, negative)
-                if feats_neg:
-                    records.append(feats_neg)
-                    labels.append(0)
-                if len(records) >= LGB_MAX_POSITIVE_PAIRS:
+                left.append(book_a)
+                right.append(negative)
+                labels.append(0)
+                if len(labels) >= LGB_MAX_POSITIVE_PAIRS:
                     break
-            if len(records) >= LGB_MAX_POSITIVE_PAIRS:
+            if len(labels) >= LGB_MAX_POSITIVE_PAIRS:
                 break
 
-        X = pd.DataFrame(records).reindex(columns=self.feature_columns)
+        features = self._pair_features(np.asarray(left, dtype=np.int64), np.asarray(right, dtype=np.int64))
+        X = pd.DataFrame(features, columns=self.feature_columns)
         y = pd.Series(labels, name="label")
         return X, y
 
-    def recommend(self, isbn: str, k: int) -> List[Dict]:
-        if isbn not in self.book_meta:
+    def recommend(self, book_index: int, k: int, deadline: Optional[Deadline] = None) -> List[ScoredBook]:
+        if not 0 <= book_index < self.num_books:
             raise RecommendationError("Book not available for LightGBM scoring")
 
-        candidates = [cand for cand in self.candidate_isbns if cand != isbn]
-        feature_rows = []
-        candidate_ids = []
-        for candidate in candidates:
-            feats = self._pair_features(isbn, candidate)
-            if feats:
-                feature_rows.append(feats)
-                candidate_ids.append(candidate)
-        if not feature_rows:
+        # Rank a small retrieved pool instead of scoring the fixed popular pool.
+        # Retrieval lists its strongest sources first, so a deadline that cuts
+        # scoring short still leaves the best-so-far candidates ranked.
+        candidates = self.retriever.retrieve(book_index)
+        if candidates.size == 0:
             raise RecommendationError("No LightGBM candidates available")
 
-        feature_df = pd.DataFrame(feature_rows).reindex(columns=self.feature_columns)
-        scores = self.model.predict_proba(feature_df)[:, 1]
+        score_chunks: List[np.ndarray] = []
+        for start in range(0, len(candidates), LGB_SCORE_CHUNK_SIZE):
+            if score_chunks and deadline_expired(deadline):
+                break
+            chunk = candidates[start : start + LGB_SCORE_CHUNK_SIZE]
+            features = self._pair_features(np.full(len(chunk), book_index), chunk)
+            score_chunks.append(self.predict_proba(features))
 
+        scores = np.concatenate(score_chunks)
         ranking = np.argsort(scores)[::-1][:k]
-        results = []
-        for idx in ranking:
-            payload = self._format_result(candidate_ids[idx], scores[idx])
-            if payload:
-                results.append(payload)
+        results = self._scored(candidates[ranking], scores[ranking])
         if not results:
             raise RecommendationError("LightGBM returned empty results")
         return results
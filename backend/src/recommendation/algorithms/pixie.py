@@ -0,0 +1,174 @@
+"""Pixie-style random walks over the bipartite user-book rating graph."""
+
+from __future__ import annotations
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ...config import (
+    PIXIE_BATCH_SIZE,
+    PIXIE_INCLUDE_IMPLICIT,
+    PIXIE_MAX_STEPS,
+    PIXIE_MAX_USER_DEGREE,
+    PIXIE_RESTART_PROBABILITY,
+    PIXIE_SEED,
+    PIXIE_STOP_BOOKS,
+    PIXIE_STOP_VISITS,
+    PIXIE_WORKERS,
+)
+from ...data_pipeline import get_ratings
+from .base import AlgorithmInfo, BaseRecommender, Deadline, RecommendationError, ScoredBook, deadline_expired
+
+# Redraws for walkers whose rating-biased edge was rejected; the few still
+# rejected afterwards keep their last uniform draw.
+BIAS_ROUNDS = 3
+
+
+def build_adjacency(
+    rows: np.ndarray, cols: np.ndarray, ratings: np.ndarray, num_rows: int
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """CSR (indptr, neighbours, ratings) of an edge list, with int32 offsets and ids."""
+    order = np.argsort(rows, kind="stable")
+    indptr = np.zeros(num_rows + 1, dtype=np.int32)
+    indptr[1:] = np.cumsum(np.bincount(rows, minlength=num_rows))
+    return indptr, cols[order].astype(np.int32), ratings[order]
+
+
+def biased_hop(
+    indptr: np.ndarray, neighbours: np.ndarray, ratings: np.ndarray, nodes: np.ndarray, rng: np.random.Generator
+) -> np.ndarray:
+    """Move every walker in ``nodes`` to one of its neighbours, favouring high ratings.
+
+    Edges are drawn uniformly and accepted with probability (1 + rating / 10) / 2
+    (rejection sampling), so a 10 is twice as likely to be followed as an
+    implicit 0 without storing per-edge cumulative weights. Every node in
+    ``nodes`` must have at least one neighbour.
+    """
+    starts = indptr[nodes]
+    degrees = indptr[nodes + 1] - starts
+    edges = starts + (rng.random(nodes.size) * degrees).astype(np.int32)
+    pending = np.flatnonzero(rng.random(nodes.size) * 20.0 >= 10.0 + ratings[edges])
+    for _ in range(BIAS_ROUNDS):
+        if pending.size == 0:
+            break
+        edges[pending] = starts[pending] + (rng.random(pending.size) * degrees[pending]).astype(np.int32)
+        accepted = rng.random(pending.size) * 20.0 < 10.0 + ratings[edges[pending]]
+        pending = pending[~accepted]
+    return neighbours[edges]
+
+
+class VisitCounter:
+    """Visit counts shared by the walker threads of one request."""
+
+    def __init__(self, num_books: int):
+        self.counts = np.zeros(num_books, dtype=np.int32)
+        self.total = 0
+        self.saturated = 0  # books with at least PIXIE_STOP_VISITS visits
+        self.done = False
+        self._lock = threading.Lock()
+
+    def add(self, books: np.ndarray) -> None:
+        """Record one batch of visits and flag ``done`` once enough books are saturated."""
+        books, hits = np.unique(books, return_counts=True)
+        with self._lock:
+            before = self.counts[books]
+            after = before + hits.astype(np.int32)
+            self.counts[books] = after
+            self.total += int(hits.sum())
+            self.saturated += int(np.count_nonzero((before < PIXIE_STOP_VISITS) & (after >= PIXIE_STOP_VISITS)))
+            if self.saturated >= PIXIE_STOP_BOOKS:
+                self.done = True
+
+
+class PixieRecommender(BaseRecommender):
+    """Real-time recommendations from random walks with restarts, as in Pinterest's Pixie.
+
+    The graph is two int32 CSR adjacency lists (book -> users, user -> books)
+    plus one byte of rating per edge; nothing is precomputed per book, so any
+    book with a rating is covered, including the long tail that LightGBM's
+    candidate pool and item_cf's thresholds leave out.
+    """
+
+    info = AlgorithmInfo(
+        id="pixie",
+        name="Pixie Random Walks",
+        description="Rating-biased random walks with restarts on the user-book graph",
+    )
+
+    def __init__(self, book_repo):
+        super().__init__(book_repo)
+        ratings = book_repo.with_book_index(get_ratings(filtered=not PIXIE_INCLUDE_IMPLICIT))
+        ratings = ratings.drop_duplicates(subset=["User-ID", "book_index"])
+
+        # Single-book users only lead back to where the walker came from;
+        # heavy raters link everything to everything and drown the signal.
+        user_codes, _ = pd.factorize(ratings["User-ID"])
+        degrees = np.bincount(user_codes)
+        ratings = ratings[((degrees >= 2) & (degrees <= PIXIE_MAX_USER_DEGREE))[user_codes]]
+        if ratings.empty:
+            raise RuntimeError("Not enough ratings to build the Pixie walk graph")
+        if len(ratings) > np.iinfo(np.int32).max:
+            raise RuntimeError("Rating graph too large for int32 adjacency offsets")
+
+        user_codes, users = pd.factorize(ratings["User-ID"])
+        user_codes = user_codes.astype(np.int32)
+        books = ratings["book_index"].to_numpy(dtype=np.int32)
+        values = ratings["Book-Rating"].to_numpy().astype(np.uint8)
+        self.book_indptr, self.book_users, self.book_ratings = build_adjacency(
+            books, user_codes, values, book_repo.num_books
+        )
+        self.user_indptr, self.user_books, self.user_ratings = build_adjacency(user_codes, books, values, len(users))
+
+        self.workers = PIXIE_WORKERS or os.cpu_count() or 1
+        self._executor = (
+            ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="pixie") if self.workers > 1 else None
+        )
+
+    def recommend(self, book_index: int, k: int, deadline: Optional[Deadline] = None) -> List[ScoredBook]:
+        if self.book_indptr[book_index] == self.book_indptr[book_index + 1]:
+            raise RecommendationError("Book has no ratings in the walk graph")
+
+        counter = VisitCounter(self.book_repo.num_books)
+        # Seeded by the query book so repeated requests give the same walks
+        # (up to where the threads interleave with early stopping).
+        seeds = np.random.SeedSequence([PIXIE_SEED, book_index]).spawn(self.workers)
+        rngs = [np.random.default_rng(seed) for seed in seeds]
+        steps = -(-PIXIE_MAX_STEPS // self.workers)
+        if self._executor is None:
+            self._walk(book_index, steps, rngs[0], counter, deadline)
+        else:
+            futures = [self._executor.submit(self._walk, book_index, steps, rng, counter, deadline) for rng in rngs]
+            for future in futures:
+                future.result()
+
+        visited = np.flatnonzero(counter.counts)
+        if visited.size == 0:
+            raise RecommendationError("Random walks reached no other book")
+        if visited.size > k:
+            visited = visited[np.argpartition(-counter.counts[visited], k - 1)[:k]]
+        top = visited[np.lexsort((visited, -counter.counts[visited]))]
+        return self._scored(top, counter.counts[top] / counter.total)
+
+    def _walk(
+        self,
+        book_index: int,
+        steps: int,
+        rng: np.random.Generator,
+        counter: VisitCounter,
+        deadline: Optional[Deadline],
+    ) -> None:
+        """Advance one batch of walkers until the step budget, early stop or deadline."""
+        positions = np.full(min(PIXIE_BATCH_SIZE, steps), book_index, dtype=np.int32)
+        while True:
+            users = biased_hop(self.book_indptr, self.book_users, self.book_ratings, positions, rng)
+            positions = biased_hop(self.user_indptr, self.user_books, self.user_ratings, users, rng)
+            counter.add(positions[positions != book_index])
+            steps -= positions.size
+            if steps <= 0 or counter.done or deadline_expired(deadline):
+                return
+            positions[rng.random(positions.size) < PIXIE_RESTART_PROBABILITY] = book_index
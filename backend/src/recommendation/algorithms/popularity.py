@@ -0,0 +1,85 @@
+"""Popularity fallback served from precomputed, pre-sorted arrays."""
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ...config import POPULARITY_PRIOR_WEIGHT
+from ...data_pipeline import stream_book_rating_stats
+from .base import AlgorithmInfo, BaseRecommender, Deadline, ScoredBook
+
+
+def _grouped_order(codes: np.ndarray, global_order: np.ndarray, num_groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Sort ``global_order`` by group, keeping popularity order inside each group.
+
+    Returns the reordered positions and CSR-style offsets, so the ranking for
+    group ``g`` is ``order[offsets[g]:offsets[g + 1]]``.
+    """
+    order = global_order[np.argsort(codes[global_order], kind="stable")].astype(np.int32)
+    offsets = np.zeros(num_groups + 1, dtype=np.int64)
+    np.cumsum(np.bincount(codes, minlength=num_groups), out=offsets[1:])
+    return order, offsets
+
+
+class PopularityRecommender(BaseRecommender):
+    """Final-tier fallback that never fails: global, author, publisher and decade charts."""
+
+    info = AlgorithmInfo(
+        id="popularity",
+        name="Popularity Fallback",
+        description="Bayesian-averaged rating charts by author, publisher and decade",
+    )
+
+    GROUPS = ("author", "publisher", "decade")
+
+    def __init__(self, book_repo):
+        super().__init__(book_repo)
+        # Only per-book aggregates are needed, so the ratings are reduced as they stream in.
+        stats = stream_book_rating_stats(filtered=True)
+
+        df = book_repo.get_dataframe()[["ISBN", "Book-Author", "Publisher", "Year-Of-Publication"]]
+        df = df.merge(stats, on="ISBN", how="left")
+        counts = df["rating_count"].fillna(0).to_numpy(dtype=np.float32)
+        sums = (df["avg_rating"].fillna(0) * df["rating_count"].fillna(0)).to_numpy(dtype=np.float32)
+        prior_mean = float(sums.sum() / counts.sum()) if counts.sum() else 0.0
+        self.scores = (sums + POPULARITY_PRIOR_WEIGHT * prior_mean) / (counts + POPULARITY_PRIOR_WEIGHT)
+
+        # Best Bayesian score first, rating count breaks ties.
+        self.global_order = np.lexsort((-counts, -self.scores)).astype(np.int32)
+
+        decades = (df["Year-Of-Publication"] // 10 * 10).fillna(-1).astype(int)
+        self.group_codes: Dict[str, np.ndarray] = {}
+        self.group_orders: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        for name, column in (("author", df["Book-Author"]), ("publisher", df["Publisher"]), ("decade", decades)):
+            codes, uniques = pd.factorize(column)
+            codes = codes.astype(np.int32)
+            self.group_codes[name] = codes
+            self.group_orders[name] = _grouped_order(codes, self.global_order, len(uniques))
+
+    def _ranked(self, idx: int) -> List[np.ndarray]:
+        tiers = []
+        for name in self.GROUPS:
+            order, offsets = self.group_orders[name]
+            code = self.group_codes[name][idx]
+            tiers.append(order[offsets[code] : offsets[code + 1]])
+        tiers.append(self.global_order)
+        return tiers
+
+    def recommend(self, book_index: int, k: int, deadline: Optional[Deadline] = None) -> List[ScoredBook]:
+        in_catalog = 0 <= book_index < len(self.scores)
+        tiers = self._ranked(book_index) if in_catalog else [self.global_order]
+        seen = {book_index}
+        results: List[ScoredBook] = []
+        for tier in tiers:
+            # Only the first k + len(seen) entries of a tier can contribute.
+            for candidate in tier[: k + len(seen)].tolist():
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                results.append(ScoredBook(candidate, float(self.scores[candidate])))
+                if len(results) >= k:
+                    return results
+        return results
@@ -0,0 +1,168 @@
+"""Cheap candidate retrieval over the full catalog ahead of model ranking."""
+
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from ...config import (
+    RETRIEVAL_MAX_CORATING_USERS,
+    RETRIEVAL_MAX_POSTING_LENGTH,
+    RETRIEVAL_POOL_SIZE,
+    RETRIEVAL_SOURCE_LIMITS,
+)
+
+
+def _group_positions(keys: pd.Series) -> Dict[str, np.ndarray]:
+    """Map each key to the int32 positions holding it, in position order."""
+    return {
+        key: np.asarray(positions, dtype=np.int32)
+        for key, positions in keys.groupby(keys, sort=False).indices.items()
+    }
+
+
+class CandidateRetriever:
+    """Unions several cheap candidate sources into a small pool per query.
+
+    Books are addressed internally by popularity rank (0 = most rated), so
+    every posting list is already ordered by popularity and ties between
+    equally good candidates resolve towards popular books for free. The
+    public methods take and return catalog indices.
+    """
+
+    def __init__(self, books_df: pd.DataFrame, ratings: pd.DataFrame):
+        # ``books_df`` is in catalog order; ``ratings`` carries ``book_index``.
+        order = np.argsort(-books_df["rating_count"].to_numpy(), kind="stable")
+        ranked = books_df.iloc[order].reset_index(drop=True)
+        self.rank_to_index = order.astype(np.int32)
+        self.index_to_rank = np.empty(len(order), dtype=np.int32)
+        self.index_to_rank[order] = np.arange(len(order), dtype=np.int32)
+        self.num_books = len(ranked)
+
+        self.rank_author = ranked["clean_author"].to_numpy()
+        self.rank_publisher = ranked["clean_publisher"].to_numpy()
+        self.author_postings = _group_positions(ranked["clean_author"])
+        self.publisher_postings = _group_positions(ranked["clean_publisher"])
+
+        self.title_tokens = ranked["title_tokens"].tolist()
+        exploded = ranked["title_tokens"].apply(list).explode().dropna()
+        exploded_ranks = exploded.index.to_numpy()
+        self.token_postings = {
+            token: exploded_ranks[positions].astype(np.int32)
+            for token, positions in exploded.groupby(exploded, sort=False).indices.items()
+            if len(positions) <= RETRIEVAL_MAX_POSTING_LENGTH
+        }
+
+        rows, _ = pd.factorize(ratings["User-ID"])
+        cols = self.index_to_rank[ratings["book_index"].to_numpy()]
+        data = np.ones(len(rows), dtype=np.float32)
+        shape = (int(rows.max()) + 1 if len(rows) else 0, self.num_books)
+        self.user_items = sparse.csr_matrix((data, (rows, cols)), shape=shape)
+        self.item_users = self.user_items.T.tocsr()
+
+        self.embedding_ranks: Optional[np.ndarray] = None
+        self.embedding_matrix: Optional[np.ndarray] = None
+        self.embedding_lookup: Optional[np.ndarray] = None
+
+        self.sources = {
+            "corating": self._corating,
+            "embedding": self._embedding,
+            "author": self._author,
+            "title": self._title,
+            "publisher": self._publisher,
+            "popular": self._popular,
+        }
+
+    def restrict_to(self, owned: np.ndarray) -> None:
+        """Keep co-raters only for query books in the boolean catalog mask ``owned``.
+
+        ``item_users`` is read only for the query book; ``user_items`` maps
+        co-raters to candidates anywhere in the catalog and stays whole.
+        """
+        owned_ranks = np.asarray(owned, dtype=bool)[self.rank_to_index]
+        counts = np.diff(self.item_users.indptr)
+        keep = np.repeat(owned_ranks, counts)
+        indptr = np.zeros_like(self.item_users.indptr)
+        np.cumsum(np.where(owned_ranks, counts, 0), out=indptr[1:])
+        self.item_users = sparse.csr_matrix(
+            (self.item_users.data[keep], self.item_users.indices[keep], indptr), shape=self.item_users.shape
+        )
+
+    def add_embedding_source(self, book_indices: np.ndarray, embeddings: np.ndarray) -> None:
+        """Enable nearest-neighbour retrieval over (e.g. LightFM) item embeddings."""
+        if len(book_indices) == 0:
+            return
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.embedding_matrix = matrix / np.maximum(norms, 1e-8)
+        self.embedding_ranks = self.index_to_rank[np.asarray(book_indices)]
+        self.embedding_lookup = np.full(self.num_books, -1, dtype=np.int32)
+        self.embedding_lookup[self.embedding_ranks] = np.arange(len(book_indices), dtype=np.int32)
+
+    # Sources --------------------------------------------------------------
+
+    @staticmethod
+    def _top_by_count(ids: np.ndarray, limit: int) -> np.ndarray:
+        if ids.size == 0:
+            return ids
+        unique, counts = np.unique(ids, return_counts=True)
+        # Stable sort on -count keeps lower (more popular) ranks first on ties.
+        order = np.argsort(-counts, kind="stable")[:limit]
+        return unique[order]
+
+    def _corating(self, rank: int, limit: int) -> np.ndarray:
+        users = self.item_users.indices[self.item_users.indptr[rank] : self.item_users.indptr[rank + 1]]
+        if users.size == 0:
+            return users
+        users = users[:RETRIEVAL_MAX_CORATING_USERS]
+        neighbours = self.user_items[users].indices
+        return self._top_by_count(neighbours[neighbours != rank], limit)
+
+    def _embedding(self, rank: int, limit: int) -> np.ndarray:
+        if self.embedding_lookup is None or self.embedding_lookup[rank] < 0:
+            return np.empty(0, dtype=np.int32)
+        row = self.embedding_lookup[rank]
+        sims = self.embedding_matrix @ self.embedding_matrix[row]
+        sims[row] = -np.inf
+        limit = min(limit, len(sims) - 1)
+        if limit <= 0:
+            return np.empty(0, dtype=np.int32)
+        top = np.argpartition(-sims, limit - 1)[:limit]
+        top = top[np.argsort(-sims[top])]
+        return self.embedding_ranks[top]
+
+    def _title(self, rank: int, limit: int) -> np.ndarray:
+        postings = [self.token_postings[token] for token in self.title_tokens[rank] if token in self.token_postings]
+        if not postings:
+            return np.empty(0, dtype=np.int32)
+        return self._top_by_count(np.concatenate(postings), limit)
+
+    def _author(self, rank: int, limit: int) -> np.ndarray:
+        return self.author_postings.get(self.rank_author[rank], np.empty(0, dtype=np.int32))[:limit]
+
+    def _publisher(self, rank: int, limit: int) -> np.ndarray:
+        return self.publisher_postings.get(self.rank_publisher[rank], np.empty(0, dtype=np.int32))[:limit]
+
+    def _popular(self, rank: int, limit: int) -> np.ndarray:
+        return np.arange(min(limit, self.num_books), dtype=np.int32)
+
+    def retrieve(self, book_index: int, pool_size: Optional[int] = None) -> np.ndarray:
+        """Return up to ``pool_size`` candidate catalog indices, excluding the query."""
+        pool_size = pool_size or RETRIEVAL_POOL_SIZE
+        rank = int(self.index_to_rank[book_index])
+        seen = {rank}
+        pool: List[int] = []
+        for name, limit in RETRIEVAL_SOURCE_LIMITS.items():
+            source = self.sources.get(name)
+            if source is None:
+                continue
+            for candidate in source(rank, limit).tolist():
+                if candidate not in seen:
+                    seen.add(candidate)
+                    pool.append(candidate)
+                    if len(pool) >= pool_size:
+                        return self.rank_to_index[pool]
+        return self.rank_to_index[np.asarray(pool, dtype=np.int32)]
@@ -0,0 +1,114 @@
+"""Flattened NumPy evaluator for LightGBM binary tree ensembles.
+
+All trees are laid out in shared node arrays and every (row, tree) pair that
+has not reached a leaf is advanced one level per step, so a prediction is at
+most ``max_depth`` vectorized gathers instead of a call into the LightGBM
+runtime. Only numerical splits are supported, which is all the pairwise
+recommender produces.
+"""
+
+from __future__ import annotations
+
+from typing import Dict, List
+
+import numpy as np
+
+# LightGBM treats |x| <= kZeroThreshold as zero for missing_type "Zero".
+ZERO_THRESHOLD = 1e-35
+MISSING_NONE, MISSING_ZERO, MISSING_NAN = 0, 1, 2
+MISSING_TYPES = {"None": MISSING_NONE, "Zero": MISSING_ZERO, "NaN": MISSING_NAN}
+
+
+class FlatTreeEnsemble:
+    """Arrays for every node of every tree; leaves loop back to themselves."""
+
+    def __init__(self, booster_dump: Dict):
+        features: List[int] = []
+        thresholds: List[float] = []
+        default_left: List[bool] = []
+        missing: List[int] = []
+        left: List[int] = []
+        right: List[int] = []
+        values: List[float] = []
+        roots: List[int] = []
+        max_depth = 0
+
+        def add(node: Dict, depth: int) -> int:
+            nonlocal max_depth
+            max_depth = max(max_depth, depth)
+            position = len(features)
+            features.append(0)
+            thresholds.append(0.0)
+            default_left.append(False)
+            missing.append(MISSING_NONE)
+            left.append(position)
+            right.append(position)
+            values.append(float(node.get("leaf_value", 0.0)))
+            if "split_index" not in node:
+                return position
+            if node.get("decision_type", "<=") != "<=":
+                raise ValueError("Only numerical splits can be flattened")
+            features[position] = int(node["split_feature"])
+            thresholds[position] = float(node["threshold"])
+            default_left[position] = bool(node["default_left"])
+            missing[position] = MISSING_TYPES[node.get("missing_type", "None")]
+            left[position] = add(node["left_child"], depth + 1)
+            right[position] = add(node["right_child"], depth + 1)
+            return position
+
+        for tree in booster_dump["tree_info"]:
+            roots.append(add(tree["tree_structure"], 0))
+
+        objective = booster_dump.get("objective", "")
+        if not objective.startswith("binary"):
+            raise ValueError(f"Unsupported objective for flattening: {objective!r}")
+        self.sigmoid = 1.0
+        for token in objective.split()[1:]:
+            if token.startswith("sigmoid:"):
+                self.sigmoid = float(token.split(":", 1)[1])
+
+        self.features = np.asarray(features, dtype=np.int32)
+        self.thresholds = np.asarray(thresholds, dtype=np.float64)
+        self.default_left = np.asarray(default_left, dtype=bool)
+        self.missing = np.asarray(missing, dtype=np.int8)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.values = np.asarray(values, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.max_depth = max_depth
+        self.num_features = int(booster_dump.get("max_feature_idx", -1)) + 1
+
+    @classmethod
+    def from_booster(cls, booster) -> "FlatTreeEnsemble":
+        return cls(booster.dump_model())
+
+    def raw_score(self, X: np.ndarray) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim != 2 or X.shape[1] < self.num_features:
+            raise ValueError(f"Expected {self.num_features} feature columns, got shape {X.shape}")
+        num_trees = len(self.roots)
+        nodes = np.tile(self.roots, len(X))
+        rows = np.repeat(np.arange(len(X)), num_trees)
+        # Only (row, tree) pairs still at a split node are advanced each step.
+        active = np.flatnonzero(self.left[nodes] != nodes)
+        while active.size:
+            current = nodes[active]
+            values = X[rows[active], self.features[current]]
+            missing = self.missing[current]
+            is_nan = np.isnan(values)
+            # missing_type None: NaN is compared as 0.
+            values = np.where(is_nan & (missing == MISSING_NONE), 0.0, values)
+            use_default = np.where(
+                missing == MISSING_ZERO,
+                is_nan | (np.abs(values) <= ZERO_THRESHOLD),
+                is_nan & (missing == MISSING_NAN),
+            )
+            go_left = np.where(use_default, self.default_left[current], values <= self.thresholds[current])
+            current = np.where(go_left, self.left[current], self.right[current])
+            nodes[active] = current
+            active = active[self.left[current] != current]
+        return self.values[nodes].reshape(len(X), num_trees).sum(axis=1)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Positive-class probability, matching ``Booster.predict`` for binary models."""
+        return 1.0 / (1.0 + np.exp(-self.sigmoid * self.raw_score(X)))
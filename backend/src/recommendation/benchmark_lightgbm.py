@@ -0,0 +1,68 @@
+"""Compare the LightGBM inference paths on real retrieval candidates.
+
+Usage::
+
+    python -m src.recommendation.benchmark_lightgbm --queries 200
+
+Each query book's retrieved pool is turned into pair features once; every
+predictor then scores the same chunks, so the timings only cover inference.
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from .. import config
+from ..book_repository import BookRepository
+from ..data_pipeline import get_clean_books
+from .algorithms.lightgbm_pairwise import PREDICTORS, LightGBMPairwiseRecommender
+
+
+def feature_batches(recommender: LightGBMPairwiseRecommender, queries: int, seed: int) -> List[np.ndarray]:
+    rng = np.random.default_rng(seed)
+    pool = recommender.candidate_indices
+    books = rng.choice(pool, size=min(queries, len(pool)), replace=False)
+    batches = []
+    for book_index in books.tolist():
+        candidates = recommender.retriever.retrieve(book_index)
+        for start in range(0, len(candidates), config.LGB_SCORE_CHUNK_SIZE):
+            chunk = candidates[start : start + config.LGB_SCORE_CHUNK_SIZE]
+            batches.append(recommender._pair_features(np.full(len(chunk), book_index), chunk))
+    return batches
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--queries", type=int, default=200, help="query books sampled from the candidate pool")
+    parser.add_argument("--repeat", type=int, default=3, help="timed passes per predictor (best is reported)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    recommender = LightGBMPairwiseRecommender(BookRepository(get_clean_books()))
+    batches = feature_batches(recommender, args.queries, args.seed)
+    rows = sum(len(batch) for batch in batches)
+    print(f"{len(batches)} chunks, {rows} pairs, {recommender.booster.num_trees()} trees, num_threads={config.LGB_NUM_THREADS}")
+
+    reference = np.concatenate([recommender.predict_proba(batch, "sklearn") for batch in batches])
+    print(f"{'predictor':<10} {'ms/chunk':>10} {'us/pair':>10} {'speedup':>9} {'max |diff|':>12}")
+    baseline = None
+    for predictor in ("sklearn",) + tuple(name for name in PREDICTORS if name != "sklearn"):
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            scores = [recommender.predict_proba(batch, predictor) for batch in batches]
+            best = min(best, time.perf_counter() - start)
+        baseline = baseline or best
+        diff = float(np.max(np.abs(np.concatenate(scores) - reference))) if rows else 0.0
+        print(
+            f"{predictor:<10} {best * 1000 / len(batches):>10.3f} {best * 1e6 / max(rows, 1):>10.2f}"
+            f" {baseline / best:>8.1f}x {diff:>12.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Thread-safe helpers for reusing recommendation work: an LRU cache and single-flight."""
+
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+class LRUCache(Generic[V]):
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[Hashable, V]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[V]:
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: V) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class _Call(Generic[V]):
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[V] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight(Generic[V]):
+    """Collapse concurrent calls for the same key into one computation.
+
+    The first caller for a key runs ``fn``; callers arriving while it is in
+    progress wait for it and receive the same result or exception. Nothing is
+    kept once the call finishes, so this only removes duplicate concurrent work.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call[V]] = {}
+        self._lock = threading.Lock()
+
+    def do(self, key: Hashable, fn: Callable[[], V], timeout: Optional[float] = None) -> Tuple[V, bool]:
+        """Return ``(result, shared)``; ``shared`` is True for callers that waited.
+
+        Waiting callers raise ``TimeoutError`` after ``timeout`` seconds; the
+        computation itself keeps running for its own caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if leader:
+            try:
+                call.result = fn()
+            except BaseException as exc:
+                call.error = exc
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call.done.set()
+            return call.result, False
+
+        if not call.done.wait(timeout):
+            raise TimeoutError("Timed out waiting for an identical in-flight call")
+        if call.error is not None:
+            raise call.error
+        return call.result, True
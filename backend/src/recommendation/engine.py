@@ -2,35 +2,159 @@
 
 from __future__ import annotations
 
-from typing import Dict, List, Optional, Tuple
+import hashlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, List, NamedTuple, Optional
 
-from .algorithms.base import AlgorithmInfo, BaseRecommender, RecommendationError
-from .algorithms.content_based import DINContentRecommender
-from .algorithms.lightfm_cf import LightFMCollaborativeRecommender
-from .algorithms.lightgbm_pairwise import LightGBMPairwiseRecommender
+from ..config import (
+    ENABLED_ALGORITHMS,
+    HYBRID_ALGORITHMS,
+    HYBRID_CANDIDATE_MULTIPLIER,
+    HYBRID_DEADLINE_MS,
+    HYBRID_FUSION,
+    HYBRID_MAX_WORKERS,
+    HYBRID_WEIGHTS,
+    MODEL_VERSION,
+    RESULT_CACHE_SIZE,
+    SHARD_COUNT,
+    SHARD_INDEX,
+    SINGLE_FLIGHT_TIMEOUT_MS,
+    USER_RESULT_CACHE_SIZE,
+)
+from ..data_pipeline import ratings_fingerprint
+from ..memory import structure_report
+from ..sharding import shard_of, shard_of_id
+from .algorithms.base import (
+    AlgorithmInfo,
+    BaseRecommender,
+    Deadline,
+    RecommendationError,
+    RecommendationTimeout,
+    ScoredBook,
+    deadline_expired,
+)
+from .cache import LRUCache, SingleFlight
+from .hybrid import FUSION_METHODS, fuse
+from .metrics import EngineMetrics
+from .registry import ALGORITHM_ENTRY_POINTS, load_algorithm
+from .user_history import UserHistoryStore
+
+FALLBACK_ALGORITHM = "popularity"
+PERSONALIZED_ALGORITHM = "din_content"
+HYBRID_INFO = AlgorithmInfo(
+    id="hybrid",
+    name="Hybrid Blend",
+    description="Concurrent LightGBM / DIN / CF results merged by rank fusion under a deadline",
+)
+
+
+class EngineResult(NamedTuple):
+    """Recommendations, the algorithm that produced them and whether they are final.
+
+    ``complete`` is False when timing shaped the answer: the deadline skipped
+    tiers or cut scoring short, or hybrid components were dropped. Such
+    results are neither cached by the engine nor meant for HTTP caches.
+    """
+
+    recommendations: List[ScoredBook]
+    algorithm: AlgorithmInfo
+    complete: bool = True
 
 
 class RecommendationEngine:
     """Registers all algorithms and routes requests with graceful fallbacks."""
 
-    def __init__(self, book_repo):
+    def __init__(self, book_repo, shard_index: int = SHARD_INDEX, shard_count: int = SHARD_COUNT):
         self.book_repo = book_repo
+        self.shard_index = shard_index
+        self.shard_count = shard_count
+        self.owners = shard_of(book_repo.book_ids, shard_count)
         self.algorithms: Dict[str, BaseRecommender] = {}
+        self.metrics = EngineMetrics()
         self.aliases = {
             "user_cf": "cf_mf",
-            "item_cf": "cf_mf",
             "deepfm": "din_content",
         }
         self._initialize_algorithms()
+        if shard_count > 1:
+            owned = self.owners == shard_index
+            for algo in self.algorithms.values():
+                algo.restrict_to(owned)
+        self._user_histories: Optional[UserHistoryStore] = None
+        self._user_histories_lock = threading.Lock()
+        self._user_results: LRUCache[EngineResult] = LRUCache(USER_RESULT_CACHE_SIZE)
+        self._results: LRUCache[EngineResult] = LRUCache(RESULT_CACHE_SIZE)
+        self._in_flight: SingleFlight[EngineResult] = SingleFlight()
+        self.version = self._model_version()
+        self._executor = ThreadPoolExecutor(max_workers=HYBRID_MAX_WORKERS, thread_name_prefix="hybrid")
 
     def _initialize_algorithms(self) -> None:
-        for cls in (
-            LightGBMPairwiseRecommender,
-            DINContentRecommender,
-            LightFMCollaborativeRecommender,
-        ):
-            instance = cls(self.book_repo)
+        # Heavy libraries are imported here, per enabled algorithm, not at module import.
+        for algo_id in ENABLED_ALGORITHMS or ALGORITHM_ENTRY_POINTS:
+            instance = load_algorithm(algo_id)(self.book_repo)
             self.algorithms[instance.info.id] = instance
+        self._wire_retrieval()
+
+    def _model_version(self) -> str:
+        """Identifier of the trained models: catalog, ratings data and algorithm set."""
+        parts = [MODEL_VERSION, self.book_repo.version, ratings_fingerprint(), *sorted(self.algorithms)]
+        return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+    def _wire_retrieval(self) -> None:
+        """Let LightGBM retrieve candidates from the LightFM embedding space."""
+        ranker = self.algorithms.get("lightgbm")
+        embeddings = self.algorithms.get("cf_mf")
+        if ranker is None or embeddings is None:
+            return
+        ranker.retriever.add_embedding_source(*embeddings.embedding_table())
+
+    @property
+    def user_histories(self) -> Optional[UserHistoryStore]:
+        """Per-user histories; built on first use, and only when the personalized algorithm is loaded."""
+        if PERSONALIZED_ALGORITHM not in self.algorithms:
+            return None
+        with self._user_histories_lock:
+            if self._user_histories is None:
+                self._user_histories = UserHistoryStore(self.book_repo, self.shard_index, self.shard_count)
+        return self._user_histories
+
+    def replace_algorithm(self, algorithm_id: str, algo: BaseRecommender) -> BaseRecommender:
+        """Serve ``algorithm_id`` from ``algo`` (e.g. a retrained instance); returns the previous one.
+
+        The new instance is restricted to this node's shard, cross-algorithm
+        wiring is redone and cached results are dropped.
+        """
+        previous = self.algorithms[algorithm_id]
+        if self.shard_count > 1:
+            algo.restrict_to(self.owners == self.shard_index)
+        self.algorithms[algorithm_id] = algo
+        self._wire_retrieval()
+        self._results.clear()
+        self._user_results.clear()
+        return previous
+
+    def owner_of(self, book_index: int) -> int:
+        """Shard that serves recommendations for ``book_index``."""
+        return int(self.owners[book_index])
+
+    def owns(self, book_index: int) -> bool:
+        return self.shard_count <= 1 or self.owners[book_index] == self.shard_index
+
+    def owner_of_user(self, user_id: int) -> int:
+        """Shard that keeps the history of ``user_id`` and answers for-user requests."""
+        return shard_of_id(user_id, self.shard_count)
+
+    def owns_user(self, user_id: int) -> bool:
+        return self.shard_count <= 1 or self.owner_of_user(user_id) == self.shard_index
+
+    def memory_report(self) -> Dict[str, Dict[str, int]]:
+        """Bytes per structure: the shared catalog, then each algorithm's own state."""
+        report = {"catalog": self.book_repo.memory_report()}
+        for algo_id, algo in self.algorithms.items():
+            report[algo_id] = structure_report(algo)
+        return report
 
     def list_algorithms(self) -> List[Dict]:
         base_list = [
@@ -39,10 +163,12 @@ class RecommendationEngine:
         ]
         alias_descriptions = {
             "user_cf": "User-based CF (alias of LightFM)",
-            "item_cf": "Item-based CF (alias of LightFM)",
             "deepfm": "DIN content model (alias of DIN)",
         }
+        base_list.append({"id": HYBRID_INFO.id, "name": HYBRID_INFO.name, "description": HYBRID_INFO.description})
         for alias, target in self.aliases.items():
+            if target not in self.algorithms:
+                continue
             base_list.append(
                 {
                     "id": alias,
@@ -52,13 +178,82 @@ class RecommendationEngine:
             )
         return base_list
 
+    def _run(
+        self,
+        algo: BaseRecommender,
+        book_index: int,
+        k: int,
+        deadline: Optional[Deadline],
+    ) -> List[ScoredBook]:
+        """Call one algorithm and record its outcome and latency."""
+        start = time.perf_counter()
+        try:
+            results = algo.recommend(book_index, k, deadline=deadline)
+        except RecommendationError:
+            outcome = "timeout" if deadline_expired(deadline) else "error"
+            self.metrics.record(algo.info.id, outcome, (time.perf_counter() - start) * 1000.0)
+            raise
+        outcome = "partial" if deadline_expired(deadline) else "ok"
+        self.metrics.record(algo.info.id, outcome, (time.perf_counter() - start) * 1000.0)
+        return results
+
     def recommend(
         self,
-        isbn: str,
+        book_index: int,
         k: int,
         algorithm_id: Optional[str] = None,
-    ) -> Tuple[List[Dict], AlgorithmInfo]:
-        """Try requested algorithm or fall back to defaults."""
+        fusion: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> EngineResult:
+        """Try requested algorithm or fall back to defaults.
+
+        The popularity charts are always appended as the final tier, so a
+        request only fails when no algorithm is configured at all. Once
+        ``deadline`` has passed the remaining model tiers are skipped; the
+        popularity tier still answers because it costs microseconds.
+
+        Concurrent calls with the same book, algorithm, fusion and ``k`` share
+        one computation: later callers wait for it (up to their own deadline)
+        and get its result or its error. A shared result that the leader's
+        deadline cut short is recomputed by a caller whose own deadline has not
+        passed, and is otherwise returned still marked incomplete. Complete
+        results are kept in an LRU cache; hybrid blends are not, since they
+        depend on which components happened to finish in time.
+        """
+        key = (book_index, algorithm_id, fusion, k)
+        cached = self._results.get(key)
+        if cached is not None:
+            self.metrics.record(cached.algorithm.id, "cached")
+            return cached
+
+        timeout = deadline.remaining() if deadline else SINGLE_FLIGHT_TIMEOUT_MS / 1000.0
+        try:
+            result, shared = self._in_flight.do(
+                key, lambda: self._recommend(book_index, k, algorithm_id, fusion, deadline), timeout
+            )
+        except TimeoutError:
+            raise RecommendationTimeout("Request deadline exceeded while waiting for an identical request") from None
+        if shared:
+            self.metrics.record(result.algorithm.id, "shared")
+            if result.complete or deadline_expired(deadline):
+                return result
+            # The leader ran out of time; this caller still has some, so try itself.
+            result = self._recommend(book_index, k, algorithm_id, fusion, deadline)
+        if algorithm_id != HYBRID_INFO.id and result.complete:
+            self._results.put(key, result)
+        return result
+
+    def _recommend(
+        self,
+        book_index: int,
+        k: int,
+        algorithm_id: Optional[str],
+        fusion: Optional[str],
+        deadline: Optional[Deadline],
+    ) -> EngineResult:
+        if algorithm_id == HYBRID_INFO.id:
+            return self.recommend_hybrid(book_index, k, fusion=fusion, deadline=deadline)
+
         ordered_algorithms: List[BaseRecommender]
         if algorithm_id:
             resolved_id = self.aliases.get(algorithm_id, algorithm_id)
@@ -67,14 +262,120 @@ class RecommendationEngine:
                 raise RecommendationError(f"Unsupported algorithm: {algorithm_id}")
             ordered_algorithms = [algo]
         else:
-            priority = ["lightgbm", "din_content", "cf_mf"]
+            # item_cf covers every co-rated book, pixie any book with a rating;
+            # content_tfidf also covers cold-start books that nobody has rated yet.
+            priority = ["lightgbm", "din_content", "cf_mf", "item_cf", "pixie", "content_tfidf"]
             ordered_algorithms = [self.algorithms[name] for name in priority if name in self.algorithms]
+        fallback = self.algorithms.get(FALLBACK_ALGORITHM)
+        if fallback is not None and fallback not in ordered_algorithms:
+            ordered_algorithms.append(fallback)
 
-        last_error: Optional[Exception] = None
+        last_error: Optional[RecommendationError] = None
         for algo in ordered_algorithms:
+            if algo is not fallback and deadline_expired(deadline):
+                self.metrics.record(algo.info.id, "skipped")
+                last_error = RecommendationTimeout("Request deadline exceeded")
+                continue
             try:
-                return algo.recommend(isbn, k), algo.info
+                results = self._run(algo, book_index, k, deadline)
             except RecommendationError as exc:
                 last_error = exc
                 continue
+            return EngineResult(results, algo.info, not deadline_expired(deadline))
+        if isinstance(last_error, RecommendationTimeout):
+            raise last_error
         raise RecommendationError(str(last_error) if last_error else "No algorithms configured")
+
+    def recommend_hybrid(
+        self,
+        book_index: int,
+        k: int,
+        fusion: Optional[str] = None,
+        deadline: Optional[Deadline] = None,
+    ) -> EngineResult:
+        """Run the eligible algorithms concurrently and fuse whatever finishes in time.
+
+        Components share the tighter of the request deadline and
+        ``HYBRID_DEADLINE_MS``, so they stop cooperatively instead of holding
+        pool threads. Algorithms that raise or miss the deadline are left out
+        of the blend; if none contribute, the popularity fallback answers.
+        The blend is complete only if every component finished in time.
+        """
+        method = fusion if fusion in FUSION_METHODS else HYBRID_FUSION
+        budget = deadline.earliest(HYBRID_DEADLINE_MS) if deadline else Deadline(HYBRID_DEADLINE_MS)
+        depth = k * HYBRID_CANDIDATE_MULTIPLIER
+        futures = {
+            self._executor.submit(self._run, self.algorithms[algo_id], book_index, depth, budget): algo_id
+            for algo_id in HYBRID_ALGORITHMS
+            if algo_id in self.algorithms
+        }
+        done, pending = wait(futures, timeout=budget.remaining())
+        for future in pending:
+            future.cancel()
+            self.metrics.record(futures[future], "dropped")
+
+        rankings: Dict[str, List[ScoredBook]] = {}
+        for future in done:
+            try:
+                results = future.result()
+            except RecommendationError:
+                continue
+            if results:
+                rankings[futures[future]] = results
+        complete = not pending and not budget.expired()
+
+        if not rankings:
+            fallback = self.algorithms.get(FALLBACK_ALGORITHM)
+            if fallback is None:
+                raise RecommendationTimeout("No hybrid component finished before the deadline")
+            return EngineResult(self._run(fallback, book_index, k, None), fallback.info, complete)
+        return EngineResult(fuse(rankings, HYBRID_WEIGHTS, k, method), HYBRID_INFO, complete)
+
+    def recommend_for_user(
+        self,
+        user_id: int,
+        k: int,
+        deadline: Optional[Deadline] = None,
+    ) -> EngineResult:
+        """Personalized top-k for one user, excluding books they already rated.
+
+        DIN scores the candidate pool against the user's own history; if it
+        fails for this user, the item-to-item chain runs from the most recent
+        book. Without a loaded DIN model no histories are kept and this raises.
+        Complete results are kept in a per-user LRU cache.
+        """
+        key = (user_id, k)
+        cached = self._user_results.get(key)
+        if cached is not None:
+            return cached
+
+        histories = self.user_histories
+        if histories is None:
+            raise RecommendationError("Personalized recommendations need the DIN model")
+        entry = histories.lookup(user_id)
+        if entry is None:
+            raise RecommendationError("Unknown user or user has no ratings")
+        history, user_feature = entry
+
+        din = self.algorithms.get(PERSONALIZED_ALGORITHM)
+        result: Optional[EngineResult] = None
+        if din is not None and not deadline_expired(deadline):
+            start = time.perf_counter()
+            try:
+                result = EngineResult(din.recommend_for_user(history, user_feature, k, deadline=deadline), din.info)
+                self.metrics.record(din.info.id, "ok", (time.perf_counter() - start) * 1000.0)
+            except RecommendationError:
+                self.metrics.record(din.info.id, "error", (time.perf_counter() - start) * 1000.0)
+
+        if result is None:
+            seen = set(history.tolist())
+            # Seed from the most recent book this shard serves; other books' tables are not kept here.
+            owned = history[self.owners[history] == self.shard_index] if self.shard_count > 1 else history
+            seed = int((owned if owned.size else history)[-1])
+            recommendations, info, complete = self.recommend(seed, k + len(seen), deadline=deadline)
+            result = EngineResult([item for item in recommendations if item.index not in seen][:k], info, complete)
+
+        result = result._replace(complete=result.complete and not deadline_expired(deadline))
+        if result.complete:
+            self._user_results.put(key, result)
+        return result
@@ -0,0 +1,338 @@
+"""Offline ranking-quality evaluation tied to the latency/quality config knobs.
+
+Usage::
+
+    python -m src.recommendation.evaluation            # evaluate every algorithm
+    python -m src.recommendation.evaluation --sweep    # also sweep EVAL_SWEEP_GRID
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import sys
+import time
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .. import config
+from ..book_repository import BookRepository
+from ..data_pipeline import get_book_rating_stats, get_clean_books, get_ratings, ratings_fingerprint
+from .algorithms.base import BaseRecommender, RecommendationError
+from . import engine as engine_module
+from .engine import RecommendationEngine
+from .registry import import_algorithm_modules
+
+ALGORITHMS_PACKAGE = "src.recommendation.algorithms"
+
+# Which algorithm has to be retrained when a knob changes.
+KNOB_ALGORITHMS = {
+    "LGB_CANDIDATE_POOL_SIZE": "lightgbm",
+    "RETRIEVAL_POOL_SIZE": "lightgbm",
+    "DIN_CANDIDATE_POOL_SIZE": "din_content",
+    "DIN_MAX_HISTORIES_PER_ITEM": "din_content",
+    "CF_MIN_BOOK_RATINGS": "cf_mf",
+    "CF_MIN_USER_RATINGS": "cf_mf",
+    "ITEM_CF_MIN_BOOK_RATINGS": "item_cf",
+}
+
+
+@dataclass
+class HoldoutSplit:
+    train: pd.DataFrame
+    queries: List[Tuple[int, List[int]]]
+
+
+@dataclass
+class AlgorithmReport:
+    algorithm: str
+    k: int
+    recall: float
+    ndcg: float
+    coverage: float
+    query_coverage: float
+    latency_mean_ms: float
+    latency_p50_ms: float
+    latency_p95_ms: float
+    settings: Dict[str, object] = field(default_factory=dict)
+    pareto: bool = False
+
+
+def temporal_holdout(
+    ratings: pd.DataFrame,
+    book_repo: BookRepository,
+    holdout_size: int = config.EVAL_HOLDOUT_SIZE,
+    min_user_ratings: int = config.EVAL_MIN_USER_RATINGS,
+    max_users: int = config.EVAL_MAX_USERS,
+    random_state: int = config.EVAL_RANDOM_STATE,
+) -> HoldoutSplit:
+    """Hold out each sampled user's last explicit ratings.
+
+    Book-Crossing has no timestamps, so file order is used as the time axis,
+    matching how the DIN recommender orders histories. The query for a user is
+    the last book they rated before the held-out ones. Queries and held-out
+    books are catalog indices.
+    """
+    ratings = book_repo.with_book_index(ratings).reset_index(drop=True)
+    explicit = ratings[ratings["Book-Rating"] > 0]
+
+    user_counts = explicit.groupby("User-ID")["ISBN"].count()
+    eligible = user_counts[user_counts >= max(min_user_ratings, holdout_size + 1)].index
+    if len(eligible) == 0:
+        raise RuntimeError("No users with enough ratings for a temporal holdout")
+    rng = np.random.default_rng(random_state)
+    if len(eligible) > max_users:
+        eligible = rng.choice(np.asarray(eligible), size=max_users, replace=False)
+    sampled = explicit[explicit["User-ID"].isin(set(eligible))]
+
+    heldout_rows: List[int] = []
+    queries: List[Tuple[int, List[int]]] = []
+    for _, group in sampled.groupby("User-ID", sort=True):
+        test = group.tail(holdout_size)
+        history = group.iloc[: len(group) - holdout_size]
+        if history.empty:
+            continue
+        heldout_rows.extend(test.index.tolist())
+        queries.append((int(history["book_index"].iloc[-1]), test["book_index"].tolist()))
+
+    train = ratings.drop(index=heldout_rows).drop(columns="book_index")
+    return HoldoutSplit(train=train, queries=queries)
+
+
+def _algorithm_modules() -> List:
+    # Algorithms are imported lazily; load them so their globals can be patched.
+    import_algorithm_modules()
+    return [
+        module
+        for name, module in list(sys.modules.items())
+        if module is not None and name.startswith(ALGORITHMS_PACKAGE)
+    ]
+
+
+@contextmanager
+def patched_environment(
+    train: Optional[pd.DataFrame] = None,
+    overrides: Optional[Dict[str, object]] = None,
+) -> Iterator[None]:
+    """Temporarily point the algorithms at the training split and knob overrides.
+
+    Algorithms import their settings, ``get_ratings`` and
+    ``stream_book_rating_stats`` by name, so the patch is applied to every
+    loaded module of the algorithms package (and the engine).
+    ``ratings_fingerprint`` gains a marker of the split, so on-disk caches
+    keyed by it (the DIN context arena) are never shared between the split and
+    the full ratings.
+    """
+    replacements: Dict[str, object] = dict(overrides or {})
+    if train is not None:
+
+        def _train_ratings(filtered: bool = True) -> pd.DataFrame:
+            if filtered:
+                return train[train["Book-Rating"] > 0]
+            return train.copy()
+
+        split_fingerprint = "{}-split-{}".format(
+            ratings_fingerprint(),
+            hashlib.sha1(pd.util.hash_pandas_object(train, index=False).to_numpy().tobytes()).hexdigest()[:16],
+        )
+
+        def _train_fingerprint() -> str:
+            return split_fingerprint
+
+        def _train_rating_stats(filtered: bool = True, chunk_size: Optional[int] = None) -> pd.DataFrame:
+            return get_book_rating_stats(_train_ratings(filtered))
+
+        replacements["get_ratings"] = _train_ratings
+        replacements["stream_book_rating_stats"] = _train_rating_stats
+        replacements["ratings_fingerprint"] = _train_fingerprint
+
+    saved: List[Tuple[object, str, object]] = []
+    for module in [config, engine_module, *_algorithm_modules()]:
+        for name, value in replacements.items():
+            if hasattr(module, name):
+                saved.append((module, name, getattr(module, name)))
+                setattr(module, name, value)
+    try:
+        yield
+    finally:
+        for module, name, value in reversed(saved):
+            setattr(module, name, value)
+
+
+def _dcg(relevances: Sequence[int]) -> float:
+    return sum(rel / math.log2(pos + 2) for pos, rel in enumerate(relevances))
+
+
+def evaluate_algorithm(
+    algo: BaseRecommender,
+    queries: Sequence[Tuple[int, List[int]]],
+    k: int,
+    catalog_size: int,
+) -> AlgorithmReport:
+    """Compute recall@k, NDCG@k, coverage and latency for one algorithm."""
+    recalls: List[float] = []
+    ndcgs: List[float] = []
+    latencies: List[float] = []
+    recommended: set = set()
+    answered = 0
+
+    for query_index, relevant in queries:
+        relevant_set = set(relevant)
+        start = time.perf_counter()
+        try:
+            results = algo.recommend(query_index, k)
+        except RecommendationError:
+            results = []
+        else:
+            answered += 1
+        latencies.append((time.perf_counter() - start) * 1000.0)
+
+        ranked = [item.index for item in results[:k]]
+        recommended.update(ranked)
+        gains = [1 if index in relevant_set else 0 for index in ranked]
+        recalls.append(sum(gains) / len(relevant_set))
+        ideal = _dcg([1] * min(len(relevant_set), k))
+        ndcgs.append(_dcg(gains) / ideal if ideal else 0.0)
+
+    total = len(queries) or 1
+    lat = np.asarray(latencies or [0.0])
+    return AlgorithmReport(
+        algorithm=algo.info.id,
+        k=k,
+        recall=float(np.mean(recalls)) if recalls else 0.0,
+        ndcg=float(np.mean(ndcgs)) if ndcgs else 0.0,
+        coverage=len(recommended) / max(catalog_size, 1),
+        query_coverage=answered / total,
+        latency_mean_ms=float(lat.mean()),
+        latency_p50_ms=float(np.percentile(lat, 50)),
+        latency_p95_ms=float(np.percentile(lat, 95)),
+    )
+
+
+def evaluate_engine(engine: RecommendationEngine, split: HoldoutSplit, k: int) -> List[AlgorithmReport]:
+    catalog_size = engine.book_repo.num_books
+    return [
+        evaluate_algorithm(algo, split.queries, k, catalog_size)
+        for algo in engine.algorithms.values()
+    ]
+
+
+def mark_pareto(reports: List[AlgorithmReport]) -> List[AlgorithmReport]:
+    """Flag reports that no other report beats on both NDCG and p50 latency."""
+    for report in reports:
+        report.pareto = not any(
+            other is not report
+            and other.ndcg >= report.ndcg
+            and other.latency_p50_ms <= report.latency_p50_ms
+            and (other.ndcg > report.ndcg or other.latency_p50_ms < report.latency_p50_ms)
+            for other in reports
+        )
+    return reports
+
+
+def sweep(
+    book_repo: BookRepository,
+    split: HoldoutSplit,
+    k: int,
+    engine: RecommendationEngine,
+    grid: Optional[Dict[str, Sequence[object]]] = None,
+) -> Dict[str, List[AlgorithmReport]]:
+    """Retrain the affected algorithm for every knob value and collect reports."""
+    grid = grid if grid is not None else config.EVAL_SWEEP_GRID
+    catalog_size = book_repo.num_books
+    tables: Dict[str, List[AlgorithmReport]] = {}
+    for knob, values in grid.items():
+        algorithm_id = KNOB_ALGORITHMS.get(knob)
+        if algorithm_id not in engine.algorithms:
+            print(f"Skipping {knob}: algorithm {algorithm_id!r} is not loaded")
+            continue
+        original = engine.algorithms[algorithm_id]
+        reports: List[AlgorithmReport] = []
+        for value in values:
+            with patched_environment(split.train, {knob: value}):
+                try:
+                    algo = type(original)(book_repo)
+                except RuntimeError as exc:
+                    print(f"{knob}={value}: training failed ({exc})")
+                    continue
+                # Swap the retrained instance in so cross-algorithm wiring applies.
+                engine.replace_algorithm(algorithm_id, algo)
+                try:
+                    report = evaluate_algorithm(algo, split.queries, k, catalog_size)
+                finally:
+                    engine.replace_algorithm(algorithm_id, original)
+            report.settings = {knob: value}
+            reports.append(report)
+        tables[knob] = mark_pareto(reports)
+    return tables
+
+
+def format_table(reports: Sequence[AlgorithmReport], label: str = "algorithm") -> str:
+    headers = [label, "recall", "ndcg", "coverage", "answered", "p50_ms", "p95_ms", "pareto"]
+    rows = []
+    for report in reports:
+        name = ", ".join(f"{key}={val}" for key, val in report.settings.items()) or report.algorithm
+        rows.append(
+            [
+                name,
+                f"{report.recall:.4f}",
+                f"{report.ndcg:.4f}",
+                f"{report.coverage:.4f}",
+                f"{report.query_coverage:.2%}",
+                f"{report.latency_p50_ms:.2f}",
+                f"{report.latency_p95_ms:.2f}",
+                "*" if report.pareto else "",
+            ]
+        )
+    widths = [max(len(str(cell)) for cell in column) for column in zip(headers, *rows)]
+    lines = ["  ".join(str(cell).ljust(width) for cell, width in zip(row, widths)) for row in [headers, *rows]]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=config.EVAL_TOP_K)
+    parser.add_argument("--max-users", type=int, default=config.EVAL_MAX_USERS)
+    parser.add_argument("--holdout", type=int, default=config.EVAL_HOLDOUT_SIZE)
+    parser.add_argument("--sweep", action="store_true", help="sweep the knobs in EVAL_SWEEP_GRID")
+    parser.add_argument("--output", default=str(config.PROCESSED_DATA_DIR / "evaluation_report.json"))
+    args = parser.parse_args(argv)
+
+    book_repo = BookRepository(get_clean_books())
+    split = temporal_holdout(
+        get_ratings(filtered=False),
+        book_repo,
+        holdout_size=args.holdout,
+        max_users=args.max_users,
+    )
+    print(f"Holdout: {len(split.queries)} users, {len(split.train)} training ratings")
+
+    with patched_environment(split.train):
+        engine = RecommendationEngine(book_repo)
+    reports = mark_pareto(evaluate_engine(engine, split, args.k))
+    print(f"\n=== Algorithms @ k={args.k} ===")
+    print(format_table(reports))
+
+    output = {"k": args.k, "users": len(split.queries), "algorithms": [asdict(r) for r in reports]}
+    if args.sweep:
+        tables = sweep(book_repo, split, args.k, engine)
+        output["sweeps"] = {knob: [asdict(r) for r in rows] for knob, rows in tables.items()}
+        for knob, rows in tables.items():
+            print(f"\n=== Sweep {knob} ({KNOB_ALGORITHMS[knob]}) ===")
+            print(format_table(rows, label="setting"))
+
+    config.ensure_directories()
+    with open(args.output, "w", encoding="utf-8") as handle:
+        json.dump(output, handle, indent=2, ensure_ascii=False)
+    print(f"\nEvaluation report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Score fusion helpers for blending several algorithms' rankings."""
+
+from __future__ import annotations
+
+from typing import Dict, List, Mapping
+
+from ..config import HYBRID_RRF_K
+from .algorithms.base import ScoredBook
+
+FUSION_METHODS = ("rrf", "weighted")
+
+
+def reciprocal_rank_fusion(
+    rankings: Mapping[str, List[ScoredBook]],
+    weights: Mapping[str, float],
+    rrf_k: int = HYBRID_RRF_K,
+) -> Dict[int, float]:
+    """Weighted RRF: ``sum(w / (rrf_k + rank))``; ignores the raw score scales."""
+    fused: Dict[int, float] = {}
+    for algo_id, results in rankings.items():
+        weight = weights.get(algo_id, 1.0)
+        for rank, item in enumerate(results, start=1):
+            fused[item.index] = fused.get(item.index, 0.0) + weight / (rrf_k + rank)
+    return fused
+
+
+def weighted_score_fusion(
+    rankings: Mapping[str, List[ScoredBook]],
+    weights: Mapping[str, float],
+) -> Dict[int, float]:
+    """Min-max normalize each algorithm's scores, then take the weighted sum."""
+    fused: Dict[int, float] = {}
+    for algo_id, results in rankings.items():
+        scores = [item.score or 0.0 for item in results]
+        if not scores:
+            continue
+        low, high = min(scores), max(scores)
+        span = high - low
+        weight = weights.get(algo_id, 1.0)
+        for item, score in zip(results, scores):
+            normalized = (score - low) / span if span > 0 else 1.0
+            fused[item.index] = fused.get(item.index, 0.0) + weight * normalized
+    return fused
+
+
+def fuse(
+    rankings: Mapping[str, List[ScoredBook]],
+    weights: Mapping[str, float],
+    k: int,
+    method: str = "rrf",
+) -> List[ScoredBook]:
+    """Blend per-algorithm result lists into one top-k list."""
+    if method == "weighted":
+        fused = weighted_score_fusion(rankings, weights)
+    else:
+        fused = reciprocal_rank_fusion(rankings, weights)
+
+    ranked = sorted(fused.items(), key=lambda pair: pair[1], reverse=True)[:k]
+    return [ScoredBook(index, score) for index, score in ranked]
@@ -0,0 +1,47 @@
+"""Thread-safe counters describing how each algorithm behaves in production."""
+
+from __future__ import annotations
+
+import threading
+from collections import defaultdict
+from typing import Dict, Optional
+
+# Outcomes that mean the request deadline cut an algorithm short.
+TIMEOUT_OUTCOMES = ("timeout", "partial", "skipped", "dropped")
+# Outcomes recorded without a latency of their own.
+UNTIMED_OUTCOMES = ("skipped", "dropped", "shared", "cached")
+
+
+class EngineMetrics:
+    """Per-algorithm outcome counts and latency totals.
+
+    Outcomes: ``ok``, ``error``, ``partial`` (returned best-so-far results at
+    the deadline), ``timeout`` (raised after the deadline), ``skipped`` (never
+    started because the deadline had passed), ``dropped`` (left out of a
+    hybrid blend because it had not finished in time), ``shared`` (answered
+    by an identical request that was already in flight) and ``cached``
+    (answered from the engine's result cache).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._latency_ms: Dict[str, float] = defaultdict(float)
+
+    def record(self, algorithm_id: str, outcome: str, elapsed_ms: Optional[float] = None) -> None:
+        with self._lock:
+            self._counts[algorithm_id][outcome] += 1
+            if elapsed_ms is not None:
+                self._latency_ms[algorithm_id] += elapsed_ms
+
+    def snapshot(self) -> Dict[str, Dict]:
+        with self._lock:
+            report = {}
+            for algorithm_id, outcomes in self._counts.items():
+                timed = sum(count for outcome, count in outcomes.items() if outcome not in UNTIMED_OUTCOMES)
+                report[algorithm_id] = {
+                    "outcomes": dict(outcomes),
+                    "timeouts": sum(outcomes.get(outcome, 0) for outcome in TIMEOUT_OUTCOMES),
+                    "mean_latency_ms": round(self._latency_ms[algorithm_id] / timed, 3) if timed else None,
+                }
+            return report
@@ -0,0 +1,37 @@
+"""Entry points of the recommendation algorithms, imported on first use.
+
+Each algorithm module pulls in its own heavy libraries (torch, lightgbm,
+lightfm, scipy, sklearn), so the engine and the tools built on it only pay
+for them when that algorithm is actually instantiated.
+"""
+
+from __future__ import annotations
+
+import importlib
+from typing import Dict, Iterable, List, Type
+
+# Initialization order is the registration order below.
+ALGORITHM_ENTRY_POINTS: Dict[str, str] = {
+    "lightgbm": ".algorithms.lightgbm_pairwise:LightGBMPairwiseRecommender",
+    "din_content": ".algorithms.content_based:DINContentRecommender",
+    "cf_mf": ".algorithms.lightfm_cf:LightFMCollaborativeRecommender",
+    "item_cf": ".algorithms.item_cf:ItemCFRecommender",
+    "pixie": ".algorithms.pixie:PixieRecommender",
+    "content_tfidf": ".algorithms.content_tfidf:TfidfContentRecommender",
+    "popularity": ".algorithms.popularity:PopularityRecommender",
+}
+
+
+def load_algorithm(algo_id: str) -> Type:
+    """Import the module behind ``algo_id`` and return its recommender class."""
+    try:
+        module_name, class_name = ALGORITHM_ENTRY_POINTS[algo_id].split(":")
+    except KeyError:
+        raise KeyError(f"Unknown algorithm: {algo_id}") from None
+    module = importlib.import_module(module_name, package=__package__)
+    return getattr(module, class_name)
+
+
+def import_algorithm_modules(algo_ids: Iterable[str] = ALGORITHM_ENTRY_POINTS) -> List[Type]:
+    """Eagerly import several algorithms, e.g. before patching their module globals."""
+    return [load_algorithm(algo_id) for algo_id in algo_ids]
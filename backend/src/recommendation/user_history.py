@@ -0,0 +1,75 @@
+"""Compact per-user reading histories for personalized recommendations."""
+
+from __future__ import annotations
+
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..data_pipeline import get_users, iter_ratings
+from ..sharding import shard_of
+
+
+def normalized_user_ages(users: Optional[pd.DataFrame] = None) -> pd.Series:
+    """Age clipped to [5, 90], median-imputed and min-max scaled, indexed by User-ID."""
+    users = get_users() if users is None else users
+    ages = users["Age"].clip(lower=5, upper=90)
+    ages = ages.fillna(ages.median())
+    min_age, max_age = ages.min(), ages.max()
+    denom = max(max_age - min_age, 1)
+    return pd.Series(((ages - min_age) / denom).to_numpy(), index=users["User-ID"].to_numpy(), name="age_norm")
+
+
+class UserHistoryStore:
+    """Explicit ratings grouped per user in CSR arrays, in file (time) order.
+
+    ``user_ids`` is sorted so a lookup is one ``searchsorted``; the books a
+    user rated are ``items[indptr[row]:indptr[row + 1]]`` (catalog indices,
+    oldest first) and ``ages[row]`` is the DIN age feature. Built from the
+    ratings stream: only the (user, catalog index) pairs are ever held, and
+    with ``shard_count > 1`` only those of users hashed to ``shard_index``.
+    """
+
+    DEFAULT_AGE = 0.5
+
+    def __init__(self, book_repo, shard_index: int = 0, shard_count: int = 1):
+        users, items = [], []
+        for chunk in iter_ratings(filtered=True):
+            indices = book_repo.indices_of_isbns(chunk["ISBN"])
+            chunk_users = chunk["User-ID"].to_numpy()
+            keep = indices >= 0
+            if shard_count > 1:
+                keep &= shard_of(chunk_users, shard_count) == shard_index
+            users.append(chunk_users[keep])
+            items.append(indices[keep])
+        users = np.concatenate(users) if users else np.empty(0, dtype=np.int64)
+        items = np.concatenate(items) if items else np.empty(0, dtype=np.int32)
+        # Stable sort keeps each user's ratings in file order.
+        order = np.argsort(users, kind="stable")
+        user_ids, counts = np.unique(users[order], return_counts=True)
+
+        self.user_ids = user_ids.astype(np.int64)
+        self.indptr = np.zeros(len(user_ids) + 1, dtype=np.int64)
+        np.cumsum(counts, out=self.indptr[1:])
+        self.items = items[order].astype(np.int32)
+
+        ages = normalized_user_ages()
+        ages = ages[~ages.index.duplicated()]
+        self.ages = ages.reindex(self.user_ids).fillna(self.DEFAULT_AGE).to_numpy(dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.user_ids)
+
+    def _row(self, user_id: int) -> Optional[int]:
+        row = int(np.searchsorted(self.user_ids, user_id))
+        if row < len(self.user_ids) and self.user_ids[row] == user_id:
+            return row
+        return None
+
+    def lookup(self, user_id: int) -> Optional[Tuple[np.ndarray, float]]:
+        """(history of catalog indices, age feature) or ``None`` for unknown users."""
+        row = self._row(user_id)
+        if row is None:
+            return None
+        return self.items[self.indptr[row] : self.indptr[row + 1]], float(self.ages[row])
@@ -0,0 +1,58 @@
+"""Append-only JSONL log of book and recommendation requests.
+
+One line per request::
+
+    {"ts": 1760000000.123, "path": "/api/recommendations/by-book", "args": {"book_id": "42", "k": "5"},
+     "status": 200, "ms": 3.81}
+
+POST requests also carry their JSON ``body``. The log is enough to replay the
+traffic (``src/services/replay.py``) and to find the hottest books for cache
+warming at startup.
+"""
+
+from __future__ import annotations
+
+import json
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Union
+
+# Health checks and system endpoints are monitoring noise, not user traffic.
+LOGGED_PREFIXES = ("/api/books", "/api/recommendations")
+
+
+class AccessLog:
+    """Thread-safe, line-buffered JSONL writer (one ``write`` per request)."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._handle = self.path.open("a", encoding="utf-8", buffering=1)
+        self._lock = threading.Lock()
+
+    def record(
+        self, path: str, args: Dict[str, str], status: int, elapsed_ms: float, body: Optional[Dict] = None
+    ) -> None:
+        entry = {"ts": round(time.time(), 3), "path": path, "args": args, "status": status, "ms": round(elapsed_ms, 2)}
+        if body is not None:
+            entry["body"] = body
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n"
+        with self._lock:
+            self._handle.write(line)
+
+    def close(self) -> None:
+        with self._lock:
+            self._handle.close()
+
+
+def read_access_log(path: Union[str, Path]) -> Iterator[Dict]:
+    """Records of an access log in file order; truncated or malformed lines are skipped."""
+    with Path(path).open(encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and "path" in record:
+                yield record
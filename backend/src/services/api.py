@@ -2,16 +2,39 @@
 
 from __future__ import annotations
 
-from typing import Optional
-
-from flask import Flask, jsonify, request
+import hashlib
+import time
+from collections import Counter
+from functools import wraps
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Tuple
+
+from flask import Flask, Response, g, request
 from flask_cors import CORS
 
 from ..book_repository import BookRepository
-from ..config import DEFAULT_SEARCH_LIMIT, DEFAULT_TOP_K
-from ..data_pipeline import get_clean_books
-from ..recommendation.engine import RecommendationEngine
-from ..recommendation.algorithms.base import RecommendationError
+from ..config import (
+    ACCESS_LOG_PATH,
+    BATCH_MAX_BOOKS,
+    CACHE_MAX_AGE_ALGORITHMS,
+    CACHE_MAX_AGE_BOOK,
+    CACHE_MAX_AGE_RECOMMENDATIONS,
+    CACHE_MAX_AGE_SEARCH,
+    COMPRESSION_MIN_BYTES,
+    DEFAULT_REQUEST_TIMEOUT_MS,
+    DEFAULT_SEARCH_LIMIT,
+    DEFAULT_TOP_K,
+    MAX_REQUEST_TIMEOUT_MS,
+    SERVICE_PORT,
+    USER_HISTORY_PREVIEW,
+    WARM_LOG_PATH,
+    WARM_TOP_N,
+)
+from ..data_pipeline import get_clean_books, stream_book_rating_stats
+from ..recommendation.engine import HYBRID_INFO, RecommendationEngine
+from ..recommendation.algorithms.base import Deadline, RecommendationError, RecommendationTimeout
+from .access_log import LOGGED_PREFIXES, AccessLog, read_access_log
+from .serialization import BookFragments, choose_encoding, compress, normalize_fields, render_envelope
 
 app = Flask(__name__)
 CORS(app)
@@ -19,11 +42,15 @@ CORS(app)
 books_df = get_clean_books()
 BOOK_REPO = BookRepository(books_df)
 ENGINE = RecommendationEngine(BOOK_REPO)
+BOOK_REPO.build_title_index(BOOK_REPO.counts_by_index(stream_book_rating_stats(filtered=False)))
+FRAGMENTS = BookFragments(BOOK_REPO)
+ACCESS_LOG = AccessLog(ACCESS_LOG_PATH) if ACCESS_LOG_PATH else None
 
 
 def create_response(code=0, message="ok", data=None, status=200):
-    payload = {"code": code, "message": message, "data": data}
-    return jsonify(payload), status
+    response = Response(render_envelope(code, message, data), status=status, mimetype="application/json")
+    response.envelope_code = code
+    return response
 
 
 def parse_positive_int(value: str, fallback: int) -> int:
@@ -34,65 +61,221 @@ def parse_positive_int(value: str, fallback: int) -> int:
         return fallback
 
 
+def request_deadline() -> Deadline:
+    """Deadline from ``timeout_ms`` (query) or ``X-Request-Timeout-Ms`` (header)."""
+    raw = request.args.get("timeout_ms") or request.headers.get("X-Request-Timeout-Ms")
+    timeout_ms = parse_positive_int(raw, DEFAULT_REQUEST_TIMEOUT_MS)
+    g.deadline = Deadline(min(timeout_ms, MAX_REQUEST_TIMEOUT_MS))
+    return g.deadline
+
+
+class InvalidFieldsError(ValueError):
+    """Raised when ``fields=`` names an unknown book field."""
+
+
+@app.errorhandler(InvalidFieldsError)
+def invalid_fields(exc: InvalidFieldsError):
+    return create_response(1, f"参数错误：未知字段 {exc}", status=400)
+
+
+def requested_fields() -> Optional[Tuple[str, ...]]:
+    """Book field projection from ``fields=title,author,...`` (``None`` = all fields)."""
+    try:
+        return normalize_fields(request.args.get("fields", "").split(","))
+    except ValueError as exc:
+        raise InvalidFieldsError(str(exc)) from None
+
+
+def misdirected(book_index: int) -> Optional[Response]:
+    """421 naming the owning shard when this node does not serve ``book_index``."""
+    if ENGINE.owns(book_index):
+        return None
+    return create_response(421, "该图书由其他分片负责", {"shard": ENGINE.owner_of(book_index)}, status=421)
+
+
+def recommendation_failed(exc: RecommendationError):
+    if isinstance(exc, RecommendationTimeout):
+        return create_response(408, f"推荐超时：{exc}", {"recommendations": []})
+    return create_response(2, f"无法生成推荐：{exc}", {"recommendations": []})
+
+
+# Query parameters that never change the response body.
+ETAG_IGNORED_PARAMS = {"timeout_ms"}
+
+
+def _request_etag(version: str) -> str:
+    params = sorted((key, value) for key, value in request.args.items(multi=True) if key not in ETAG_IGNORED_PARAMS)
+    key = "|".join([version, request.path, *(f"{name}={value}" for name, value in params)])
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def http_cache(max_age: int, version: Callable[[], str]):
+    """ETag + Cache-Control for responses that only change with ``version()``.
+
+    A matching ``If-None-Match`` is answered with 304 before the view runs.
+    Only complete successes (HTTP 200, envelope ``code == 0``) are cacheable;
+    errors and results the engine reports as incomplete are ``no-store``.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = _request_etag(version())
+            if request.if_none_match.contains_weak(etag):
+                response = Response(status=304)
+            else:
+                response = view(*args, **kwargs)
+                if response.status_code != 200 or getattr(response, "envelope_code", 0) != 0 or g.get("partial"):
+                    response.cache_control.no_store = True
+                    return response
+            response.set_etag(etag, weak=True)
+            response.cache_control.public = True
+            response.cache_control.max_age = max_age
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def catalog_version() -> str:
+    return BOOK_REPO.version
+
+
+def model_version() -> str:
+    return ENGINE.version
+
+
+def no_store(response: Response) -> Response:
+    response.cache_control.no_store = True
+    return response
+
+
+@app.before_request
+def start_timer():
+    if ACCESS_LOG is not None:
+        g.started = time.perf_counter()
+
+
+# Registered before compress_response, so it runs after it and the logged
+# latency includes compression.
+@app.after_request
+def log_access(response: Response) -> Response:
+    if ACCESS_LOG is not None and request.path.startswith(LOGGED_PREFIXES):
+        elapsed_ms = (time.perf_counter() - g.get("started", time.perf_counter())) * 1000.0
+        body = request.get_json(silent=True) if request.method == "POST" else None
+        ACCESS_LOG.record(request.path, request.args.to_dict(), response.status_code, elapsed_ms, body)
+    return response
+
+
+@app.after_request
+def compress_response(response: Response) -> Response:
+    """gzip/brotli-encode bodies above ``COMPRESSION_MIN_BYTES`` when the client accepts it."""
+    if response.direct_passthrough or "Content-Encoding" in response.headers:
+        return response
+    response.vary.add("Accept-Encoding")
+    if response.status_code == 304:
+        return response
+    body = response.get_data()
+    encoding = choose_encoding(request.accept_encodings)
+    if encoding is None or len(body) < COMPRESSION_MIN_BYTES:
+        return response
+    response.set_data(compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+
 @app.route("/api/health", methods=["GET"])
 def health_check():
-    return create_response(
-        data={
-            "status": "healthy",
-            "total_books": len(BOOK_REPO.by_id),
-            "algorithms": [algo["id"] for algo in ENGINE.list_algorithms()],
-        }
+    return no_store(
+        create_response(
+            data={
+                "status": "healthy",
+                "total_books": BOOK_REPO.num_books,
+                "algorithms": [algo["id"] for algo in ENGINE.list_algorithms()],
+                "shard": {"index": ENGINE.shard_index, "count": ENGINE.shard_count},
+            }
+        )
     )
 
 
 @app.route("/api/books/search", methods=["GET"])
+@http_cache(CACHE_MAX_AGE_SEARCH, catalog_version)
 def search_books():
     query = request.args.get("q", "").strip()
     limit = parse_positive_int(request.args.get("limit"), DEFAULT_SEARCH_LIMIT)
     if not query:
         return create_response(1, "参数缺失：搜索关键词不能为空", status=400)
-    results = BOOK_REPO.search(query, limit)
-    if not results:
-        return create_response(2, "没有搜索到任何图书", {"books": []})
-    return create_response(data={"books": results})
+    cursor = request.args.get("cursor", "0").strip() or "0"
+    if not cursor.isdigit():
+        return create_response(1, "参数错误：cursor 无效", status=400)
+    offset = int(cursor)
+    fields = requested_fields()
+    results, total = BOOK_REPO.search_page(query, limit, offset)
+    if not total:
+        return create_response(2, "没有搜索到任何图书", {"books": [], "total": 0, "next_cursor": None})
+    next_cursor = str(offset + limit) if offset + limit < total else None
+    return create_response(data={"books": FRAGMENTS.books(results, fields), "total": total, "next_cursor": next_cursor})
 
 
 @app.route("/api/books/<book_id>", methods=["GET"])
+@http_cache(CACHE_MAX_AGE_BOOK, catalog_version)
 def get_book_detail(book_id):
-    book = BOOK_REPO.get_by_id(book_id)
-    if not book:
+    fields = requested_fields()
+    book_index = BOOK_REPO.index_of_id(book_id)
+    if book_index is None:
         return create_response(404, "没有找到该图书", status=404)
-    return create_response(data={"book": book})
-
-
-def _recommend_by_isbn(isbn: str, k: int, algorithm: Optional[str] = None):
-    recommendations, algo_info = ENGINE.recommend(isbn, k, algorithm_id=algorithm)
-    return recommendations, algo_info
+    return create_response(data={"book": FRAGMENTS.single(book_index, fields)})
+
+
+def _recommend_by_index(
+    book_index: int,
+    k: int,
+    fields: Optional[Tuple[str, ...]] = None,
+    algorithm: Optional[str] = None,
+    fusion: Optional[str] = None,
+):
+    recommendations, algo_info, complete = ENGINE.recommend(
+        book_index,
+        k,
+        algorithm_id=algorithm,
+        fusion=fusion,
+        # Batch calls reuse one deadline for every book in the request.
+        deadline=g.get("deadline") or request_deadline(),
+    )
+    if not complete:
+        g.partial = True
+    return FRAGMENTS.scored(recommendations, fields), algo_info
 
 
 @app.route("/api/recommendations/by-title", methods=["GET"])
+@http_cache(CACHE_MAX_AGE_RECOMMENDATIONS, model_version)
 def recommend_by_title():
     query = request.args.get("q", "").strip()
     k = parse_positive_int(request.args.get("k"), DEFAULT_TOP_K)
+    fields = requested_fields()
     if not query:
         return create_response(1, "参数缺失：书名不能为空", status=400)
 
-    exact_book = BOOK_REPO.find_exact_by_title(query)
-    if not exact_book:
+    book_index = BOOK_REPO.find_exact_index(query)
+    if book_index is None:
         suggestions = BOOK_REPO.suggest_titles(query, limit=5)
         if suggestions:
             return create_response(3, "未找到精确匹配的书籍，请尝试以下书名:", {"similar_titles": suggestions})
         return create_response(2, "没有找到相关图书", {"recommendations": []})
+    redirect = misdirected(book_index)
+    if redirect is not None:
+        return redirect
 
     try:
-        recommendations, algo_info = _recommend_by_isbn(exact_book["isbn"], k)
+        recommendations, algo_info = _recommend_by_index(book_index, k, fields)
     except RecommendationError as exc:
-        return create_response(2, f"无法生成推荐：{exc}", {"recommendations": []})
+        return recommendation_failed(exc)
 
     return create_response(
         data={
-            "query_title": exact_book["title"],
-            "query_book": exact_book,
+            "query_title": BOOK_REPO.record(book_index).title,
+            "query_book": FRAGMENTS.single(book_index, fields),
             "recommendations": recommendations,
             "algorithm": {"id": algo_info.id, "name": algo_info.name},
         }
@@ -100,21 +283,26 @@ def recommend_by_title():
 
 
 @app.route("/api/recommendations/by-book", methods=["GET"])
+@http_cache(CACHE_MAX_AGE_RECOMMENDATIONS, model_version)
 def recommend_by_book():
     book_id = request.args.get("book_id", "").strip()
     k = parse_positive_int(request.args.get("k"), DEFAULT_TOP_K)
+    fields = requested_fields()
     if not book_id:
         return create_response(1, "参数缺失：book_id 不能为空", status=400)
-    book = BOOK_REPO.get_by_id(book_id)
-    if not book:
+    book_index = BOOK_REPO.index_of_id(book_id)
+    if book_index is None:
         return create_response(404, "没有找到该图书", status=404)
+    redirect = misdirected(book_index)
+    if redirect is not None:
+        return redirect
     try:
-        recommendations, algo_info = _recommend_by_isbn(book["isbn"], k)
+        recommendations, algo_info = _recommend_by_index(book_index, k, fields)
     except RecommendationError as exc:
-        return create_response(2, f"无法生成推荐：{exc}", {"recommendations": []})
+        return recommendation_failed(exc)
     return create_response(
         data={
-            "query_book": book,
+            "query_book": FRAGMENTS.single(book_index, fields),
             "recommendations": recommendations,
             "algorithm": {"id": algo_info.id, "name": algo_info.name},
         }
@@ -122,33 +310,188 @@ def recommend_by_book():
 
 
 @app.route("/api/recommendations/by-book-and-algorithm", methods=["GET"])
+@http_cache(CACHE_MAX_AGE_RECOMMENDATIONS, model_version)
 def recommend_by_book_and_algorithm():
     book_id = request.args.get("book_id", "").strip()
     algorithm = request.args.get("algorithm", "lightgbm").strip()
+    fusion = request.args.get("fusion", "").strip() or None
     k = parse_positive_int(request.args.get("k"), DEFAULT_TOP_K)
+    fields = requested_fields()
 
     if not book_id:
         return create_response(1, "参数缺失：book_id 不能为空", status=400)
-    book = BOOK_REPO.get_by_id(book_id)
-    if not book:
+    book_index = BOOK_REPO.index_of_id(book_id)
+    if book_index is None:
         return create_response(404, "没有找到该图书", status=404)
+    redirect = misdirected(book_index)
+    if redirect is not None:
+        return redirect
     try:
-        recommendations, algo_info = _recommend_by_isbn(book["isbn"], k, algorithm=algorithm or None)
+        recommendations, algo_info = _recommend_by_index(book_index, k, fields, algorithm=algorithm or None, fusion=fusion)
     except RecommendationError as exc:
-        return create_response(2, f"无法生成推荐：{exc}", {"recommendations": []})
+        return recommendation_failed(exc)
     return create_response(
         data={
             "algorithm": {"id": algo_info.id, "name": algo_info.name},
-            "query_book": book,
+            "query_book": FRAGMENTS.single(book_index, fields),
             "recommendations": recommendations,
         }
     )
 
 
+@app.route("/api/recommendations/batch", methods=["POST"])
+def recommend_batch():
+    """Recommendations for several books in one call (the router's fan-out unit).
+
+    Body: ``{"book_ids": [...], "k": 5, "algorithm": "...", "fields": [...]}``.
+    Each id gets either its recommendations or an ``error`` (with ``shard``
+    when another node owns the book); all share the request deadline.
+    """
+    body = request.get_json(silent=True) or {}
+    book_ids = body.get("book_ids")
+    if not isinstance(book_ids, list) or not book_ids:
+        return create_response(1, "参数缺失：book_ids 必须为非空数组", status=400)
+    if len(book_ids) > BATCH_MAX_BOOKS:
+        return create_response(1, f"参数错误：book_ids 最多 {BATCH_MAX_BOOKS} 个", status=400)
+    k = parse_positive_int(body.get("k"), DEFAULT_TOP_K)
+    algorithm = str(body.get("algorithm") or "").strip() or None
+    fields = body.get("fields")
+    try:
+        fields = normalize_fields(fields.split(",") if isinstance(fields, str) else fields or [])
+    except (TypeError, ValueError) as exc:
+        raise InvalidFieldsError(str(exc)) from None
+
+    results = {}
+    for book_id in book_ids:
+        book_index = BOOK_REPO.index_of_id(book_id)
+        if book_index is None:
+            results[str(book_id)] = {"error": "没有找到该图书"}
+        elif not ENGINE.owns(book_index):
+            results[str(book_id)] = {"error": "该图书由其他分片负责", "shard": ENGINE.owner_of(book_index)}
+        else:
+            try:
+                recommendations, algo_info = _recommend_by_index(book_index, k, fields, algorithm=algorithm)
+            except RecommendationError as exc:
+                results[str(book_id)] = {"error": f"无法生成推荐：{exc}"}
+                continue
+            results[str(book_id)] = {
+                "recommendations": recommendations,
+                "algorithm": {"id": algo_info.id, "name": algo_info.name},
+            }
+    return no_store(create_response(data={"results": results}))
+
+
+@app.route("/api/recommendations/for-user", methods=["GET"])
+@http_cache(CACHE_MAX_AGE_RECOMMENDATIONS, model_version)
+def recommend_for_user():
+    raw_user_id = request.args.get("user_id", "").strip()
+    k = parse_positive_int(request.args.get("k"), DEFAULT_TOP_K)
+    fields = requested_fields()
+    if not raw_user_id:
+        return create_response(1, "参数缺失：user_id 不能为空", status=400)
+    try:
+        user_id = int(raw_user_id)
+    except ValueError:
+        return create_response(1, "参数错误：user_id 必须为整数", status=400)
+    if not ENGINE.owns_user(user_id):
+        return create_response(421, "该用户由其他分片负责", {"shard": ENGINE.owner_of_user(user_id)}, status=421)
+    histories = ENGINE.user_histories
+    if histories is None:
+        return create_response(2, "个性化推荐未启用：未加载 DIN 模型", {"recommendations": []})
+    entry = histories.lookup(user_id)
+    if entry is None:
+        return create_response(404, "没有找到该用户的评分记录", status=404)
+    try:
+        recommendations, algo_info, complete = ENGINE.recommend_for_user(user_id, k, deadline=request_deadline())
+    except RecommendationError as exc:
+        return recommendation_failed(exc)
+    if not complete:
+        g.partial = True
+    history, _ = entry
+    return create_response(
+        data={
+            "user_id": user_id,
+            "recent_books": FRAGMENTS.books(history[::-1][:USER_HISTORY_PREVIEW], fields),
+            "recommendations": FRAGMENTS.scored(recommendations, fields),
+            "algorithm": {"id": algo_info.id, "name": algo_info.name},
+        }
+    )
+
+
 @app.route("/api/system/algorithms", methods=["GET"])
+@http_cache(CACHE_MAX_AGE_ALGORITHMS, model_version)
 def list_algorithms():
     return create_response(data={"algorithms": ENGINE.list_algorithms()})
 
 
+@app.route("/api/system/metrics", methods=["GET"])
+def engine_metrics():
+    return no_store(create_response(data={"algorithms": ENGINE.metrics.snapshot()}))
+
+
+@app.route("/api/system/memory", methods=["GET"])
+def memory_usage():
+    structures = ENGINE.memory_report()
+    structures["serialization"] = FRAGMENTS.memory_report()
+    totals = {name: sum(report.values()) for name, report in structures.items()}
+    return no_store(create_response(data={"structures": structures, "totals": totals, "total_bytes": sum(totals.values())}))
+
+
+def recommendation_keys(record: Dict) -> Iterator[Tuple[int, Optional[str], Optional[str], int]]:
+    """Engine calls ``(book_index, algorithm, fusion, k)`` made by one logged request.
+
+    Mirrors the defaults of the recommendation routes; hybrid blends are
+    skipped because the engine does not cache them.
+    """
+    path, args, body = record["path"], record.get("args") or {}, record.get("body") or {}
+    k = parse_positive_int(args.get("k"), DEFAULT_TOP_K)
+    algorithm = fusion = None
+    if path == "/api/recommendations/by-book":
+        indices = [BOOK_REPO.index_of_id(args.get("book_id", ""))]
+    elif path == "/api/recommendations/by-book-and-algorithm":
+        indices = [BOOK_REPO.index_of_id(args.get("book_id", ""))]
+        algorithm = args.get("algorithm", "lightgbm").strip() or None
+        fusion = args.get("fusion", "").strip() or None
+    elif path == "/api/recommendations/by-title":
+        indices = [BOOK_REPO.find_exact_index(args.get("q", ""))]
+    elif path == "/api/recommendations/batch" and isinstance(body.get("book_ids"), list):
+        indices = [BOOK_REPO.index_of_id(book_id) for book_id in body["book_ids"]]
+        algorithm = str(body.get("algorithm") or "").strip() or None
+        k = parse_positive_int(body.get("k"), DEFAULT_TOP_K)
+    else:
+        return
+    if algorithm == HYBRID_INFO.id:
+        return
+    for book_index in indices:
+        if book_index is not None and ENGINE.owns(book_index):
+            yield book_index, algorithm, fusion, k
+
+
+def warm_result_cache(path, top_n: int = WARM_TOP_N) -> int:
+    """Compute the ``top_n`` most frequent recommendation calls of an access log.
+
+    Fills the engine's result cache and the JSON fragments of the books
+    involved, so the first visitors after a deploy do not hit cold paths.
+    Returns the number of calls warmed.
+    """
+    counts: Counter = Counter()
+    for record in read_access_log(path):
+        if record.get("status") in (200, 304):
+            counts.update(recommendation_keys(record))
+    warmed = 0
+    for (book_index, algorithm, fusion, k), _ in counts.most_common(top_n):
+        try:
+            recommendations, _, _ = ENGINE.recommend(book_index, k, algorithm_id=algorithm, fusion=fusion)
+        except RecommendationError:
+            continue
+        FRAGMENTS.scored(recommendations, None)
+        warmed += 1
+    return warmed
+
+
+if WARM_LOG_PATH and Path(WARM_LOG_PATH).exists():
+    warm_result_cache(WARM_LOG_PATH)
+
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=8000, debug=False)
+    app.run(host="0.0.0.0", port=SERVICE_PORT, debug=False)
@@ -0,0 +1,85 @@
+"""Start a local sharded cluster: N backend processes as stand-in nodes plus the router.
+
+Usage::
+
+    python -m src.services.cluster --shards 3            # nodes on 8001-8003, router on 8000
+
+Every node still loads the full catalog and ratings and trains every model on
+all of them (training needs the global co-rating structure), then keeps only
+its own shard of the per-book serving tables and of the user histories.
+Sharding therefore splits serving memory, not training time or model
+weights. Stop the cluster with Ctrl-C.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import subprocess
+import sys
+import time
+from typing import List
+
+import requests
+
+from ..config import BASE_DIR
+
+
+def start_nodes(shards: int, base_port: int) -> List[subprocess.Popen]:
+    processes = []
+    for shard in range(shards):
+        env = dict(
+            os.environ,
+            BOOKREC_SHARD_INDEX=str(shard),
+            BOOKREC_SHARD_COUNT=str(shards),
+            BOOKREC_PORT=str(base_port + shard),
+        )
+        processes.append(subprocess.Popen([sys.executable, "-m", "src.services.api"], cwd=BASE_DIR, env=env))
+    return processes
+
+
+def wait_until_healthy(urls: List[str], timeout_s: float, processes: List[subprocess.Popen]) -> None:
+    deadline = time.monotonic() + timeout_s
+    pending = list(urls)
+    while pending:
+        if any(process.poll() is not None for process in processes):
+            raise RuntimeError("A shard node exited during startup")
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"Shard nodes not ready after {timeout_s:.0f}s: {pending}")
+        for url in list(pending):
+            try:
+                requests.get(f"{url}/api/health", timeout=1).raise_for_status()
+                pending.remove(url)
+            except requests.RequestException:
+                pass
+        time.sleep(1)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, default=2)
+    parser.add_argument("--base-port", type=int, default=8001, help="port of shard 0; shard i uses base + i")
+    parser.add_argument("--router-port", type=int, default=8000)
+    parser.add_argument("--startup-timeout", type=float, default=1800, help="seconds to wait for model training")
+    args = parser.parse_args(argv)
+
+    urls = [f"http://127.0.0.1:{args.base_port + shard}" for shard in range(args.shards)]
+    nodes = start_nodes(args.shards, args.base_port)
+    router = None
+    try:
+        wait_until_healthy(urls, args.startup_timeout, nodes)
+        env = dict(os.environ, BOOKREC_SHARD_NODES=",".join(urls), BOOKREC_PORT=str(args.router_port))
+        router = subprocess.Popen([sys.executable, "-m", "src.services.router"], cwd=BASE_DIR, env=env)
+        print(f"Router on http://127.0.0.1:{args.router_port}/api -> {', '.join(urls)}")
+        router.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in nodes + ([router] if router else []):
+            process.terminate()
+        for process in nodes + ([router] if router else []):
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
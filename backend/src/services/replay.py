@@ -0,0 +1,150 @@
+"""Replay a recorded access log against the API to measure throughput under real traffic.
+
+Usage::
+
+    python -m src.services.replay access.log                       # in-process test client, original pacing
+    python -m src.services.replay access.log --speedup 10          # ten times faster than recorded
+    python -m src.services.replay access.log --url http://127.0.0.1:8000 --speedup 0 --workers 16
+
+Requests keep their recorded order and relative timing (divided by
+``--speedup``; 0 sends as fast as the workers allow), so the hot-book skew
+of production traffic is preserved. Latency is reported both per request
+(service time) and from each request's scheduled send time, which also
+counts queueing when the server falls behind.
+"""
+
+from __future__ import annotations
+
+import argparse
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .access_log import read_access_log
+
+Sender = Callable[[Dict], int]
+
+
+def http_sender(base_url: str, timeout: float) -> Sender:
+    import requests
+
+    local = threading.local()
+
+    def send(record: Dict) -> int:
+        session = getattr(local, "session", None)
+        if session is None:
+            session = local.session = requests.Session()
+        method = "POST" if "body" in record else "GET"
+        try:
+            response = session.request(
+                method,
+                base_url.rstrip("/") + record["path"],
+                params=record.get("args"),
+                json=record.get("body"),
+                timeout=timeout,
+            )
+        except requests.RequestException:
+            return 0
+        return response.status_code
+
+    return send
+
+
+def test_client_sender() -> Sender:
+    from . import api  # trains or loads every model: only when replaying in-process
+
+    local = threading.local()
+
+    def send(record: Dict) -> int:
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = api.app.test_client()
+        if "body" in record:
+            return client.post(record["path"], query_string=record.get("args"), json=record["body"]).status_code
+        return client.get(record["path"], query_string=record.get("args")).status_code
+
+    return send
+
+
+def replay(records: List[Dict], send: Sender, speedup: float, workers: int) -> Dict:
+    """Send ``records`` on their recorded schedule; return throughput and latency figures."""
+    started_at = records[0]["ts"] if records else 0.0
+    offsets = [(record["ts"] - started_at) / speedup if speedup > 0 else 0.0 for record in records]
+    service_ms = np.zeros(len(records))
+    response_ms = np.zeros(len(records))
+    statuses: List[int] = [0] * len(records)
+
+    def run(position: int, scheduled: float) -> None:
+        sent = time.perf_counter()
+        statuses[position] = send(records[position])
+        done = time.perf_counter()
+        service_ms[position] = (done - sent) * 1000.0
+        response_ms[position] = (done - scheduled) * 1000.0
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="replay") as pool:
+        for position, offset in enumerate(offsets):
+            scheduled = start + offset
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(run, position, scheduled)
+    elapsed = time.perf_counter() - start
+
+    def percentiles(values: np.ndarray) -> Dict[str, Optional[float]]:
+        if not values.size:
+            return {"p50": None, "p95": None, "p99": None}
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {"p50": round(float(p50), 2), "p95": round(float(p95), 2), "p99": round(float(p99), 2)}
+
+    return {
+        "requests": len(records),
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(records) / elapsed, 1) if elapsed > 0 else None,
+        "statuses": dict(sorted(Counter(statuses).items())),
+        "service_ms": percentiles(service_ms),
+        "response_ms": percentiles(response_ms),
+    }
+
+
+def hottest(records: List[Dict], limit: int) -> List[Tuple[str, int]]:
+    """Most requested books (by ``book_id`` argument or batch entry) in the replayed log."""
+    counts: Counter = Counter()
+    for record in records:
+        book_id = (record.get("args") or {}).get("book_id")
+        if book_id:
+            counts[book_id] += 1
+        for batch_id in (record.get("body") or {}).get("book_ids") or []:
+            counts[str(batch_id)] += 1
+    return counts.most_common(limit)
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("log", help="access log written with BOOKREC_ACCESS_LOG")
+    parser.add_argument("--url", help="base URL of a running API; default drives the Flask app in-process")
+    parser.add_argument("--speedup", type=float, default=1.0, help="time compression factor; 0 = no pacing")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent in-flight requests")
+    parser.add_argument("--limit", type=int, default=None, help="replay only the first N records")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout (HTTP mode)")
+    args = parser.parse_args(argv)
+
+    records = list(read_access_log(args.log))[: args.limit]
+    if not records:
+        parser.error(f"no requests in {args.log}")
+    send = http_sender(args.url, args.timeout) if args.url else test_client_sender()
+    report = replay(records, send, args.speedup, args.workers)
+
+    print(f"{report['requests']} requests in {report['elapsed_s']}s -> {report['throughput_rps']} req/s")
+    print(f"statuses: {report['statuses']} (0 = connection error)")
+    print(f"service ms:  {report['service_ms']}")
+    print(f"response ms: {report['response_ms']} (from scheduled send time)")
+    print("hottest books:", ", ".join(f"{book_id} x{count}" for book_id, count in hottest(records, 10)))
+
+
+if __name__ == "__main__":
+    main()
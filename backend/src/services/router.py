@@ -0,0 +1,187 @@
+"""Thin router in front of sharded backend nodes.
+
+Run one backend per shard (``BOOKREC_SHARD_INDEX``/``BOOKREC_SHARD_COUNT``)
+and point this router at them with ``BOOKREC_SHARD_NODES``. Per-book routes go
+to the node that owns the book and ``for-user`` to the node that owns the
+user; batch requests are split by owner, sent in
+parallel and merged. Everything else (catalog lookups, search) can be answered
+by any node and is spread round-robin. The router holds no catalog or model.
+"""
+
+from __future__ import annotations
+
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Sequence
+
+import requests
+from flask import Flask, Response, jsonify, request
+from flask_cors import CORS
+
+from ..config import BATCH_MAX_BOOKS, ROUTER_TIMEOUT_S, SERVICE_PORT, SHARD_NODES
+from ..sharding import shard_of_id
+
+# Hop-by-hop and encoding headers are recomputed by this server.
+SKIPPED_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+class ShardRouter:
+    def __init__(self, nodes: Sequence[str], timeout: float = ROUTER_TIMEOUT_S):
+        if not nodes:
+            raise RuntimeError("No shard nodes configured (set BOOKREC_SHARD_NODES)")
+        self.nodes = list(nodes)
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._next = itertools.cycle(range(len(self.nodes)))
+        self._executor = ThreadPoolExecutor(max_workers=len(self.nodes), thread_name_prefix="shard")
+
+    def owner(self, book_id) -> Optional[int]:
+        try:
+            return shard_of_id(int(str(book_id).strip()), len(self.nodes))
+        except ValueError:
+            return None
+
+    def any_node(self) -> int:
+        return next(self._next)
+
+    def forward(self, shard: int, path: str) -> requests.Response:
+        """Replay the current request against ``shard``; follow one 421 to the owner."""
+        response = self._send(shard, path)
+        if response.status_code == 421:
+            try:
+                payload = response.json()
+            except ValueError:
+                return response
+            owner = (payload.get("data") or {}).get("shard")
+            if isinstance(owner, int) and owner != shard and 0 <= owner < len(self.nodes):
+                response = self._send(owner, path)
+        return response
+
+    def _send(self, shard: int, path: str) -> requests.Response:
+        headers = {key: value for key, value in request.headers.items() if key.lower() not in ("host", "content-length")}
+        return self.session.request(
+            request.method,
+            f"{self.nodes[shard]}{path}",
+            params=request.args,
+            data=request.get_data(),
+            headers=headers,
+            timeout=self.timeout,
+        )
+
+    def batch(self, book_ids: List, payload: Dict) -> Dict[str, Dict]:
+        """Fan one batch out to the owning nodes and merge the per-book results."""
+        groups: Dict[int, List] = {}
+        results: Dict[str, Dict] = {}
+        for book_id in book_ids:
+            shard = self.owner(book_id)
+            if shard is None:
+                results[str(book_id)] = {"error": "没有找到该图书"}
+            else:
+                groups.setdefault(shard, []).append(book_id)
+
+        timeout_header = request.headers.get("X-Request-Timeout-Ms")
+        headers = {"X-Request-Timeout-Ms": timeout_header} if timeout_header else {}
+
+        def call(shard: int, ids: List) -> Dict[str, Dict]:
+            try:
+                response = self.session.post(
+                    f"{self.nodes[shard]}/api/recommendations/batch",
+                    json={**payload, "book_ids": ids},
+                    headers=headers,
+                    timeout=self.timeout,
+                )
+                data = response.json().get("data") or {}
+                if response.status_code == 200 and "results" in data:
+                    return data["results"]
+                message = response.json().get("message", f"HTTP {response.status_code}")
+            except (requests.RequestException, ValueError) as exc:
+                message = f"分片 {shard} 不可用：{exc}"
+            return {str(book_id): {"error": message, "shard": shard} for book_id in ids}
+
+        futures = [self._executor.submit(call, shard, ids) for shard, ids in groups.items()]
+        for future in futures:
+            results.update(future.result())
+        # Keep the caller's order.
+        return {str(book_id): results[str(book_id)] for book_id in book_ids}
+
+
+app = Flask(__name__)
+CORS(app)
+app.json.sort_keys = False  # merged batch results keep the caller's order
+ROUTER: Optional[ShardRouter] = None
+
+
+def get_router() -> ShardRouter:
+    global ROUTER
+    if ROUTER is None:
+        ROUTER = ShardRouter(SHARD_NODES)
+    return ROUTER
+
+
+def proxy(shard: int):
+    """Relay the current request to ``shard`` (502 if the node cannot be reached)."""
+    try:
+        response = get_router().forward(shard, request.path)
+    except requests.RequestException as exc:
+        return envelope(502, f"分片 {shard} 不可用：{exc}", status=502)
+    return relay(response)
+
+
+def relay(response: requests.Response) -> Response:
+    headers = [(key, value) for key, value in response.headers.items() if key.lower() not in SKIPPED_HEADERS]
+    return Response(response.content, status=response.status_code, headers=headers)
+
+
+def envelope(code=0, message="ok", data=None, status=200):
+    return jsonify({"code": code, "message": message, "data": data}), status
+
+
+@app.route("/api/recommendations/batch", methods=["POST"])
+def batch():
+    body = request.get_json(silent=True) or {}
+    book_ids = body.get("book_ids")
+    if not isinstance(book_ids, list) or not book_ids:
+        return envelope(1, "参数缺失：book_ids 必须为非空数组", status=400)
+    if len(book_ids) > BATCH_MAX_BOOKS * len(get_router().nodes):
+        return envelope(1, "参数错误：book_ids 过多", status=400)
+    payload = {key: body[key] for key in ("k", "algorithm", "fields") if key in body}
+    return envelope(data={"results": get_router().batch(book_ids, payload)})
+
+
+@app.route("/api/recommendations/by-book", methods=["GET"])
+@app.route("/api/recommendations/by-book-and-algorithm", methods=["GET"])
+def by_book():
+    router = get_router()
+    shard = router.owner(request.args.get("book_id", ""))
+    return proxy(router.any_node() if shard is None else shard)
+
+
+@app.route("/api/recommendations/for-user", methods=["GET"])
+def for_user():
+    router = get_router()
+    shard = router.owner(request.args.get("user_id", ""))
+    return proxy(router.any_node() if shard is None else shard)
+
+
+@app.route("/api/health", methods=["GET"])
+def health():
+    router = get_router()
+    nodes = []
+    for url in router.nodes:
+        try:
+            status = router.session.get(f"{url}/api/health", timeout=router.timeout).json().get("data")
+        except (requests.RequestException, ValueError) as exc:
+            status = {"status": "unreachable", "error": str(exc)}
+        nodes.append({"url": url, **(status or {})})
+    healthy = all(node.get("status") == "healthy" for node in nodes)
+    return envelope(data={"status": "healthy" if healthy else "degraded", "nodes": nodes})
+
+
+@app.route("/api/<path:path>", methods=["GET", "POST"])
+def passthrough(path):
+    # Titles resolve to a book on the node; a 421 from a non-owner is followed.
+    return proxy(get_router().any_node())
+
+
+if __name__ == "__main__":
+    app.run(host="0.0.0.0", port=SERVICE_PORT, debug=False)
@@ -0,0 +1,188 @@
+"""Fast JSON rendering for API responses.
+
+Book metadata never changes while the process runs, so each book's JSON
+object is rendered once into a bytes fragment and responses are assembled by
+concatenating fragments with the per-request scores. ``orjson`` is used when
+it is installed; the standard library encoder is the fallback. Bodies above
+``COMPRESSION_MIN_BYTES`` are gzip- or brotli-encoded by the API layer.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import math
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional encoding
+    brotli = None
+
+from ..config import BROTLI_QUALITY, FRAGMENT_PROJECTION_CACHE_SIZE, GZIP_LEVEL
+
+# Public book fields in response order; ``book_id`` is always returned.
+BOOK_FIELDS = (
+    "book_id",
+    "isbn",
+    "title",
+    "author",
+    "year_of_publication",
+    "publisher",
+    "image_url_s",
+    "image_url_m",
+    "image_url_l",
+)
+
+
+def dumps(value) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class RawJSON:
+    """Already-encoded JSON embedded verbatim by :func:`render_envelope`."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+
+def _encode_score(score: float) -> bytes:
+    value = round(float(score), 4)
+    return repr(value).encode("ascii") if math.isfinite(value) else b"null"
+
+
+def normalize_fields(names: Sequence[str]) -> Optional[Tuple[str, ...]]:
+    """Canonical projection for a ``fields=`` list; ``None`` means every field.
+
+    Raises ``ValueError`` listing unknown names.
+    """
+    requested = {name.strip() for name in names if name.strip()}
+    if not requested:
+        return None
+    unknown = requested.difference(BOOK_FIELDS)
+    if unknown:
+        raise ValueError(", ".join(sorted(unknown)))
+    fields = tuple(name for name in BOOK_FIELDS if name == "book_id" or name in requested)
+    return None if len(fields) == len(BOOK_FIELDS) else fields
+
+
+def _fragments_size(container, fragments: Iterable[Optional[bytes]]) -> int:
+    return sys.getsizeof(container) + sum(sys.getsizeof(fragment) for fragment in fragments if fragment is not None)
+
+
+class BookFragments:
+    """Per-book JSON fragments rendered once and cached by catalog index.
+
+    A fragment is the book object without its closing brace, so a score can
+    be appended without re-encoding the static fields. Full fragments are
+    cached for every book. Projections come from the client (up to ``2 ** 8``
+    of them), so only the ``projection_cache_size`` most recently used ones
+    keep a cache; it holds just the books rendered with that projection.
+    """
+
+    def __init__(self, book_repo, projection_cache_size: int = FRAGMENT_PROJECTION_CACHE_SIZE):
+        self.book_repo = book_repo
+        self.projection_cache_size = projection_cache_size
+        self._full: List[Optional[bytes]] = [None] * book_repo.num_books
+        self._projections: "OrderedDict[Tuple[str, ...], Dict[int, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _projection_cache(self, fields: Tuple[str, ...]) -> Optional[Dict[int, bytes]]:
+        if self.projection_cache_size <= 0:
+            return None
+        with self._lock:
+            cache = self._projections.get(fields)
+            if cache is None:
+                cache = self._projections[fields] = {}
+                while len(self._projections) > self.projection_cache_size:
+                    self._projections.popitem(last=False)
+            else:
+                self._projections.move_to_end(fields)
+            return cache
+
+    def fragment(self, index: int, fields: Optional[Tuple[str, ...]] = None) -> bytes:
+        # Concurrent requests may both render a missing entry; the bytes are identical.
+        if fields is None:
+            fragment = self._full[index]
+            if fragment is None:
+                fragment = self._full[index] = dumps(self.book_repo.payload(index))[:-1]
+            return fragment
+        cache = self._projection_cache(fields)
+        fragment = cache.get(index) if cache is not None else None
+        if fragment is None:
+            payload = self.book_repo.payload(index)
+            fragment = dumps({name: payload[name] for name in fields})[:-1]
+            if cache is not None:
+                cache[index] = fragment
+        return fragment
+
+    def memory_report(self) -> Dict[str, int]:
+        """Bytes of the full-fragment cache and of each cached projection."""
+        report = {"full": _fragments_size(self._full, self._full)}
+        with self._lock:
+            projections = [(fields, dict(cache)) for fields, cache in self._projections.items()]
+        for fields, cache in projections:
+            report[f"fields={','.join(fields)}"] = _fragments_size(cache, cache.values())
+        return report
+
+    def book(self, index: int, score: Optional[float] = None, fields: Optional[Tuple[str, ...]] = None) -> bytes:
+        if score is None:
+            return self.fragment(index, fields) + b"}"
+        return b"".join((self.fragment(index, fields), b',"score":', _encode_score(score), b"}"))
+
+    def single(self, index: int, fields: Optional[Tuple[str, ...]] = None) -> RawJSON:
+        return RawJSON(self.book(index, fields=fields))
+
+    def books(self, indices: Iterable[int], fields: Optional[Tuple[str, ...]] = None) -> RawJSON:
+        return RawJSON(b"[" + b",".join(self.book(int(index), fields=fields) for index in indices) + b"]")
+
+    def scored(self, scored, fields: Optional[Tuple[str, ...]] = None) -> RawJSON:
+        """Render ``ScoredBook``-like ``(index, score)`` pairs."""
+        return RawJSON(b"[" + b",".join(self.book(index, score, fields) for index, score in scored) + b"]")
+
+
+def _encode(value) -> bytes:
+    if isinstance(value, RawJSON):
+        return value.data
+    if isinstance(value, dict):
+        return _encode_object(value)
+    return dumps(value)
+
+
+def _encode_object(values: Dict) -> bytes:
+    if not any(isinstance(value, (RawJSON, dict)) for value in values.values()):
+        return dumps(values)
+    parts = [dumps(str(key)) + b":" + _encode(value) for key, value in values.items()]
+    return b"{" + b",".join(parts) + b"}"
+
+
+def render_envelope(code: int, message: str, data) -> bytes:
+    """Encode the ``{"code", "message", "data"}`` envelope, splicing in raw fragments."""
+    return _encode_object({"code": code, "message": message, "data": data})
+
+
+def choose_encoding(accept_encoding) -> Optional[str]:
+    """Pick ``br`` (when the brotli module is installed) or ``gzip`` from a werkzeug ``Accept`` header."""
+    if brotli is not None and accept_encoding["br"]:
+        return "br"
+    if accept_encoding["gzip"]:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
@@ -0,0 +1,25 @@
+"""Assignment of books and users to serving shards by a hash of their public id.
+
+Books are sharded by ``book_id`` and users (``/recommendations/for-user``) by
+``user_id``. The router and every node compute the same owner from the id
+alone, so the router needs neither the catalog nor the models.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+# Fibonacci hashing spreads consecutive ids (clean_books numbers rows) evenly.
+_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def shard_of(book_ids, shard_count: int) -> np.ndarray:
+    """Owning shard of each id in ``book_ids`` (array in, int32 array out)."""
+    ids = np.asarray(book_ids, dtype=np.int64).astype(np.uint64)
+    with np.errstate(over="ignore"):
+        mixed = (ids * _MULTIPLIER) >> np.uint64(32)
+    return (mixed % np.uint64(max(shard_count, 1))).astype(np.int32)
+
+
+def shard_of_id(book_id: int, shard_count: int) -> int:
+    return int(shard_of([book_id], shard_count)[0])
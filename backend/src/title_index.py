@@ -0,0 +1,159 @@
+"""Typo-tolerant title lookup: character trigram postings plus bounded edit distance.
+
+Titles are normalized (lowercase, punctuation folded to single spaces) and
+deduplicated; each distinct title keeps its most popular book. A query is
+matched approximately *anywhere* in a title, so "harry poter" finds
+"Harry Potter and the Sorcerer's Stone" at distance 1.
+
+Lookup prunes with the q-gram lemma (each edit destroys at most three of the
+query's trigrams), so only titles sharing enough trigrams are verified with
+Myers' bit-parallel approximate-substring distance.
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from .config import TITLE_SUGGEST_MAX_CANDIDATES, TITLE_SUGGEST_MAX_EDITS
+
+GRAM = 3
+NON_WORD = re.compile(r"[\W_]+")
+
+
+def normalize_titles(titles: pd.Series) -> pd.Series:
+    return titles.astype(str).str.lower().str.replace(NON_WORD, " ", regex=True).str.strip()
+
+
+def normalize_title(title: str) -> str:
+    return NON_WORD.sub(" ", title.lower()).strip()
+
+
+def substring_distance(pattern: str, text: str, peq: Dict[str, int]) -> int:
+    """Fewest edits turning ``pattern`` into some substring of ``text`` (Myers 1999)."""
+    m = len(pattern)
+    mask = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv, mv, score = mask, 0, m
+    best = m
+    for char in text:
+        eq = peq.get(char, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & mask)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        # No carry into the first row: a match may start anywhere in the text.
+        ph = (ph << 1) & mask
+        mh = (mh << 1) & mask
+        pv = mh | (~(xv | ph) & mask)
+        mv = ph & xv
+        if score < best:
+            best = score
+    return best
+
+
+class TitleIndex:
+    """Trigram postings (CSR over sorted gram keys) for the distinct normalized titles."""
+
+    def __init__(self, titles: pd.Series, popularity: Optional[np.ndarray] = None):
+        popularity = np.zeros(len(titles)) if popularity is None else np.asarray(popularity, dtype=np.float64)
+        frame = pd.DataFrame({"title": normalize_titles(titles).to_numpy(), "popularity": popularity})
+        frame["book_index"] = np.arange(len(frame), dtype=np.int32)
+        frame = frame[frame["title"].str.len() > 0]
+        # One entry per distinct title, represented by its most popular book.
+        frame = frame.sort_values("popularity", ascending=False, kind="stable").drop_duplicates("title")
+
+        self.titles: List[str] = frame["title"].tolist()
+        self.book_indices = frame["book_index"].to_numpy(dtype=np.int32)
+        self.popularity = frame["popularity"].to_numpy(dtype=np.float32)
+        self.lengths = np.fromiter((len(title) for title in self.titles), dtype=np.int32, count=len(self.titles))
+        self._build_postings()
+
+    def _build_postings(self) -> None:
+        self._alphabet: Dict[str, int] = {}
+        self._base = 1
+        self.gram_keys = np.empty(0, dtype=np.int64)
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.postings = np.empty(0, dtype=np.int32)
+        num_titles = len(self.titles)
+        if not num_titles:
+            return
+
+        # Encode every title once as code points, "\0"-separated, and derive all trigrams with array ops.
+        codes = np.frombuffer("\0".join(self.titles).encode("utf-32-le"), dtype=np.uint32)
+        alphabet, dense = np.unique(codes, return_inverse=True)
+        self._alphabet = {chr(code): position for position, code in enumerate(alphabet.tolist())}
+        self._base = len(alphabet)
+
+        separator = codes == 0
+        title_of = np.cumsum(separator)
+        dense = dense.astype(np.int64)
+        starts = np.arange(len(codes) - GRAM + 1)
+        starts = starts[~(separator[starts] | separator[starts + 1] | separator[starts + 2])]
+        grams = (dense[starts] * self._base + dense[starts + 1]) * self._base + dense[starts + 2]
+
+        # Sorted unique (gram, title) pairs give the postings grouped by gram.
+        # (A plain sort: np.unique's hash path is several times slower at this size.)
+        pairs = np.sort(grams * num_titles + title_of[starts])
+        pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+        pair_grams = pairs // num_titles
+        first = np.flatnonzero(np.concatenate(([True], pair_grams[1:] != pair_grams[:-1])))
+        self.gram_keys = pair_grams[first]
+        self.indptr = np.append(first, len(pairs)).astype(np.int64)
+        self.postings = (pairs % num_titles).astype(np.int32)
+
+    def _gram_keys(self, text: str) -> np.ndarray:
+        keys = set()
+        for start in range(len(text) - GRAM + 1):
+            ids = [self._alphabet.get(char) for char in text[start : start + GRAM]]
+            if None not in ids:
+                keys.add((ids[0] * self._base + ids[1]) * self._base + ids[2])
+        return np.fromiter(keys, dtype=np.int64, count=len(keys))
+
+    @staticmethod
+    def max_edits(length: int) -> int:
+        return min(TITLE_SUGGEST_MAX_EDITS, max(1, length // 4))
+
+    def suggest(self, query: str, limit: int = 5) -> np.ndarray:
+        """Catalog indices of the closest titles, by edit distance then popularity."""
+        pattern = normalize_title(query)
+        if len(pattern) < GRAM or not self.titles:
+            return np.empty(0, dtype=np.int32)
+        edits = self.max_edits(len(pattern))
+
+        # Trigrams absent from the catalog still count toward the lemma's bound.
+        query_grams = len(set(pattern[i : i + GRAM] for i in range(len(pattern) - GRAM + 1)))
+        required = max(1, query_grams - GRAM * edits)
+        keys = self._gram_keys(pattern)
+        slots = np.searchsorted(self.gram_keys, keys)
+        found = slots < len(self.gram_keys)
+        found[found] = self.gram_keys[slots[found]] == keys[found]
+        slots = slots[found]
+        if slots.size == 0:
+            return np.empty(0, dtype=np.int32)
+        hits = np.concatenate([self.postings[self.indptr[slot] : self.indptr[slot + 1]] for slot in slots])
+        counts = np.bincount(hits, minlength=len(self.titles))
+        candidates = np.flatnonzero((counts >= required) & (self.lengths >= len(pattern) - edits))
+        if candidates.size > TITLE_SUGGEST_MAX_CANDIDATES:
+            order = np.lexsort((-self.popularity[candidates], -counts[candidates]))
+            candidates = candidates[order[:TITLE_SUGGEST_MAX_CANDIDATES]]
+
+        peq: Dict[str, int] = {}
+        for position, char in enumerate(pattern):
+            peq[char] = peq.get(char, 0) | (1 << position)
+        distances = np.fromiter(
+            (substring_distance(pattern, self.titles[candidate], peq) for candidate in candidates.tolist()),
+            dtype=np.int32,
+            count=len(candidates),
+        )
+        keep = distances <= edits
+        candidates, distances = candidates[keep], distances[keep]
+        order = np.lexsort((-self.popularity[candidates], distances))[:limit]
+        return self.book_indices[candidates[order]]
@@ -1,11 +1,21 @@
 """Simple smoke tests for the Flask API."""
 
 import json
+import subprocess
+import sys
 import time
+from pathlib import Path
 
 import requests
 
 BASE_URL = "http://localhost:8000/api"
+BACKEND_DIR = Path(__file__).resolve().parent
+
+# Modules that tools and lightweight workers import; they must stay fast and
+# must not drag in the model libraries (those load when an algorithm is built).
+LIGHTWEIGHT_MODULES = ("src.recommendation.engine", "src.data_pipeline", "src.services.serialization")
+HEAVY_MODULES = ("torch", "lightgbm", "lightfm", "scipy", "sklearn")
+IMPORT_BUDGET_SECONDS = 1.0
 
 
 def pretty_print(title, response):
@@ -19,7 +29,29 @@ def pretty_print(title, response):
         print(response.text)
 
 
+def check_import_budget():
+    print("\n" + "=" * 60)
+    print(f"Import budget ({IMPORT_BUDGET_SECONDS:.1f}s, no {', '.join(HEAVY_MODULES)})")
+    print("=" * 60)
+    failures = 0
+    for module in LIGHTWEIGHT_MODULES:
+        probe = (
+            "import sys, time; start = time.perf_counter(); "
+            f"import {module}; "
+            "print(time.perf_counter() - start); "
+            f"print(','.join(name for name in {HEAVY_MODULES!r} if name in sys.modules))"
+        )
+        result = subprocess.run([sys.executable, "-c", probe], cwd=BACKEND_DIR, capture_output=True, text=True, check=True)
+        elapsed, loaded = (result.stdout.splitlines() + [""])[:2]
+        ok = float(elapsed) < IMPORT_BUDGET_SECONDS and not loaded
+        failures += not ok
+        print(f"{'OK  ' if ok else 'FAIL'} {module}: {float(elapsed):.3f}s" + (f" (loaded {loaded})" if loaded else ""))
+    return failures
+
+
 def main():
+    if check_import_budget():
+        sys.exit(1)
     time.sleep(1)
     endpoints = [
         ("Health", f"{BASE_URL}/health", {}),